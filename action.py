@@ -1,4 +1,6 @@
 import enum
+from typing import List, Sequence
+
 from deck import Deck
 
 
@@ -34,6 +36,54 @@ class CounterAction(enum.Enum):
         return self.name
 
 
+TARGETED_ACTIONS = (Action.COUP, Action.ASSASS, Action.STEAL)
+
+# The counter-action blocking each action, and the action blocked by each counter-action.
+COUNTER_ACTIONS = {
+    Action.FOREIGNAID: CounterAction.BLOCK_FOREIGNAID,
+    Action.STEAL: CounterAction.BLOCK_STEAL,
+    Action.ASSASS: CounterAction.BLOCK_ASSASS,
+}
+BLOCKED_ACTIONS = {counter_action: action for action, counter_action in COUNTER_ACTIONS.items()}
+
+# Card claimed by each action, and cards claimed by a block of each action.
+REQUIRED_CARD = {Action.TAX: "Duke", Action.ASSASS: "Assassin", Action.EXCHANGE: "Ambassador", Action.STEAL: "Captain"}
+BLOCKING_CARDS = {Action.FOREIGNAID: ("Duke",), Action.STEAL: ("Captain", "Ambassador"), Action.ASSASS: ("Contessa",)}
+
+
+def legal_action_mask(player, players: Sequence, deck: Deck = None) -> List[List[bool]]:
+    """
+    Return all the legal actions of a player at once, without raising.
+
+    Args:
+        player: the acting player. Must be one of `players`.
+        players: the players of the game.
+        deck: if given, EXCHANGE is only legal when at least 2 cards are left in it.
+
+    Returns:
+        mask[action.value][idx] is True if `action` on target `players[idx]` is legal, as checked by
+        `check_legal_action`. Untargeted actions are marked at the index of the acting player.
+    """
+    coins = player.coins
+    mask = [[False] * len(players) for _ in Action]
+    me = next(idx for idx, other in enumerate(players) if other is player)
+
+    if coins > 10:
+        mask[Action.COUP.value] = [other is not player for other in players]
+        return mask
+
+    mask[Action.INCOME.value][me] = True
+    mask[Action.FOREIGNAID.value][me] = True
+    mask[Action.TAX.value][me] = True
+    mask[Action.EXCHANGE.value][me] = deck is None or len(deck) >= 2
+    if coins >= 7:
+        mask[Action.COUP.value] = [other is not player for other in players]
+    if coins >= 3:
+        mask[Action.ASSASS.value] = [other is not player for other in players]
+    mask[Action.STEAL.value] = [other is not player and other.coins >= 2 for other in players]
+    return mask
+
+
 def check_legal_action(action: Action, player, target, deck: Deck = None):
     """If action is illegal, IllegalActionError is raised."""
 
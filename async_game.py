@@ -0,0 +1,195 @@
+"""Games awaiting their players' decisions, so that many tables and slow players share one event loop."""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, List, Sequence, Tuple, TypeVar
+
+from action import COUNTER_ACTIONS, TARGETED_ACTIONS, Action, CounterAction, check_legal_action, legal_action_mask
+from game import Game
+from player import Player, RandomPlayer
+from rules import FIRST_STEP, TRANSITIONS, Step
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncGame(Game):
+    """
+    A `Game` whose decisions are awaited: the adversaries are asked to challenge or counter an action concurrently,
+    and a player who does not answer in time is taken to pass (or, for her action, to take the first legal one).
+
+    Players take part through the coroutine hooks of `Player` (`_do_action_async`, `_do_challenge_async`,
+    `_do_counter_action_async`), which call the plain hooks unless overridden. Choosing a card to lose or to return
+    stays synchronous.
+
+    Args:
+        players: the players, in seating order.
+        rng: random generator of the game. See `Game`.
+        render: print the table after every turn.
+        timeout: seconds each player has for a decision. None for no limit.
+        timeouts: per seat timeouts, overriding `timeout`.
+    """
+
+    def __init__(
+        self,
+        players: Sequence[Player],
+        rng: random.Random = None,
+        render: bool = False,
+        timeout: float = None,
+        timeouts: Sequence[float] = None,
+    ):
+        super().__init__(players, rng, render)
+        if timeouts is None:
+            timeouts = [timeout] * len(self.seats)
+        self.timeouts = {id(player): seat_timeout for player, seat_timeout in zip(self.seats, timeouts)}
+        self.num_timeouts = [0] * len(self.seats)
+
+    async def __call__(self) -> Player:
+        """Play the game to the end and return the winner."""
+        logger.info("Game starting.")
+        self.deal()
+        return await self.play()
+
+    async def play(self, num_turns: int = None) -> Player:
+        """See `Game.play`."""
+        last_turn = None if num_turns is None else self.n + num_turns
+        try:
+            while len(self.players) > 1 and self.n != last_turn:
+                self.n += 1
+                await self.turn()
+                if self.render:
+                    print(str(self))
+        except BaseException:
+            self.release()
+            raise
+
+        if len(self.players) == 1:
+            logger.info("Player %s has won the game!", self.players[0])
+            return self.players[0]
+        return None
+
+    async def turn(self):
+        for player in self.players:  # eliminations replace `self.players`, so this is the list of the turn's start
+            if not player._seat.alive:  # eliminated earlier in this turn
+                continue
+
+            action, target = await self._ask(player, player.do_action_async(self.players), self._default_action)
+            check_legal_action(action, player, target, self.deck)
+            await self.do_action(player, action, target)
+            if len(self.players) == 1:
+                return
+
+    def _default_action(self, player: Player) -> Tuple[Action, Player]:
+        """First legal action: income, or a coup when it is forced."""
+        mask = legal_action_mask(player, self.players)
+        for action in Action:
+            for idx, is_legal in enumerate(mask[action.value]):
+                if is_legal:
+                    return action, self.players[idx] if action in TARGETED_ACTIONS else None
+
+    async def _ask(self, player: Player, decision: Awaitable[T], default: Callable[[Player], T]) -> T:
+        """Await `decision` of `player` within her timeout, or return `default(player)`."""
+        timeout = self.timeouts.get(id(player))
+        if timeout is None:
+            return await decision
+        try:
+            return await asyncio.wait_for(decision, timeout)
+        except asyncio.TimeoutError:
+            logger.info("Player %s timed out.", player)
+            self.num_timeouts[self.seats.index(player)] += 1
+            return default(player)
+
+    async def _poll(self, players: Sequence[Player], decide: Callable[[Player], Awaitable[bool]]) -> List[bool]:
+        """Ask all `players` concurrently. Timed out players pass."""
+        return list(await asyncio.gather(*(self._ask(player, decide(player), _passes) for player in players)))
+
+    async def do_action(self, source: Player, action: Action, target: Player):
+        """See `Game.do_action`. The adversaries are polled concurrently."""
+        self._announce(source, action, target)
+        transitions = TRANSITIONS[action.value]
+        step, blocker = FIRST_STEP[action.value], None
+        try:
+            while step != Step.END:
+                self.pending = (source, action, target, step)
+                if step == Step.CHALLENGE:
+                    adversaries = self._adversaries(source)
+                    calls = await self._poll(adversaries, lambda player: player.do_challenge_async(source, action))
+                    call = self._challenge(calls, adversaries, source, action)
+                elif step == Step.BLOCK:
+                    blockers = self._blockers(source, action, target)
+                    calls = await self._poll(blockers, lambda player: player.do_counter_action_async(action, source))
+                    blocker, call = self._block(calls, blockers)
+                elif step == Step.BLOCK_CHALLENGE:
+                    counter_action = COUNTER_ACTIONS[action]
+                    calls = await self._poll(
+                        [source], lambda player: player.do_challenge_async(blocker, counter_action)
+                    )
+                    call = self._challenge(calls, [source], blocker, counter_action)
+                else:
+                    call = self._apply(step, source, action, target)
+                step = transitions[step][call]
+        finally:
+            self.pending = None  # no action is being resolved between turns
+
+
+def _passes(player: Player) -> bool:
+    return False
+
+
+async def play_tables(games: Sequence[AsyncGame]) -> List[Player]:
+    """Play games concurrently, and return their winners."""
+    return list(await asyncio.gather(*(game() for game in games)))
+
+
+class RemotePlayer(RandomPlayer):
+    """`RandomPlayer` taking `latency` seconds per decision, as if it queried a model server."""
+
+    def __init__(self, name: str, latency: float, **kwargs):
+        super().__init__(name, **kwargs)
+        self.latency = latency
+
+    async def _do_action_async(self, players: Sequence[Player]) -> Tuple[Action, Player]:
+        await asyncio.sleep(self.latency)
+        return self._do_action(players)
+
+    async def _do_challenge_async(self, source: Player, action: Action) -> bool:
+        await asyncio.sleep(self.latency)
+        return self._do_challenge(source, action)
+
+    async def _do_counter_action_async(self, action: Action, source: Player) -> CounterAction:
+        await asyncio.sleep(self.latency)
+        return self._do_counter_action(action, source)
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description="Play tables of remote players on one event loop.")
+    parser.add_argument("-n", "--num-games", type=int, default=100)
+    parser.add_argument("-p", "--num-players", type=int, default=4)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per decision of every player")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds each player has per decision")
+    args = parser.parse_args(argv)
+
+    games = [
+        AsyncGame(
+            [RemotePlayer(f"Player{idx}", args.latency) for idx in range(args.num_players)],
+            rng=random.Random(args.seed + game_idx),
+            timeout=args.timeout,
+        )
+        for game_idx in range(args.num_games)
+    ]
+    start = time.perf_counter()
+    asyncio.run(play_tables(games))
+    elapsed = time.perf_counter() - start
+    turns = sum(game.n for game in games)
+    print(f"{args.num_games} games, {turns / args.num_games:.2f} turns/game in {elapsed:.2f}s, "
+          f"{sum(map(sum, (game.num_timeouts for game in games)))} timeouts")
+
+
+if __name__ == "__main__":
+    main()
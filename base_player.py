@@ -0,0 +1,137 @@
+"""Player of the tensor-backed engine, whose state is a `Board`, a `DiscardPile` and beliefs."""
+from __future__ import annotations
+
+import logging
+from typing import Tuple
+
+import torch
+
+from beliefs import BeliefTracker
+from board import Board
+from card import CARD_NAMES
+from cards import Card, CardList, DiscardPile
+from events import GameObserver
+from rules import CLAIMED_CARDS
+
+
+class BasePlayer(GameObserver):
+    """
+    Player of seat `indx`. Her beliefs follow her own hand, and the claims, challenges, discards and exchanges of
+    the game she observes: register her in `Game.observers` before the deal, where she is seated at
+    `Game.seats[indx]`.
+    """
+
+    def __init__(self, indx: int, name: str, board: Board, discarded: DiscardPile):
+        self._indx = indx
+        self._name = name
+        self._board = board
+        self._discarded = discarded
+
+        self._cards = CardList()
+        self._coins: int = 0
+        self._logger = logging.getLogger(name)
+
+        self._beliefs = BeliefTracker(board.num_players, indx)
+        self._seat_of = {}  # seat of each player of the observed game, by id
+
+    def __str__(self):
+        return f"{self._name} (player #{self._indx})."
+
+    def __repr__(self):
+        return f"{str(self)} [cards={len(self._cards)} ; coins={self._coins}]"
+
+    @property
+    def board(self) -> torch.Tensor:
+        return self._board.view(self._indx)
+
+    @property
+    def state(self) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        return (self.board, self._discarded.cards, self._beliefs.view())
+
+    @property
+    def cards(self) -> CardList:
+        return self._cards
+
+    @cards.setter
+    def cards(self, x):
+        raise PermissionError
+
+    @property
+    def coins(self) -> int:
+        return self._coins
+
+    @coins.setter
+    def coins(self, x):
+        raise PermissionError
+
+    def add_card(self, card: Card):
+        self._cards.append(card)
+        self._board.add_player_cards(self._indx, 1)
+        self._beliefs.set_hand(self._cards.counts)
+        self._hash_hand(card, self._cards.counts[card.code] - 1)
+
+    def sub_card(self, card: Card):
+        self._cards.remove(card)
+        self._board.sub_player_cards(self._indx, 1)
+        self._beliefs.set_hand(self._cards.counts)
+        self._hash_hand(card, self._cards.counts[card.code] + 1)
+
+    def _hash_hand(self, card: Card, old_count: int):
+        """Update the Zobrist keys of the board, if any, after the count of `card` in the hand changed."""
+        zobrist = self._board.zobrist
+        if zobrist is not None:
+            zobrist.set_hand(self._indx, card.code, old_count, self._cards.counts[card.code])
+
+    def add_coins(self, num_coins: int):
+        self._coins = self._coins + num_coins
+        self._board.add_player_coins(self._indx, num_coins)
+
+    def sub_coins(self, num_coins: int):
+        self._coins = self._coins - num_coins
+        self._board.sub_player_coins(self._indx, num_coins)
+
+    def on_deal(self, game):
+        self._seat_of = {id(player): seat for seat, player in enumerate(game.seats)}
+
+    def _claim(self, player, claimed):
+        if claimed:
+            self._beliefs.claim(self._seat_of[id(player)], [CARD_NAMES[code] for code in claimed])
+
+    def on_action(self, game, source, action, target):
+        self._claim(source, CLAIMED_CARDS.get(action))
+
+    def on_counter_action(self, game, player, counter_action):
+        self._claim(player, CLAIMED_CARDS[counter_action])
+
+    def on_challenge(self, game, challenger, challenged, action, card_name: str, success: bool):
+        if success:
+            self._beliefs.lacks(self._seat_of[id(challenged)], card_name)
+        else:
+            self._beliefs.redraw(self._seat_of[id(challenged)])
+
+    def on_discard(self, game, player, card: Card):
+        self._beliefs.discard(self._seat_of[id(player)], card)
+
+    def on_exchange(self, game, player):
+        self._beliefs.redraw(self._seat_of[id(player)])
+
+    def has(self, card: Card) -> bool:
+        return self._cards.has(card)
+
+    def income(self):
+        self.add_coins(1)
+
+    def foreign_aid(self):
+        self.add_coins(2)
+
+    def tax(self):
+        self.add_coins(3)
+
+    def coup(self):
+        self.sub_coins(7)
+
+    def assassinate(self):
+        self.sub_coins(3)
+
+    def steal(self):
+        self.add_coins(2)
\ No newline at end of file
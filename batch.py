@@ -0,0 +1,314 @@
+"""Batched game engine: many games played in lockstep as tensors."""
+from __future__ import annotations
+
+from typing import Tuple
+
+import torch
+
+from action import TARGETED_ACTIONS, Action, IllegalActionError
+from board import board_views
+from card import CARDS
+from cards import NUM_CARDS_PER_TYPE, pop_batch
+from rules import (
+    BLOCK_CLAIMS, BLOCKERS, CLAIMS, COST, DRAWS, FIRST_STEP, GAIN, KILLS, STOLEN, TRANSITIONS, Blockers, Call, Step,
+)
+
+NUM_CARD_TYPES = len(CARDS)
+NO_PLAYER = -1
+
+# The tables of `rules`, indexed by action value.
+# Card claimed by each action (-1: unchallengeable).
+_REQUIRED_CARD = torch.tensor([claims[0] if claims else -1 for claims in CLAIMS], dtype=torch.long)
+
+# Cards which block each action, and whether anyone may block it (else only the target).
+_BLOCKING_CARDS = torch.zeros((len(Action), NUM_CARD_TYPES), dtype=torch.bool)
+for _action, _claims in enumerate(BLOCK_CLAIMS):
+    _BLOCKING_CARDS[_action, list(_claims)] = True
+_BLOCKED_BY_ANYONE = torch.tensor([blockers == Blockers.ANYONE for blockers in BLOCKERS])
+
+_COST = torch.tensor(COST, dtype=torch.long)
+_GAIN = torch.tensor(GAIN, dtype=torch.long)
+_STOLEN = torch.tensor(STOLEN, dtype=torch.long)
+_KILLS = torch.tensor(KILLS)
+_DRAWS = torch.tensor([draws > 0 for draws in DRAWS])
+
+# Next step by action value, step and call. Calls which can't end a step lead to END.
+_TRANSITIONS = torch.tensor(
+    [[[Step.END if following is None else following for following in row] for row in rows] for rows in TRANSITIONS],
+    dtype=torch.long,
+)
+_FIRST_STEP = torch.tensor(FIRST_STEP, dtype=torch.long)
+_STEPS = tuple(step for step in Step if step != Step.END)
+_CHALLENGE_LOST = torch.tensor(Call.CHALLENGE_LOST)
+_CHALLENGE_WON = torch.tensor(Call.CHALLENGE_WON)
+
+_TARGETED = torch.zeros(len(Action), dtype=torch.bool)
+_TARGETED[[action.value for action in TARGETED_ACTIONS]] = True
+
+
+def legal_action_mask(
+    coins: torch.Tensor, alive: torch.Tensor, actor: torch.Tensor, deck_size: torch.Tensor
+) -> torch.Tensor:
+    """
+    Batched `action.legal_action_mask`.
+
+    Args:
+        coins: (B, P) coins of each player.
+        alive: (B, P) whether each player is still in the game.
+        actor: (B,) index of the acting player.
+        deck_size: (B,) number of cards in the deck.
+
+    Returns:
+        (B, A, P) boolean mask, where mask[b, action.value, target] is True if the action on target is legal.
+        Untargeted actions are marked at the index of the acting player.
+    """
+    B, P = coins.shape
+    games = torch.arange(B)
+    own_coins = coins[games, actor].long()
+    is_actor = torch.arange(P) == actor[:, None]
+    others = alive & ~is_actor
+    forced = (own_coins > 10)[:, None]
+
+    mask = torch.zeros((B, len(Action), P), dtype=torch.bool)
+    mask[:, Action.INCOME.value] = is_actor & ~forced
+    mask[:, Action.FOREIGNAID.value] = is_actor & ~forced
+    mask[:, Action.TAX.value] = is_actor & ~forced
+    mask[:, Action.EXCHANGE.value] = is_actor & ~forced & (deck_size >= 2)[:, None]
+    mask[:, Action.COUP.value] = others & (own_coins >= 7)[:, None]
+    mask[:, Action.ASSASS.value] = others & ~forced & (own_coins >= 3)[:, None]
+    mask[:, Action.STEAL.value] = others & ~forced & (coins >= 2)
+    return mask
+
+
+class BatchGame:
+    """
+    `batch_size` games of `num_players` players each, held as tensors and stepped together.
+
+    In every step, the current player of each unfinished game performs an action. Challenges and blocks are
+    given as inputs; which influence to lose and which cards to keep on exchange are drawn uniformly at random.
+
+    State:
+        coins: (B, P) coins of each player.
+        hands: (B, P, C) number of cards of each type held by each player.
+        deck: (B, C) number of cards of each type in the deck.
+        discarded: (B, C) number of cards of each type in the discard pile.
+        current: (B,) index of the player to act.
+        num_turns: (B,) number of actions performed.
+    """
+
+    def __init__(self, batch_size: int, num_players: int, generator: torch.Generator = None):
+        self.batch_size = batch_size
+        self.num_players = num_players
+        self.generator = generator
+        self._games = torch.arange(batch_size)
+        self._seats = torch.arange(num_players)
+
+        self.coins = torch.zeros((batch_size, num_players), dtype=torch.uint8)
+        self.hands = torch.zeros((batch_size, num_players, NUM_CARD_TYPES), dtype=torch.uint8)
+        self.deck = torch.zeros((batch_size, NUM_CARD_TYPES), dtype=torch.uint8)
+        self.discarded = torch.zeros((batch_size, NUM_CARD_TYPES), dtype=torch.uint8)
+        self.current = torch.zeros(batch_size, dtype=torch.long)
+        self.num_turns = torch.zeros(batch_size, dtype=torch.long)
+        self.reset()
+
+    @property
+    def influence(self) -> torch.Tensor:
+        return self.hands.sum(dim=-1, dtype=torch.uint8)
+
+    @property
+    def alive(self) -> torch.Tensor:
+        return self.influence > 0
+
+    @property
+    def done(self) -> torch.Tensor:
+        return self.alive.sum(dim=-1) <= 1
+
+    @property
+    def winner(self) -> torch.Tensor:
+        """(B,) index of the winner of each finished game, NO_PLAYER for unfinished games."""
+        winner = self.alive.to(torch.uint8).argmax(dim=-1)
+        return torch.where(self.done, winner, torch.full_like(winner, NO_PLAYER))
+
+    @property
+    def board(self) -> torch.Tensor:
+        """(B, P, 2) influence and coins of each player, as stored by `Board`."""
+        return torch.stack((self.influence, self.coins), dim=-1)
+
+    def views(self) -> torch.Tensor:
+        """(B, P, P, 2) board of every game as viewed by every player. See `board.board_views`."""
+        return board_views(self.board)
+
+    def legal_actions(self) -> torch.Tensor:
+        """(B, A, P) legal actions of the current player of each game. See `legal_action_mask`."""
+        return legal_action_mask(self.coins, self.alive, self.current, self.deck.sum(dim=-1))
+
+    def reset(self, mask: torch.Tensor = None):
+        """
+        Deal new games.
+
+        Args:
+            mask: (B,) games to reset. Defaults to all the games.
+        """
+        games = self._games if mask is None else mask.nonzero().squeeze(1)
+        self.coins[games] = 2
+        self.hands[games] = 0
+        self.deck[games] = NUM_CARDS_PER_TYPE
+        self.discarded[games] = 0
+        self.current[games] = 0
+        self.num_turns[games] = 0
+        for seat in range(self.num_players):
+            for _ in range(2):
+                seats = torch.full_like(games, seat)
+                self._give(games, seats, self._draw(games))
+
+    def step(
+        self,
+        action: torch.Tensor,
+        target: torch.Tensor,
+        challenge: torch.Tensor = None,
+        blocker: torch.Tensor = None,
+        block_challenge: torch.Tensor = None,
+        auto_reset: bool = False,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Perform one action in every unfinished game.
+
+        Args:
+            action: (B,) `Action` value played by the current player.
+            target: (B,) target player index. Ignored for untargeted actions.
+            challenge: (B, P) players willing to challenge the action. The first of them in seating order after the
+                current player challenges. Defaults to no challenges.
+            blocker: (B,) index of the player blocking the action, or NO_PLAYER. Only the target may block a steal
+                or an assassination. Defaults to no blocks.
+            block_challenge: (B,) whether the current player challenges the block. Defaults to False.
+            auto_reset: deal new games in place of the games finished by this step.
+
+        Returns:
+            done: (B,) games finished by this step.
+            winner: (B,) winner of the games finished by this step, NO_PLAYER elsewhere.
+        """
+        B = self.batch_size
+        action, target = action.long(), target.long()
+        challenge = torch.zeros((B, self.num_players), dtype=torch.bool) if challenge is None else challenge.bool()
+        blocker = torch.full((B,), NO_PLAYER, dtype=torch.long) if blocker is None else blocker.long()
+        block_challenge = torch.zeros(B, dtype=torch.bool) if block_challenge is None else block_challenge.bool()
+
+        games, actor = self._games, self.current
+        active = ~self.done
+        coins = self.coins[games, actor]
+        targeted = _TARGETED[action]
+        target = torch.where(targeted, target, actor)
+        legal = self.legal_actions()[games, action, target]
+        if (active & ~legal).any():
+            raise IllegalActionError(f"Illegal actions in games {(active & ~legal).nonzero().squeeze(1).tolist()}")
+
+        valid_blocker = (blocker != NO_PLAYER) & (blocker != actor)
+        valid_blocker &= torch.where(_BLOCKED_BY_ANYONE[action], valid_blocker, blocker == target)
+        blocker = blocker.clamp(min=0)
+
+        # Each game goes through the steps of its action, as laid out in `rules`. Steps only lead to later steps, so
+        # a single pass in `Step` order takes every game to the end of its turn.
+        step = torch.where(active, _FIRST_STEP[action], torch.full_like(action, Step.END))
+        for current in _STEPS:
+            at = step == current
+            if not at.any():
+                continue
+            call = torch.full_like(action, Call.NONE)
+            if current == Step.CHALLENGE:
+                # The first willing adversary in seating order after the actor challenges.
+                required = _REQUIRED_CARD[action].clamp(min=0)
+                willing = challenge & self.alive & (self._seats != actor[:, None])
+                challenger = self._first_after(willing, actor)
+                challenged = at & (challenger != NO_PLAYER)
+                has_card = self.hands[games, actor, required] > 0
+                self._lose_influence(challenged & ~has_card, actor)
+                self._lose_influence(challenged & has_card, challenger)
+                self._replace(challenged & has_card, actor, required)
+                call[challenged] = torch.where(has_card, _CHALLENGE_LOST, _CHALLENGE_WON)[challenged]
+            elif current == Step.PAY:
+                cost = _COST[action].to(coins.dtype)
+                self.coins[games, actor] -= torch.where(at, cost, torch.zeros_like(cost))
+            elif current == Step.BLOCK:
+                call[at & valid_blocker & self.alive[games, blocker]] = Call.BLOCK
+            elif current == Step.BLOCK_CHALLENGE:
+                challenged = at & block_challenge & self.alive[games, actor]
+                can_block = (self.hands[games, blocker] > 0) & _BLOCKING_CARDS[action]
+                has_blocking_card = can_block.any(dim=-1)
+                self._lose_influence(challenged & ~has_blocking_card, blocker)
+                self._lose_influence(challenged & has_blocking_card, actor)
+                self._replace(challenged & has_blocking_card, blocker, can_block.to(torch.uint8).argmax(dim=-1))
+                call[challenged] = torch.where(has_blocking_card, _CHALLENGE_LOST, _CHALLENGE_WON)[challenged]
+            else:
+                gain = _GAIN[action].to(coins.dtype)
+                stolen = torch.minimum(self.coins[games, target], _STOLEN[action].to(coins.dtype))
+                steal = at & (_STOLEN[action] > 0)
+                gain = torch.where(steal, stolen, gain)
+                self.coins[games, target] -= torch.where(steal, stolen, torch.zeros_like(stolen))
+                self.coins[games, actor] += torch.where(at, gain, torch.zeros_like(gain))
+                self._lose_influence(at & _KILLS[action] & self.alive[games, target], target)
+                self._exchange(at & _DRAWS[action], actor)
+            step = torch.where(at, _TRANSITIONS[action, current, call], step)
+
+        # Next turn.
+        self.num_turns += active.long()
+        done = active & self.done
+        winner = torch.where(done, self.winner, torch.full_like(actor, NO_PLAYER))
+        self.current = torch.where(active & ~done, self._first_after(self.alive, actor), self.current)
+        if auto_reset and done.any():
+            self.reset(done)
+
+        return done, winner
+
+    def _first_after(self, mask: torch.Tensor, seat: torch.Tensor) -> torch.Tensor:
+        """Index of the first player in `mask` (B, P) in seating order after `seat` (B,), NO_PLAYER if none."""
+        order = (self._seats - seat[:, None] - 1) % self.num_players
+        order = torch.where(mask, order, torch.full_like(order, self.num_players))
+        first = order.argmin(dim=-1)
+        return torch.where(mask.any(dim=-1), first, torch.full_like(first, NO_PLAYER))
+
+    def _sample(self, counts: torch.Tensor) -> torch.Tensor:
+        """Draw a card type from each row of `counts` (N, C) with probability proportional to the counts."""
+        return torch.multinomial(counts.float(), 1, generator=self.generator).squeeze(1)
+
+    def _draw(self, games: torch.Tensor) -> torch.Tensor:
+        deck = self.deck[games]
+        cards = pop_batch(deck, generator=self.generator).squeeze(1)
+        self.deck[games] = deck
+        return cards
+
+    def _give(self, games: torch.Tensor, seats: torch.Tensor, cards: torch.Tensor):
+        self.hands[games, seats, cards] += 1
+
+    def _lose_influence(self, mask: torch.Tensor, seat: torch.Tensor):
+        games = mask.nonzero().squeeze(1)
+        if len(games) == 0:
+            return
+        seats = seat[games]
+        hands = self.hands[games, seats]
+        held = (hands > 0).any(dim=-1)
+        games, seats, hands = games[held], seats[held], hands[held]
+        cards = self._sample(hands)
+        self.hands[games, seats, cards] -= 1
+        self.discarded[games, cards] += 1
+
+    def _replace(self, mask: torch.Tensor, seat: torch.Tensor, card: torch.Tensor):
+        """Return a revealed card to the deck and draw a new one."""
+        games = mask.nonzero().squeeze(1)
+        if len(games) == 0:
+            return
+        seats, cards = seat[games], card[games]
+        self.hands[games, seats, cards] -= 1
+        self.deck[games, cards] += 1
+        self._give(games, seats, self._draw(games))
+
+    def _exchange(self, mask: torch.Tensor, seat: torch.Tensor):
+        games = mask.nonzero().squeeze(1)
+        if len(games) == 0:
+            return
+        seats = seat[games]
+        for _ in range(2):
+            self._give(games, seats, self._draw(games))
+        for _ in range(2):
+            cards = self._sample(self.hands[games, seats])
+            self.hands[games, seats, cards] -= 1
+            self.deck[games, cards] += 1
@@ -0,0 +1,313 @@
+"""Beliefs of players over the hidden cards of the others."""
+from __future__ import annotations
+
+import functools
+from typing import Sequence, Tuple
+
+import torch
+
+from action import BLOCKED_ACTIONS, BLOCKING_CARDS, REQUIRED_CARD, Action, CounterAction
+from card import CARD_CODES, CARD_TYPES, Card
+from cards import NUM_CARDS_PER_TYPE
+from events import GameObserver
+
+NUM_CARD_TYPES = len(CARD_TYPES)
+MAX_HAND = 2  # cards in a hand between turns
+
+
+@functools.lru_cache(maxsize=None)
+def _deals(num_rows: int) -> Tuple[torch.Tensor, ...]:
+    """
+    Tables of the deal of one card type into `num_rows` hands, in `marginals`. The states are the room left in each
+    hand, indexed in base `MAX_HAND + 1`, and one more dead state stands for the shares which don't fit.
+
+    Returns:
+        shares: (D, R) numbers of cards of the type dealt to each hand, at most `NUM_CARDS_PER_TYPE` in all.
+        priors: (D,) 1 / prod(share!) of each share, from the hypergeometric deal.
+        before: (S, D) state from which each share leads to each state.
+        after: (S, D) state each share leads to from each state.
+    """
+    room = torch.cartesian_prod(*[torch.arange(MAX_HAND + 1)] * num_rows).view(-1, num_rows).flip(-1)
+    shares = room[room.sum(dim=-1) <= NUM_CARDS_PER_TYPE]
+    priors = 1 / torch.lgamma(shares.float() + 1).sum(dim=-1).exp()
+    powers = (MAX_HAND + 1) ** torch.arange(num_rows)
+    dead = len(room)
+
+    def state(rooms: torch.Tensor) -> torch.Tensor:
+        fits = ((rooms >= 0) & (rooms <= MAX_HAND)).all(dim=-1)
+        index = (rooms.clamp(0, MAX_HAND) * powers).sum(dim=-1)
+        return torch.where(fits, index, torch.full_like(index, dead))
+
+    return shares, priors, state(room[:, None, :] + shares), state(room[:, None, :] - shares)
+
+
+def marginals(weights: torch.Tensor, sizes: torch.Tensor, unseen: torch.Tensor) -> torch.Tensor:
+    """
+    Expected card counts of each row, when the `unseen` cards are dealt uniformly at random into rows of the given
+    sizes, and each deal is then weighted by the product of `weights[row, card]` over its cards. The last row (the
+    deck) takes the cards left.
+
+    The count constraints are met exactly: the deals are summed over one card type at a time, by a forward-backward
+    pass whose states are the room left in each hand. This costs O(C * (MAX_HAND + 1)^R * D) for the D ways to deal
+    a card type into R hands, with no iterations. If no deal of a game has a positive weight, e.g. when every card a
+    row could hold was ruled out, the weights of that game are ignored.
+
+    Args:
+        weights: (B, R + 1, C) non-negative weights.
+        sizes: (B, R) number of cards of each row but the last, at most `MAX_HAND`.
+        unseen: (B, C) number of cards of each type to deal.
+    """
+    expected, total = _deal(weights, sizes, unseen)
+    inconsistent = total <= 0
+    if inconsistent.any():
+        weights = torch.where(inconsistent[:, None, None], torch.ones_like(weights), weights)
+        expected, total = _deal(weights, sizes, unseen)
+    return expected / total.clamp(min=1e-30)[:, None, None]
+
+
+def _deal(weights: torch.Tensor, sizes: torch.Tensor, unseen: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Unnormalized expected counts of `marginals`, and the total weight of the deals."""
+    B, num_rows = sizes.shape
+    shares, priors, before, after = _deals(num_rows)
+    # Weight of each share of each card type: the hands' weights, and the deck's for the cards left.
+    weights = weights / weights.amax(dim=-1, keepdim=True).clamp(min=1e-30)  # keeps the products in range
+    shared = torch.pow(weights[:, :num_rows, :].transpose(1, 2)[:, :, None, :], shares.float()).prod(dim=-1)
+    rest = unseen.float()[:, :, None] - shares.sum(dim=-1).float()  # (B, C, D) cards left to the deck
+    left = rest.clamp(min=0)
+    deck = torch.pow(weights[:, num_rows, :, None], left) / torch.lgamma(left + 1).exp()
+    shared = shared * priors * torch.where(rest >= 0, deck, torch.zeros_like(deck))  # (B, C, D)
+
+    # Weights of reaching each state, and of filling the hands from it. The last column is the dead state.
+    games, start = torch.arange(B), (sizes.long() * (MAX_HAND + 1) ** torch.arange(num_rows)).sum(dim=-1)
+    forward = torch.zeros((B, len(before) + 1))
+    forward[games, start] = 1
+    forwards = [forward]
+    num_states, before, after = len(before), before.flatten(), after.flatten()
+    for code in range(NUM_CARD_TYPES - 1):
+        previous = forward.index_select(1, before).view(B, num_states, -1)
+        forward = torch.cat((torch.bmm(previous, shared[:, code, :, None]).squeeze(-1), forward[:, -1:]), 1)
+        forwards.append(forward)
+
+    expected = torch.zeros_like(weights)
+    backward = torch.zeros_like(forward)
+    backward[:, 0] = 1  # every hand is full
+    for code in reversed(range(NUM_CARD_TYPES)):
+        following = backward.index_select(1, after).view(B, num_states, -1)  # (B, S, D)
+        dealt = torch.bmm(forwards[code][:, None, :-1], following).squeeze(1) * shared[:, code]
+        expected[:, :num_rows, code] = dealt @ shares.float()
+        expected[:, num_rows, code] = (dealt * rest[:, code]).sum(dim=-1)
+        backward = torch.cat((torch.bmm(following, shared[:, code, :, None]).squeeze(-1), backward[:, -1:]), 1)
+    return expected, backward[games, start]
+
+
+class BatchBeliefTracker:
+    """
+    Beliefs of one observer per game, over `batch_size` games, on how the cards she has not seen are spread
+    between the other players' hands and the deck.
+
+    The beliefs are expected card counts: row j is the expected number of cards of each type in player j's hand
+    (the last row is the deck). They are kept consistent with every count known to the observer: hand sizes, deck
+    size, her own hand and the discard pile. Events update unnormalized likelihood weights of one row in O(C), and
+    the beliefs are computed from the weights when read after an event: the exact expected counts of the deals
+    weighted by them (see `marginals`), in one pass over the rows.
+
+    Challenges and discards are exact evidence. Claims are not: players bluff, and how often depends on their
+    policy. A claim is modeled heuristically, by multiplying the weights of the claimed cards by `claim_weight`, a
+    tuning parameter rather than a likelihood derived from the players' policies. A redrawn hand takes the weights
+    of the deck, which drops what was known of the cards she shuffled back.
+
+    Args:
+        batch_size: number of games.
+        num_players: number of players per game.
+        observer: (B,) seat of the observer in each game.
+        claim_weight: how much more likely a player is to hold a card she claims than another card. 1 ignores
+            claims.
+    """
+
+    def __init__(self, batch_size: int, num_players: int, observer: torch.Tensor, claim_weight: float = 3.0):
+        self.batch_size = batch_size
+        self.num_players = num_players
+        self.observer = observer.long()
+        self.claim_weight = claim_weight
+        self._games = torch.arange(batch_size)
+        self._deck = num_players  # row of the deck
+        # rows of the other players, in seating order after the observer, and of the deck
+        others = (self.observer[:, None] + torch.arange(1, num_players)) % num_players
+        self._rows_of_others = torch.cat((others, torch.full((batch_size, 1), num_players)), dim=1)
+        self.reset(torch.zeros((batch_size, NUM_CARD_TYPES)))
+
+    def reset(self, hands: torch.Tensor):
+        """
+        Start new games, in which every player holds 2 cards.
+
+        Args:
+            hands: (B, C) card counts of the observers' hands.
+        """
+        B, R = self.batch_size, self.num_players + 1
+        self.weights = torch.ones((B, R, NUM_CARD_TYPES))
+        self.sizes = torch.full((B, R), 2.0)
+        self.sizes[:, self._deck] = NUM_CARDS_PER_TYPE * NUM_CARD_TYPES - 2 * self.num_players
+        self.discarded = torch.zeros((B, NUM_CARD_TYPES))
+        self.hands = hands.float().clone()
+        self._beliefs = None
+
+    @property
+    def beliefs(self) -> torch.Tensor:
+        """(B, P + 1, C) expected card counts of each player's hand, and of the deck in the last row."""
+        if self._beliefs is None:
+            games, rows = self._games[:, None], self._rows_of_others
+            unseen = NUM_CARDS_PER_TYPE - self.discarded - self.hands
+            beliefs = torch.empty_like(self.weights)
+            beliefs[games, rows] = marginals(self.weights[games, rows], self.sizes[games, rows[:, :-1]], unseen)
+            beliefs[self._games, self.observer] = self.hands
+            self._beliefs = beliefs
+        return self._beliefs
+
+    def view(self) -> torch.Tensor:
+        """(B, P, C) beliefs over the players' hands, ordered relative to the observer as in `Board.view`."""
+        seats = (self.observer[:, None] + torch.arange(self.num_players)) % self.num_players
+        return self.beliefs[self._games[:, None], seats]
+
+    def _rows(self, player: torch.Tensor, mask: torch.Tensor = None):
+        games = self._games if mask is None else mask.nonzero().squeeze(1)
+        self._beliefs = None
+        return games, player.long()[games]
+
+    def claim(self, player: torch.Tensor, cards: torch.Tensor, mask: torch.Tensor = None):
+        """
+        `player` (B,) announced an action or a block claiming any of `cards` (B, C) (a boolean mask over card types).
+        """
+        games, rows = self._rows(player, mask)
+        weights = self.weights[games, rows] * (1 + (self.claim_weight - 1) * cards[games].float())
+        self.weights[games, rows] = weights / weights.amax(dim=-1, keepdim=True).clamp(min=1e-9)
+
+    def lacks(self, player: torch.Tensor, card: torch.Tensor, mask: torch.Tensor = None):
+        """A challenge showed that `player` (B,) does not hold `card` (B,)."""
+        games, rows = self._rows(player, mask)
+        self.weights[games, rows, card.long()[games]] = 0
+
+    def redraw(self, player: torch.Tensor, mask: torch.Tensor = None):
+        """`player` (B,) shuffled her hand with the deck (after an exchange or revealing a challenged card)."""
+        games, rows = self._rows(player, mask)
+        self.weights[games, rows] = self.weights[games, self._deck]
+
+    def discard(self, player: torch.Tensor, card: torch.Tensor, mask: torch.Tensor = None):
+        """`player` (B,) revealed and discarded `card` (B,)."""
+        games, rows = self._rows(player, mask)
+        cards = card.long()[games]
+        self.sizes[games, rows] -= 1
+        self.discarded[games, cards] += 1
+        is_observer = rows == self.observer[games]
+        self.hands[games[is_observer], cards[is_observer]] -= 1
+
+    def set_hand(self, hands: torch.Tensor, mask: torch.Tensor = None):
+        """The observers' hands (B, C) changed, e.g. after an exchange."""
+        games, _ = self._rows(self.observer, mask)
+        self.hands[games] = hands[games].float()
+
+
+class BeliefTracker:
+    """`BatchBeliefTracker` of a single game, with plain ints for arguments."""
+
+    def __init__(self, num_players: int, observer: int, claim_weight: float = 3.0):
+        self.num_players = num_players
+        self.observer = observer
+        self._batch = BatchBeliefTracker(1, num_players, torch.tensor([observer]), claim_weight)
+
+    def reset(self, hand: Sequence[int]):
+        self._batch.reset(torch.tensor([hand]))
+
+    @property
+    def beliefs(self) -> torch.Tensor:
+        """(P + 1, C) expected card counts of each player's hand, and of the deck in the last row."""
+        return self._batch.beliefs[0]
+
+    def view(self) -> torch.Tensor:
+        """(P, C) beliefs over the players' hands, ordered relative to the observer as in `Board.view`."""
+        return self._batch.view()[0]
+
+    def claim(self, player: int, card_names: Sequence[str]):
+        cards = torch.zeros((1, NUM_CARD_TYPES), dtype=torch.bool)
+        cards[0, [CARD_CODES[name] for name in card_names]] = True
+        self._batch.claim(torch.tensor([player]), cards)
+
+    def lacks(self, player: int, card_name: str):
+        self._batch.lacks(torch.tensor([player]), torch.tensor([CARD_CODES[card_name]]))
+
+    def redraw(self, player: int):
+        self._batch.redraw(torch.tensor([player]))
+
+    def discard(self, player: int, card: Card):
+        self._batch.discard(torch.tensor([player]), torch.tensor([card.code]))
+
+    def set_hand(self, hand: Sequence[int]):
+        self._batch.set_hand(torch.tensor([hand]))
+
+
+class BeliefObserver(GameObserver):
+    """
+    Keeps the beliefs of every seat of a `Game` up to date with its events. The seats are the batch of a single
+    `BatchBeliefTracker`, so each event is one update for all of them.
+
+    Usage:
+        beliefs = BeliefObserver()
+        game.observers.append(beliefs)
+        ...
+        beliefs.beliefs(seat)
+    """
+
+    def __init__(self, claim_weight: float = 3.0):
+        self.claim_weight = claim_weight
+        self.tracker: BatchBeliefTracker = None
+        self._seats = {}
+
+    def beliefs(self, seat: int) -> torch.Tensor:
+        """(P + 1, C) beliefs of the player at `seat`. See `BatchBeliefTracker.beliefs`."""
+        return self.tracker.beliefs[seat]
+
+    def _everyone(self, player) -> torch.Tensor:
+        """`player`'s seat, once per observer."""
+        return torch.full((self.tracker.batch_size,), self._seats[id(player)])
+
+    def _one_card(self, card_name: str) -> torch.Tensor:
+        return torch.full((self.tracker.batch_size,), CARD_CODES[card_name])
+
+    def _sync_hand(self, player):
+        seat = self._seats[id(player)]
+        mask = torch.zeros(self.tracker.batch_size, dtype=torch.bool)
+        mask[seat] = True
+        hands = torch.zeros((self.tracker.batch_size, NUM_CARD_TYPES))
+        hands[seat] = torch.tensor(player._cards.counts, dtype=torch.float)
+        self.tracker.set_hand(hands, mask)
+
+    def on_deal(self, game):
+        num_players = len(game.seats)
+        self._seats = {id(player): seat for seat, player in enumerate(game.seats)}
+        self.tracker = BatchBeliefTracker(num_players, num_players, torch.arange(num_players), self.claim_weight)
+        self.tracker.reset(torch.tensor([player._cards.counts for player in game.seats]))
+
+    def _claim(self, player, card_names: Sequence[str]):
+        cards = torch.zeros((self.tracker.batch_size, NUM_CARD_TYPES), dtype=torch.bool)
+        cards[:, [CARD_CODES[name] for name in card_names]] = True
+        self.tracker.claim(self._everyone(player), cards)
+
+    def on_action(self, game, source, action: Action, target):
+        if action in REQUIRED_CARD:
+            self._claim(source, (REQUIRED_CARD[action],))
+
+    def on_counter_action(self, game, player, counter_action: CounterAction):
+        self._claim(player, BLOCKING_CARDS[BLOCKED_ACTIONS[counter_action]])
+
+    def on_challenge(self, game, challenger, challenged, action, card_name: str, success: bool):
+        if success:
+            self.tracker.lacks(self._everyone(challenged), self._one_card(card_name))
+        else:
+            self.tracker.redraw(self._everyone(challenged))
+            self._sync_hand(challenged)
+
+    def on_discard(self, game, player, card: Card):
+        self.tracker.discard(self._everyone(player), self._one_card(card.name))
+
+    def on_exchange(self, game, player):
+        self.tracker.redraw(self._everyone(player))
+        self._sync_hand(player)
@@ -0,0 +1,57 @@
+"""Clone throughput of games and environments: flat snapshots versus copy.deepcopy."""
+import argparse
+import copy
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from env import CoupEnv  # noqa: E402
+from game import Game  # noqa: E402
+from player import RandomPlayer  # noqa: E402
+
+
+def midgame(num_players: int, num_turns: int = 3) -> Game:
+    game = Game([RandomPlayer(f"Player{idx}") for idx in range(num_players)], rng=random.Random(0))
+    game.deal()
+    for _ in range(num_turns):
+        game.n += 1
+        game.turn()
+    return game
+
+
+def report(name: str, fn, number: int):
+    seconds = timeit.timeit(fn, number=number) / number
+    print(f"{name:24} {seconds * 1e6:10.2f} us {1 / seconds:12.0f} /sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-p", "--num-players", type=int, default=4)
+    parser.add_argument("-n", "--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    game = midgame(args.num_players)
+    snapshot = game.snapshot()
+    rollout_players = [RandomPlayer(f"Rollout{idx}") for idx in range(args.num_players)]
+    report("Game.snapshot", game.snapshot, args.number)
+    report("Game.restore", lambda: game.restore(snapshot), args.number)
+    report("Game.clone+release", lambda: game.clone(rollout_players).release(), args.number)
+    scratch = game.clone(rollout_players)
+    report("Game.clone_into", lambda: game.clone_into(scratch), args.number)
+    report("deepcopy(Game)", lambda: copy.deepcopy(game), args.number // 10)
+
+    env = CoupEnv(args.num_players, seed=0)
+    for _ in range(10):
+        env.step(int(env.legal_actions().nonzero()[0]))
+    snapshot = env.snapshot()
+    report("CoupEnv.snapshot", env.snapshot, args.number)
+    report("CoupEnv.restore", lambda: env.restore(snapshot), args.number)
+    report("CoupEnv.clone", env.clone, args.number)
+    report("deepcopy(CoupEnv)", lambda: copy.deepcopy(env), args.number // 10)
+
+
+if __name__ == "__main__":
+    main()
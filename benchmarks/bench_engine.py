@@ -0,0 +1,207 @@
+"""
+Benchmarks of the engine hot paths, with fixed seeds, saved to JSON and compared between runs.
+
+Usage:
+    python benchmarks/bench_engine.py run -o base.json
+    ... change the engine ...
+    python benchmarks/bench_engine.py run -o new.json
+    python benchmarks/bench_engine.py compare base.json new.json --threshold 0.1
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import timeit
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch  # noqa: E402
+
+from action import Action, check_legal_action  # noqa: E402
+from bench_clone import midgame  # noqa: E402
+from board import Board  # noqa: E402
+from card import card_from_code  # noqa: E402
+from cards import CardList, DiscardPile, GamePile  # noqa: E402
+from deck import Deck  # noqa: E402
+from game import Game  # noqa: E402
+from player import RandomPlayer  # noqa: E402
+from zobrist import ZobristHash  # noqa: E402
+
+
+def measure(fn: Callable[[], object], number: int, repeat: int) -> float:
+    """Best time of `repeat` runs of `number` calls, in seconds per call."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def microbenchmarks(number: int, repeat: int) -> Dict[str, float]:
+    results = {}
+
+    deck = Deck(random.Random(0))
+
+    def draw_and_return():
+        deck.return_cards(CardList([deck.draw_card(), deck.draw_card()]))
+
+    results["Deck.draw_card+return_cards x2"] = measure(draw_and_return, number, repeat)
+
+    pile = GamePile()
+    rng = random.Random(0)
+
+    def pop_and_push():
+        pile.push(pile.pop(rng))
+
+    results["GamePile.pop+push"] = measure(pop_and_push, number, repeat)
+
+    def pop_many_and_push():
+        pile.push_many(CardList(pile.pop_many(2, rng)))
+
+    results["GamePile.pop_many(2)+push_many"] = measure(pop_many_and_push, number, repeat)
+
+    discard_pile = DiscardPile()
+    cards = [card_from_code(code) for code in range(len(discard_pile.cards))]
+
+    def discard_all():  # every card of the deck, then start over
+        for card in cards:
+            for _ in range(3):
+                discard_pile.discard(card)
+        discard_pile.reset()
+
+    results["DiscardPile.discard"] = measure(discard_all, number // 15, repeat) / 15
+
+    board = Board(4)
+    results["Board.view"] = measure(lambda: board.view(2), number, repeat)
+
+    def add_and_sub_coins():
+        board.add_player_coins(1, 2)
+        board.sub_player_coins(1, 2)
+
+    results["Board.add+sub_player_coins"] = measure(add_and_sub_coins, number, repeat)
+    ZobristHash(4).attach(board)
+    results["Board.add+sub_player_coins hashed"] = measure(add_and_sub_coins, number, repeat)
+
+    game = midgame(4)
+    player, target = game.players[0], game.players[1]
+    results["check_legal_action"] = measure(
+        lambda: check_legal_action(Action.STEAL, player, target, game.deck), number, repeat
+    )
+
+    def add_and_sub_player_coins(player):
+        player.coins += 2
+        player.coins -= 2
+
+    results["Player.coins+=-="] = measure(lambda: add_and_sub_player_coins(player), number, repeat)
+    hashed_game = midgame(4)
+    ZobristHash(4).attach_game(hashed_game)
+    hashed_player = hashed_game.players[0]
+    results["Player.coins+=-= hashed"] = measure(lambda: add_and_sub_player_coins(hashed_player), number, repeat)
+
+    snapshot = game.snapshot()
+    game.rng.seed(0)
+
+    def restore_and_tax():
+        game.restore(snapshot)
+        game.do_action(game.players[0], Action.TAX, None)
+
+    results["Game.restore"] = measure(lambda: game.restore(snapshot), number, repeat)
+    results["Game.restore+do_action(TAX)"] = measure(restore_and_tax, number, repeat)
+    return results
+
+
+def games_per_player_count(num_games: int, repeat: int) -> Dict[str, float]:
+    results = {}
+    for num_players in range(2, 7):
+        players = [RandomPlayer(f"Player{idx}") for idx in range(num_players)]
+
+        def play_games():
+            for seed in range(num_games):
+                Game(list(players), rng=random.Random(seed))()
+
+        results[f"Game() {num_players} players"] = measure(play_games, 1, repeat) / num_games
+    return results
+
+
+def logging_cost(num_games: int, repeat: int, num_players: int = 4) -> Dict[str, float]:
+    """The same seeded games with logging disabled (the default WARNING level) and with every record written out."""
+    players = [RandomPlayer(f"Player{idx}") for idx in range(num_players)]
+
+    def play_games():
+        for seed in range(num_games):
+            Game(list(players), rng=random.Random(seed))()
+
+    results = {f"Game() {num_players} players logging off": measure(play_games, 1, repeat) / num_games}
+    root = logging.getLogger()
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+    level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    try:
+        results[f"Game() {num_players} players logging on"] = measure(play_games, 1, repeat) / num_games
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(level)
+    return results
+
+
+def run(args):
+    torch.set_num_threads(1)
+    results = microbenchmarks(args.number, args.repeat)
+    results.update(games_per_player_count(args.num_games, args.repeat))
+    results.update(logging_cost(args.num_games, args.repeat))
+    for name, seconds in results.items():
+        print(f"{name:34} {seconds * 1e6:12.2f} us {1 / seconds:14.0f} /sec")
+
+    if args.output:
+        meta = {"python": platform.python_version(), "platform": platform.platform(), "torch": torch.__version__}
+        with open(args.output, "w") as file:
+            json.dump({"meta": meta, "results": results}, file, indent=2)
+
+
+def compare(args) -> int:
+    with open(args.base) as file:
+        base = json.load(file)["results"]
+    with open(args.new) as file:
+        new = json.load(file)["results"]
+
+    regressions = 0
+    print(f"{'benchmark':34} {'base us':>10} {'new us':>10} {'change':>8}")
+    for name in base:
+        if name not in new:
+            print(f"{name:34} {base[name] * 1e6:10.2f} {'missing':>10}")
+            continue
+        change = new[name] / base[name] - 1
+        flag = ""
+        if change > args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:34} {base[name] * 1e6:10.2f} {new[name] * 1e6:10.2f} {change:+8.1%}{flag}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-o", "--output", help="JSON file to save the results to")
+    run_parser.add_argument("-n", "--number", type=int, default=20000, help="calls per microbenchmark run")
+    run_parser.add_argument("-g", "--num-games", type=int, default=200, help="games per player count and run")
+    run_parser.add_argument("-r", "--repeat", type=int, default=5, help="runs of each benchmark; the best is kept")
+    compare_parser = commands.add_parser("compare", help="compare two saved runs")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("-t", "--threshold", type=float, default=0.1, help="relative slowdown to flag")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
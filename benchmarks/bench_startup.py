@@ -0,0 +1,50 @@
+"""Startup time of fresh interpreters importing the engine, as paid by every spawned worker process."""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statements timed in a fresh interpreter, from the bare interpreter to the tensor-backed engine.
+STATEMENTS = {
+    "python": "pass",
+    "import game": "import game",
+    "import simulate, farm": "import simulate, farm",
+    "import player.BasePlayer": "from player import BasePlayer",
+    "import env": "import env",
+}
+
+
+def startup_time(statement: str, repeat: int) -> float:
+    """Median wall time of a fresh interpreter running `statement`, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=ROOT, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def imports_torch(statement: str) -> bool:
+    check = f"{statement}\nimport sys\nprint('torch' in sys.modules)"
+    return subprocess.run(
+        [sys.executable, "-c", check], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout.strip() == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-r", "--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    for name, statement in STATEMENTS.items():
+        seconds = startup_time(statement, args.repeat)
+        torch = "imports torch" if imports_torch(statement) else ""
+        print(f"{name:26} {seconds * 1e3:9.1f} ms  {torch}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Sequence, Tuple
+
 import torch
 
+if TYPE_CHECKING:
+    from zobrist import ZobristHash
+
 
 class Board:
 
     def __init__(self, num_players: int):
-        self._players = torch.zeros((num_players, 2), dtype=torch.uint8, requires_grad=False)
+        # The rows are stored twice in a row, so the board as viewed by any player is a contiguous slice.
+        self._buffer = torch.zeros((2 * num_players, 2), dtype=torch.uint8, requires_grad=False)
+        self._players = self._buffer[:num_players]
+        self.zobrist: ZobristHash = None  # set by `ZobristHash.attach`
 
     @property
     def shape(self):
@@ -16,7 +26,8 @@ class Board:
 
     def view(self, player: int) -> torch.Tensor:
         """
-        Return a new board as viewed by the player.
+        Return the board as viewed by the player. No data is copied: the result is a view, which reflects later
+        changes to the board and must not be written to.
 
         Args:
             player: Player's index.
@@ -25,7 +36,40 @@ class Board:
             torch tensor of shape (num_players, 2), where the 1st row is the state of the player,
             the 2nd row is the state of the player to her left, ... the last row is of the player to her right.
         """
-        return torch.roll(self._players, player, dims=0)
+        return self._buffer[player:player + self.num_players]
+
+    def views(self) -> torch.Tensor:
+        """
+        Return the board as viewed by every player, without copying.
+
+        Returns:
+            torch tensor of shape (num_players, num_players, 2), where [i] is `self.view(i)`.
+        """
+        num_players = self.num_players
+        return self._buffer.as_strided((num_players, num_players, 2), (2, 2, 1))
+
+    def _add(self, player: int, column: int, value: int):
+        assert 0 <= player < self.num_players
+        value = self._buffer[player, column] + value
+        if self.zobrist is not None:
+            self.zobrist.set_board(player, column, int(self._buffer[player, column]), int(value))
+        self._buffer[player, column] = value
+        self._buffer[player + self.num_players, column] = value
+
+    def set_players(self, players: Sequence[Tuple[int, int]]):
+        """
+        Overwrites the cards count and coins of all the players.
+
+        Args:
+            players: (num_cards, num_coins) of each player.
+        """
+        players = torch.tensor(players, dtype=torch.uint8)
+        if self.zobrist is not None:
+            for seat, (old, new) in enumerate(zip(self._players.tolist(), players.tolist())):
+                for column in range(2):
+                    self.zobrist.set_board(seat, column, old[column], new[column])
+        self._buffer[:self.num_players] = players
+        self._buffer[self.num_players:] = players
 
     def add_player_cards(self, player: int, num_cards: int = 1):
         """
@@ -35,8 +79,7 @@ class Board:
             player: Player's index.
             num_cards: number of cards to add to count.
         """
-        assert 0 <= player < self._num_players
-        self._players[player][0] = self._players[player][0] + num_cards
+        self._add(player, 0, num_cards)
 
     def sub_player_cards(self, player: int, num_cards: int = 1):
         """
@@ -46,8 +89,7 @@ class Board:
             player: Player's index.
             num_cards: number of cards to subtract from count.
         """
-        assert 0 <= player < self._num_players
-        self._players[player][0] = self._players[player][0] - num_cards
+        self._add(player, 0, -num_cards)
 
     def add_player_coins(self, player: int, num_coins: int = 1):
         """
@@ -57,8 +99,7 @@ class Board:
             player: Player's index.
             num_coins: number of coins to add to count.
         """
-        assert 0 <= player < self._num_players
-        self._players[player][1] = self._players[player][1] + num_coins
+        self._add(player, 1, num_coins)
 
     def sub_player_coins(self, player: int, num_coins: int = 1):
         """
@@ -68,5 +109,23 @@ class Board:
             player: Player's index.
             num_coins: number of coins to subtract from count.
         """
-        assert 0 <= player < self._num_players
-        self._players[player][1] = self._players[player][1] - num_coins
+        self._add(player, 1, -num_coins)
+
+
+def board_views(boards: torch.Tensor) -> torch.Tensor:
+    """
+    Return the boards of many games as viewed by every player.
+
+    Args:
+        boards: torch tensor of shape (batch_size, num_players, 2).
+
+    Returns:
+        torch tensor of shape (batch_size, num_players, num_players, 2), where [b, i] is board b as viewed by
+        player i, ordered as in `Board.view`.
+    """
+    batch_size, num_players, features = boards.shape
+    doubled = torch.cat((boards, boards), dim=1).contiguous()
+    return doubled.as_strided(
+        (batch_size, num_players, num_players, features),
+        (2 * num_players * features, features, features, 1),
+    )
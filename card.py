@@ -1,9 +1,24 @@
+import enum
 import inspect
 import sys
 
 
+class CardType(enum.IntEnum):
+    """Integer code of each card, used to index count vectors of cards."""
+    AMBASSADOR = 0
+    ASSASSIN = 1
+    CAPTAIN = 2
+    CONTESSA = 3
+    DUKE = 4
+
+
 class Card:
     name = None
+    code: CardType = None
+    __slots__ = ("idx",)
+
+    def __init__(self, idx: int = None):
+        self.idx = idx
 
     def __str__(self):
         return f"{self.name}"
@@ -12,33 +27,59 @@ class Card:
         return str(self)
 
     def __eq__(self, other):
-        return type(self) == type(other)
+        return isinstance(other, Card) and self.code == other.code
 
     def __ne__(self, other):
         return not self == other
 
+    def __hash__(self):
+        return hash(self.code)
+
 
 class Ambassador(Card):
     name = "Ambassador"
+    code = CardType.AMBASSADOR
+    __slots__ = ()
 
 
 class Assassin(Card):
     name = "Assassin"
+    code = CardType.ASSASSIN
+    __slots__ = ()
 
 
 class Captain(Card):
     name = "Captain"
+    code = CardType.CAPTAIN
+    __slots__ = ()
 
 
 class Contessa(Card):
     name = "Contessa"
+    code = CardType.CONTESSA
+    __slots__ = ()
 
 
 class Duke(Card):
     name = "Duke"
+    code = CardType.DUKE
+    __slots__ = ()
 
 
 CARDS = {
     name: obj for name, obj in inspect.getmembers(sys.modules[__name__], inspect.isclass)
-    if obj.__module__ is __name__ and name != 'Card'
-}
\ No newline at end of file
+    if obj.__module__ is __name__ and issubclass(obj, Card) and name != 'Card'
+}
+
+# Card classes and names indexed by code, and codes by name.
+CARD_TYPES = tuple(sorted(CARDS.values(), key=lambda card: card.code))
+CARD_NAMES = tuple(card.name for card in CARD_TYPES)
+CARD_CODES = {card.name: card.code for card in CARD_TYPES}
+
+# One shared instance per card type. Cards have no state of their own, so these are handed out by the
+# count-based containers instead of allocating new cards.
+_VIEWS = tuple(card() for card in CARD_TYPES)
+
+
+def card_from_code(code: int) -> Card:
+    return _VIEWS[code]
@@ -1,21 +1,214 @@
+from __future__ import annotations
+
 import random
-import torch
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Sequence
+
+from card import (  # noqa: F401
+    Ambassador, Assassin, Captain, Card, CARD_CODES, CARD_TYPES, CARDS, Contessa, Duke, card_from_code
+)
 
-from card import Card, CARDS
+if TYPE_CHECKING:
+    import torch
 
+    from zobrist import ZobristHash
+
+# torch is only imported by the tensor-backed helpers (`DiscardPile`, `GamePile.cards`, `pop_batch`), so the game
+# engine can be used without it.
 
 NUM_CARDS_PER_TYPE = 3
 
 
+def _code(card) -> int:
+    """Code of a card, given as a `Card`, a card name or a code."""
+    if isinstance(card, Card):
+        return card.code
+    if isinstance(card, str):
+        return CARD_CODES[card]
+    return card
+
+
+class CardList:
+    """
+    A hand of cards, stored as a count per card type.
+
+    Iterating yields the shared `Card` view of each held card, in code order.
+    """
+    __slots__ = ("_counts", "_size")
+
+    def __init__(self, cards: Iterable[Card] = ()):
+        self._counts = [0] * len(CARD_TYPES)
+        self._size = 0
+        for card in cards:
+            self.append(card)
+
+    @classmethod
+    def from_counts(cls, counts: Sequence[int]) -> CardList:
+        cards = cls()
+        cards._counts = list(counts)
+        cards._size = sum(cards._counts)
+        return cards
+
+    @classmethod
+    def view(cls, counts: memoryview) -> CardList:
+        """A list whose counts are `counts`, e.g. a slice of a larger buffer, and are written through to it."""
+        cards = cls.__new__(cls)
+        cards._counts = counts
+        cards._size = sum(counts)
+        return cards
+
+    def set_counts(self, counts: Sequence[int]):
+        """Overwrite the counts in place, so a view keeps writing through to its buffer."""
+        for code, count in enumerate(counts):
+            self._counts[code] = count
+        self._size = sum(self._counts)
+
+    def recount(self):
+        """Update the size after the counts were written to from outside, e.g. through the buffer of a view."""
+        self._size = sum(self._counts)
+
+    @property
+    def counts(self) -> List[int]:
+        return self._counts
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self) -> Iterator[Card]:
+        for code, count in enumerate(self._counts):
+            for _ in range(count):
+                yield card_from_code(code)
+
+    def __getitem__(self, idx):
+        return list(self)[idx]
+
+    def __add__(self, other: Iterable[Card]) -> CardList:
+        cards = CardList.from_counts(self._counts)
+        cards.extend(other)
+        return cards
+
+    def __iadd__(self, other: Iterable[Card]) -> CardList:
+        self.extend(other)
+        return self
+
+    def __reduce__(self):
+        # Views are copied as plain lists: their buffers belong to their owners (see `seats.Seat`).
+        return CardList.from_counts, (list(self._counts),)
+
+    def __eq__(self, other):
+        return isinstance(other, CardList) and list(self._counts) == list(other._counts)
+
+    def __str__(self):
+        return str(list(self))
+
+    def __repr__(self):
+        return str(self)
+
+    def append(self, card: Card):
+        self._counts[card.code] += 1
+        self._size += 1
+
+    def extend(self, cards: Iterable[Card]):
+        if isinstance(cards, CardList):
+            for code, count in enumerate(cards._counts):
+                self._counts[code] += count
+            self._size += cards._size
+        else:
+            for card in cards:
+                self.append(card)
+
+    def remove(self, card: Card):
+        code = _code(card)
+        if self._counts[code] == 0:
+            raise ValueError(f"{card} not in {self}")
+        self._counts[code] -= 1
+        self._size -= 1
+
+    def has(self, card_name: str) -> bool:
+        """`card_name` may also be a `Card` or a `CardType`."""
+        return self._counts[_code(card_name)] > 0
+
+    def get(self, card_name: str) -> Card:
+        code = _code(card_name)
+        if self._counts[code] == 0:
+            raise KeyError(card_name)
+        return card_from_code(code)
+
+    def sample(self, rng: random.Random = random) -> Card:
+        """A uniformly random card of the list, which is left unchanged."""
+        draw = rng.randrange(self._size)
+        for code, count in enumerate(self._counts):
+            if draw < count:
+                return card_from_code(code)
+            draw -= count
+
+
+class ObservedCardList(CardList):
+    """
+    A `CardList` reporting every change of a count to `listener(code, old, new)`, if set, e.g. to keep Zobrist keys
+    (see `ZobristHash.attach_game`). Copies are plain `CardList`s, without the listener.
+    """
+    __slots__ = ("listener",)
+
+    def __init__(self, cards: Iterable[Card] = ()):
+        self.listener = None
+        super().__init__(cards)
+
+    @classmethod
+    def view(cls, counts: memoryview) -> ObservedCardList:
+        cards = super().view(counts)
+        cards.listener = None
+        return cards
+
+    def set_counts(self, counts: Sequence[int]):
+        listener = self.listener
+        if listener is None:
+            return super().set_counts(counts)
+        for code, count in enumerate(counts):
+            old = self._counts[code]
+            if old != count:
+                self._counts[code] = count
+                listener(code, old, count)
+        self._size = sum(self._counts)
+
+    def append(self, card: Card):
+        code = card.code
+        count = self._counts[code]
+        self._counts[code] = count + 1
+        self._size += 1
+        if self.listener is not None:
+            self.listener(code, count, count + 1)
+
+    def extend(self, cards: Iterable[Card]):
+        if self.listener is None:
+            return super().extend(cards)
+        for card in cards:
+            self.append(card)
+
+    def remove(self, card: Card):
+        code = _code(card)
+        count = self._counts[code]
+        if count == 0:
+            raise ValueError(f"{card} not in {self}")
+        self._counts[code] = count - 1
+        self._size -= 1
+        if self.listener is not None:
+            self.listener(code, count, count - 1)
+
+
 class DiscardPile:
 
     def reset(self):
-        self._discarded_cards = {x: i for i, x in enumerate(CARDS.values())}
-        self._cards = torch.zeros(len(self._discarded_cards), dtype=torch.uint8, requires_grad=False)
+        import torch
+
+        if self.zobrist is not None:
+            for code, count in enumerate(self._cards.tolist()):
+                self.zobrist.set_discarded(code, count, 0)
+        self._cards = torch.zeros(len(CARD_TYPES), dtype=torch.uint8, requires_grad=False)
 
     def __init__(self, num_cards_per_type: int = NUM_CARDS_PER_TYPE):
         self._num_cards_per_type = num_cards_per_type
-        self._discarded_cards, self._cards = None, None
+        self._cards = None
+        self.zobrist: ZobristHash = None  # set by `ZobristHash.attach`
         self.reset()
 
     @property
@@ -23,15 +216,17 @@ class DiscardPile:
         return self._cards
 
     def discard(self, card: Card):
-        card_type = type(card)
-        card_indx = self._discarded_cards[card_type]
+        card_indx = card.code
+        if self.zobrist is not None:
+            count = int(self._cards[card_indx])
+            self.zobrist.set_discarded(card_indx, count, count + 1)
         self._cards[card_indx] += 1
 
         if not 0 <= self._cards[card_indx] <= self._num_cards_per_type:
             raise RuntimeError
 
     def __str__(self):
-        return str(self._discarded_cards)
+        return str({card.name: int(count) for card, count in zip(CARD_TYPES, self._cards)})
 
     def __repr__(self):
         return str(self)
@@ -40,23 +235,81 @@ class DiscardPile:
 class GamePile:
 
     def reset(self):
-        self._named_cards_to_ids = {x: i for i, x in enumerate(CARDS.values())}
-        self._ids_to_named_cards = {i: x for i, x in enumerate(CARDS.values())}
-        self._cards = self._num_cards_per_type * torch.ones(len(self._named_cards_to_ids), dtype=torch.uint8, requires_grad=False)
+        # Plain ints rather than a tensor: drawing reads and writes single counts, which is far cheaper on lists.
+        self._cards = [self._num_cards_per_type] * len(CARD_TYPES)
+        self._size = sum(self._cards)
 
     def __init__(self, num_cards_per_type: int = NUM_CARDS_PER_TYPE):
         self._num_cards_per_type = num_cards_per_type
-        self._named_cards, self._cards = None, None
+        self._cards, self._size = None, 0
         self.reset()
 
+    def __len__(self):
+        return self._size
+
+    @property
+    def cards(self) -> torch.Tensor:
+        import torch
+
+        return torch.tensor(self._cards, dtype=torch.uint8)
+
     def has(self, card: Card) -> bool:
-        card_type = type(card)
-        card_indx = self._named_cards_to_ids[card_type]
-        return self._cards[card_indx] > 0
-
-    def pop(self) -> Card:
-        cards_in_pile = []
-        [cards_in_pile.extend(self._cards[x] * [x]) for x in range(len(self._cards))]
-        card_idx = random.choice(cards_in_pile)
-        self._cards[card_idx] = self._cards[card_idx] - 1
-        return self._ids_to_named_cards[card_idx]()
+        return self._cards[card.code] > 0
+
+    def set_counts(self, counts: Sequence[int]):
+        self._cards = list(counts)
+        self._size = sum(self._cards)
+
+    def push(self, card: Card):
+        self._cards[card.code] += 1
+        self._size += 1
+
+    def push_many(self, cards: CardList):
+        for code, count in enumerate(cards.counts):
+            self._cards[code] += count
+        self._size += len(cards)
+
+    def pop_index(self, rng: random.Random = random) -> int:
+        """Draw a uniformly random card and return its type index, by walking the cumulative counts."""
+        if self._size == 0:
+            raise IndexError("pop from an empty pile")
+        draw = rng.randrange(self._size)
+        for card_idx, count in enumerate(self._cards):
+            if draw < count:
+                break
+            draw -= count
+        self._cards[card_idx] -= 1
+        self._size -= 1
+        return card_idx
+
+    def pop(self, rng: random.Random = random) -> Card:
+        return card_from_code(self.pop_index(rng))
+
+    def pop_many(self, num_cards: int, rng: random.Random = random) -> List[Card]:
+        """Draw `num_cards` cards without replacement, e.g. for an exchange."""
+        return [self.pop(rng) for _ in range(num_cards)]
+
+
+def pop_batch(piles: torch.Tensor, num_cards: int = 1, generator: torch.Generator = None) -> torch.Tensor:
+    """
+    Draw cards from many piles at once, without replacement. The piles are updated in place.
+
+    Args:
+        piles: (N, C) number of cards of each type in each pile. Every pile must hold at least `num_cards` cards.
+        num_cards: number of cards to draw from each pile.
+        generator: random generator.
+
+    Returns:
+        (N, num_cards) type indices of the drawn cards.
+    """
+    import torch
+
+    drawn = torch.empty((piles.shape[0], num_cards), dtype=torch.long)
+    rows = torch.arange(piles.shape[0])
+    for idx in range(num_cards):
+        cumulative = piles.long().cumsum(dim=-1)
+        draw = (torch.rand(piles.shape[0], generator=generator) * cumulative[:, -1]).long()
+        card_idx = (cumulative <= draw[:, None]).sum(dim=-1)
+        piles[rows, card_idx] -= 1
+        drawn[:, idx] = card_idx
+    return drawn
@@ -1,7 +1,7 @@
 import logging
 import random
 
-from cards import Ambassador, Assassin, Captain, CardList, Contessa, Duke
+from cards import Card, CardList, GamePile
 
 logger = logging.getLogger(__name__)
 
@@ -15,36 +15,34 @@ class EmptyDeckError(Exception):
 
 
 class Deck:
-    def __init__(self):
-        """Create a new 15 cards deck."""
-        cards = [Duke(i) for i in range(3)]
-        cards += [Assassin(i) for i in range(3)]
-        cards += [Ambassador(i) for i in range(3)]
-        cards += [Captain(i) for i in range(3)]
-        cards += [Contessa(i) for i in range(3)]
-        self.cards = CardList(cards)
-        self._shuffle()
+    def __init__(self, rng: random.Random = None):
+        """
+        Create a new 15 cards deck.
+
+        The deck only keeps a count per card type, and every draw picks a uniformly random card among the remaining
+        ones, so it never needs shuffling.
+
+        Args:
+            rng: random generator used for drawing. Defaults to the global `random` module.
+        """
+        self._rng = random if rng is None else rng
+        self.cards = GamePile()
 
     @property
     def cards(self):
         raise CheatingError("Can't look at the Deck's cards.")
 
     @cards.setter
-    def cards(self, cards):
+    def cards(self, cards: GamePile):
         self._cards = cards
 
-    def _shuffle(self):
-        random.shuffle(self._cards)
-
-    def draw_card(self):
+    def draw_card(self) -> Card:
         if len(self) == 0:
             raise EmptyDeckError
-        return self._cards.pop()
+        return self._cards.pop(self._rng)
 
     def return_cards(self, cards: CardList):
-        self._cards += cards
-        assert isinstance(self._cards, CardList)
-        self._shuffle()
+        self._cards.push_many(cards)
 
     def __len__(self):
         return len(self._cards)
@@ -0,0 +1,422 @@
+"""
+Endgame tablebase of two-player games, and a player using it.
+
+The table holds the exact outcome of every two-player state under full information: both hands are known, so a
+claim without the card would always be challenged and a block without the card always called. Play is therefore
+honest, and a state is the mover's hand, the opponent's hand and both players' coins. Exchanges are left out, as
+their draws depend on the deck. Outcomes are found by retrograde analysis: a state is won (or lost) in d moves, or
+drawn when the game can be made to last forever. The score of every move from every state is stored too, so the
+optimal move, or the outcome of any move, is a lookup.
+
+`EndgamePlayer` is a `RandomPlayer` that looks up its decisions in the table once two players are left, averaging
+over the hands the opponent may hold.
+
+Usage:
+    python endgame.py solve endgame.bin
+    python endgame.py play endgame.bin -n 1000
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import math
+import os
+import random
+import time
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+from action import (
+    BLOCKED_ACTIONS, BLOCKING_CARDS, COUNTER_ACTIONS, REQUIRED_CARD, TARGETED_ACTIONS, Action, CounterAction
+)
+from card import CARD_CODES, CARD_TYPES, card_from_code
+from cards import NUM_CARDS_PER_TYPE, Card, CardList
+from player import Player, RandomPlayer
+
+NUM_CARD_TYPES = len(CARD_TYPES)
+MAX_COINS = 13  # a coup is forced above 10 coins, and tax adds 3
+NUM_COINS = MAX_COINS + 1
+
+# Every hand of 1 or 2 cards, as card counts.
+HANDS: List[Tuple[int, ...]] = [
+    tuple(sum(1 for code in cards if code == card) for card in range(NUM_CARD_TYPES))
+    for size in (1, 2) for cards in itertools.combinations_with_replacement(range(NUM_CARD_TYPES), size)
+]
+HAND_INDEX = {hand: idx for idx, hand in enumerate(HANDS)}
+NUM_HANDS = len(HANDS)
+NUM_STATES = NUM_HANDS * NUM_HANDS * NUM_COINS * NUM_COINS
+NUM_ACTIONS = len(Action)
+
+# Scores of states for the player to move: WIN - d for a win in d moves, d - WIN for a loss in d moves.
+WIN = 1000
+DRAW = 0
+WON = -1  # outcome of a move eliminating the opponent
+ILLEGAL = -(2 ** 15)  # score of a move which can't be made
+
+_MAGIC = b"COUPEND3"
+_REQUIRED = {action: CARD_CODES[name] for action, name in REQUIRED_CARD.items()}
+_BLOCKING = {action: [CARD_CODES[name] for name in names] for action, names in BLOCKING_CARDS.items()}
+
+
+class EndgameTableError(Exception):
+    pass
+
+
+def state_index(hand: Sequence[int], opponent: Sequence[int], coins: int, opponent_coins: int) -> int:
+    """Index of a state, seen by the player to move."""
+    return (
+        (HAND_INDEX[tuple(hand)] * NUM_HANDS + HAND_INDEX[tuple(opponent)]) * NUM_COINS + min(coins, MAX_COINS)
+    ) * NUM_COINS + min(opponent_coins, MAX_COINS)
+
+
+def _lose_one(hand: Tuple[int, ...]) -> List[Optional[Tuple[int, ...]]]:
+    """Hands left after losing an influence, one per card that can be lost. None when the last one is lost."""
+    if sum(hand) == 1:
+        return [None]
+    return [tuple(count - (code == card) for code, count in enumerate(hand)) for card in range(NUM_CARD_TYPES)
+            if hand[card]]
+
+
+def moves(hand: Tuple[int, ...], opponent: Tuple[int, ...], coins: int,
+          opponent_coins: int) -> List[Tuple[Action, List[int]]]:
+    """
+    Honest moves of the player to move, each with the states the opponent may be left in (the opponent picks the
+    card to lose) as seen by the opponent, to move next. `WON` when the move eliminates the opponent.
+    """
+    def then(opponent_hand, new_coins, new_opponent_coins) -> int:
+        if opponent_hand is None:
+            return WON
+        return state_index(opponent_hand, hand, new_opponent_coins, new_coins)
+
+    def blocked(action: Action) -> bool:
+        return any(opponent[card] for card in _BLOCKING.get(action, ()))
+
+    if coins > 10:
+        return [(Action.COUP, [then(left, coins - 7, opponent_coins) for left in _lose_one(opponent)])]
+
+    result = [(Action.INCOME, [then(opponent, coins + 1, opponent_coins)])]
+    result.append((Action.FOREIGNAID, [then(opponent, coins + 2 * (not blocked(Action.FOREIGNAID)), opponent_coins)]))
+    if coins >= 7:
+        result.append((Action.COUP, [then(left, coins - 7, opponent_coins) for left in _lose_one(opponent)]))
+    if hand[_REQUIRED[Action.TAX]]:
+        result.append((Action.TAX, [then(opponent, coins + 3, opponent_coins)]))
+    if hand[_REQUIRED[Action.ASSASS]] and coins >= 3:
+        if blocked(Action.ASSASS):  # a blocked assassination is paid for too
+            result.append((Action.ASSASS, [then(opponent, coins - 3, opponent_coins)]))
+        else:
+            result.append((Action.ASSASS, [then(left, coins - 3, opponent_coins) for left in _lose_one(opponent)]))
+    if hand[_REQUIRED[Action.STEAL]] and opponent_coins >= 2:
+        if blocked(Action.STEAL):
+            result.append((Action.STEAL, [then(opponent, coins, opponent_coins)]))
+        else:
+            result.append((Action.STEAL, [then(opponent, coins + 2, opponent_coins - 2)]))
+    return result
+
+
+def _feasible(hand: Tuple[int, ...], opponent: Tuple[int, ...]) -> bool:
+    return all(mine + theirs <= NUM_CARDS_PER_TYPE for mine, theirs in zip(hand, opponent))
+
+
+def _probability(score: int) -> float:
+    return 1.0 if score > 0 else 0.0 if score < 0 else 0.5
+
+
+def move_score(scores: Sequence[int], outcomes: Sequence[int]) -> Optional[int]:
+    """
+    Score of a move for the player making it, given the scores of the states it leads to: the opponent picks their
+    best one. None while one of them is unknown.
+    """
+    worst = None
+    for outcome in outcomes:
+        if outcome == WON:
+            score = WIN - 1
+        else:
+            opponent_score = scores[outcome]
+            if opponent_score is None:
+                return None
+            score = -opponent_score
+            score -= 1 if score > 0 else -1 if score < 0 else 0  # one move further from the end
+        worst = score if worst is None else min(worst, score)
+    return worst
+
+
+class EndgameTable:
+    """
+    Scores and optimal moves of every two-player state, indexed by `state_index`. See the module docstring.
+
+    Args:
+        scores: score of each state, as built by `solve`.
+        move_scores: score of each move of each state, at `state * NUM_ACTIONS + action.value`. `ILLEGAL` for
+            moves which can't be made.
+        best_moves: `Action` value of the optimal move of each state: the fastest win, or else a draw, or else the
+            slowest loss.
+    """
+
+    def __init__(self, scores: array, move_scores: array, best_moves: array):
+        if len(scores) != NUM_STATES or len(move_scores) != NUM_STATES * NUM_ACTIONS or len(best_moves) != NUM_STATES:
+            raise EndgameTableError(
+                f"Expected {NUM_STATES} states, got {len(scores)} scores, {len(move_scores)} move scores and "
+                f"{len(best_moves)} best moves."
+            )
+        self.scores = scores
+        self.move_scores = move_scores
+        self.best_moves = best_moves
+
+    @classmethod
+    def solve(cls) -> EndgameTable:
+        """Compute the table by retrograde analysis."""
+        states, actions = [], {}
+        for hand, opponent in itertools.product(HANDS, HANDS):
+            if not _feasible(hand, opponent):
+                continue
+            for coins, opponent_coins in itertools.product(range(NUM_COINS), range(NUM_COINS)):
+                idx = state_index(hand, opponent, coins, opponent_coins)
+                state_moves = moves(hand, opponent, coins, opponent_coins)
+                states.append((idx, [outcomes for _, outcomes in state_moves]))
+                actions[idx] = [action for action, _ in state_moves]
+
+        scores: List[Optional[int]] = [None] * NUM_STATES
+        unknown = states
+        while unknown:
+            # Each round only reads the scores of the previous ones, so scores are found by increasing distance.
+            found, still_unknown = [], []
+            for idx, all_outcomes in unknown:
+                move_scores = [move_score(scores, outcomes) for outcomes in all_outcomes]
+                best_known = max((score for score in move_scores if score is not None), default=None)
+                if best_known is not None and best_known > 0:
+                    found.append((idx, best_known))
+                elif None not in move_scores:
+                    found.append((idx, best_known))
+                else:
+                    still_unknown.append((idx, all_outcomes))
+            if not found:
+                break
+            for idx, score in found:
+                scores[idx] = score
+            unknown = still_unknown
+
+        # States that are never decided can last forever. Infeasible hands keep the draw score too.
+        scores = [DRAW if score is None else score for score in scores]
+
+        # A move the opponent answers by picking a card is only known once every pick is, possibly well after its
+        # score (their best pick) was reached, so some states are decided later than their distance, and the
+        # distances of the states leading to them are overestimated. Outcomes are right, and the distances are
+        # settled by updating the scores until they are consistent.
+        changed = True
+        while changed:
+            changed = False
+            for idx, all_outcomes in states:
+                score = max(move_score(scores, outcomes) for outcomes in all_outcomes)
+                if score != scores[idx]:
+                    scores[idx], changed = score, True
+        scores = array("h", scores)
+        move_scores = array("h", [ILLEGAL] * (NUM_STATES * NUM_ACTIONS))
+        best_moves = array("B", bytes(NUM_STATES))
+        for idx, all_outcomes in states:
+            best = None
+            for action, outcomes in zip(actions[idx], all_outcomes):
+                score = move_score(scores, outcomes)
+                move_scores[idx * NUM_ACTIONS + action.value] = score
+                if best is None or score > best:
+                    best, best_moves[idx] = score, action.value
+        return cls(scores, move_scores, best_moves)
+
+    def save(self, path: str):
+        with open(path, "wb") as file:
+            file.write(_MAGIC)
+            self.scores.tofile(file)
+            self.move_scores.tofile(file)
+            self.best_moves.tofile(file)
+
+    @classmethod
+    def load(cls, path: str) -> EndgameTable:
+        scores, move_scores, best_moves = array("h"), array("h"), array("B")
+        with open(path, "rb") as file:
+            if file.read(len(_MAGIC)) != _MAGIC:
+                raise EndgameTableError(f"{path} is not an endgame table.")
+            for values, count in ((scores, NUM_STATES), (move_scores, NUM_STATES * NUM_ACTIONS),
+                                  (best_moves, NUM_STATES)):
+                values.frombytes(file.read(count * values.itemsize))
+        return cls(scores, move_scores, best_moves)
+
+    @classmethod
+    def load_or_solve(cls, path: str) -> EndgameTable:
+        """Load the table from `path`, solving and saving it first if the file does not exist."""
+        if not os.path.exists(path):
+            cls.solve().save(path)
+        return cls.load(path)
+
+    def score(self, hand: Sequence[int], opponent: Sequence[int], coins: int, opponent_coins: int) -> int:
+        return self.scores[state_index(hand, opponent, coins, opponent_coins)]
+
+    def win_probability(self, hand: Sequence[int], opponent: Sequence[int], coins: int, opponent_coins: int) -> float:
+        """1 for a won state of the player to move, 0 for a lost one, 0.5 for a draw."""
+        return _probability(self.score(hand, opponent, coins, opponent_coins))
+
+    def move_score(self, hand: Sequence[int], opponent: Sequence[int], coins: int, opponent_coins: int,
+                   action: Action) -> int:
+        """Score of `action` for the player to move, `ILLEGAL` if she can't make it."""
+        return self.move_scores[state_index(hand, opponent, coins, opponent_coins) * NUM_ACTIONS + action.value]
+
+    def legal_moves(self, hand: Sequence[int], opponent: Sequence[int], coins: int,
+                    opponent_coins: int) -> List[Action]:
+        start = state_index(hand, opponent, coins, opponent_coins) * NUM_ACTIONS
+        return [action for action in Action if self.move_scores[start + action.value] != ILLEGAL]
+
+    def best_move(self, hand: Sequence[int], opponent: Sequence[int], coins: int, opponent_coins: int) -> Action:
+        """Optimal move of the player to move: the fastest win, or else a draw, or else the slowest loss."""
+        return Action(self.best_moves[state_index(hand, opponent, coins, opponent_coins)])
+
+
+def _opponent_hands(unseen: Sequence[int], num_cards: int) -> List[Tuple[Tuple[int, ...], int]]:
+    """Hands of `num_cards` cards the opponent may hold, with their number of deals out of the `unseen` cards."""
+    hands = []
+    for hand in HANDS:
+        if sum(hand) == num_cards and all(count <= left for count, left in zip(hand, unseen)):
+            hands.append((hand, math.prod(math.comb(left, count) for count, left in zip(hand, unseen))))
+    return hands
+
+
+class EndgamePlayer(RandomPlayer):
+    """
+    Plays two-player endgames by the table, and the rest of the game as a `RandomPlayer`.
+
+    Decisions maximize the win probability of the table, averaged over the opponent's possible hands, weighted by
+    their number of deals from the cards not seen by the player. It only blocks with the card, and only challenges
+    claims that cannot be true.
+
+    Args:
+        name: player's name.
+        table: the endgame table.
+        rng: random generator of the random play.
+    """
+
+    def __init__(self, name: str, table: EndgameTable, rng: random.Random = None, **kwargs):
+        super().__init__(name, rng, **kwargs)
+        self.table = table
+
+    def _opponent(self) -> Optional[Player]:
+        players = self.game.players if self.game is not None else ()
+        if len(players) != 2 or self not in players:
+            return None
+        return players[0] if players[1] is self else players[1]
+
+    def _unseen(self, hand: Sequence[int]) -> List[int]:
+        discarded = self.game.discard_pile.counts
+        return [NUM_CARDS_PER_TYPE - held - gone for held, gone in zip(hand, discarded)]
+
+    def _expected(self, opponent: Player, hand: Sequence[int], probability) -> float:
+        """Average of `probability(opponent_hand)` over the opponent's possible hands."""
+        hands = _opponent_hands(self._unseen(hand), len(opponent._cards))
+        total = sum(weight for _, weight in hands)
+        return sum(weight * probability(opponent_hand) for opponent_hand, weight in hands) / total
+
+    def _do_action(self, players: Sequence[Player]) -> Tuple[Action, Player]:
+        opponent = self._opponent()
+        if opponent is None:
+            return super()._do_action(players)
+
+        hand, coins, opponent_coins = tuple(self._cards.counts), self.coins, opponent.coins
+        hands = _opponent_hands(self._unseen(hand), len(opponent._cards))
+        if len(hands) == 1:
+            best = self.table.best_move(hand, hands[0][0], coins, opponent_coins)
+        else:
+            # The legal moves only depend on the player's hand and both players' coins.
+            actions = self.table.legal_moves(hand, hands[0][0], coins, opponent_coins)
+            best = max(actions, key=lambda action: sum(
+                weight * _probability(self.table.move_score(hand, opponent_hand, coins, opponent_coins, action))
+                for opponent_hand, weight in hands
+            ))
+        return best, opponent if best in TARGETED_ACTIONS else None
+
+    def _do_challenge(self, source: Player, action) -> bool:
+        if self._opponent() is None:
+            return super()._do_challenge(source, action)
+        if isinstance(action, CounterAction):
+            cards = _BLOCKING[BLOCKED_ACTIONS[action]]
+        else:
+            cards = [_REQUIRED[action]]
+        unseen = self._unseen(self._cards.counts)
+        return all(unseen[card] == 0 for card in cards)
+
+    def _do_counter_action(self, action: Action, source: Player) -> CounterAction:
+        if self._opponent() is None:
+            return super()._do_counter_action(action, source)
+        if any(self._cards.counts[card] for card in _BLOCKING.get(action, ())):
+            return COUNTER_ACTIONS[action]
+        return None
+
+    def _keep_probability(self, opponent: Player, hand: Tuple[int, ...], my_move: bool) -> float:
+        """Win probability of holding `hand`, with the player or the opponent to move."""
+        if my_move:
+            return self._expected(opponent, hand, lambda opponent_hand: self.table.win_probability(
+                hand, opponent_hand, self.coins, opponent.coins))
+        return self._expected(opponent, hand, lambda opponent_hand: 1 - self.table.win_probability(
+            opponent_hand, hand, opponent.coins, self.coins))
+
+    def _lose_influence(self) -> Card:
+        opponent = self._opponent()
+        if opponent is None or len(self._cards) == 1:
+            return super()._lose_influence()
+        # Losing a card on the player's own turn hands the move to the opponent, otherwise it comes back to the player.
+        my_move = self.game.pending is None or self.game.pending[0] is not self
+        hand = tuple(self._cards.counts)
+        codes = [code for code, count in enumerate(hand) if count]
+        options = dict(zip(codes, _lose_one(hand)))
+        card = card_from_code(max(codes, key=lambda code: self._keep_probability(opponent, options[code], my_move)))
+        self._cards.remove(card)
+        return card
+
+    def _exchange(self, extra_cards: CardList) -> CardList:
+        opponent = self._opponent()
+        if opponent is None:
+            return super()._exchange(extra_cards)
+        cards = self._cards + extra_cards
+        codes = [code for code, count in enumerate(cards.counts) for _ in range(count)]
+        keeps = sorted({keep for keep in itertools.combinations(codes, len(self._cards))})
+
+        def counts(keep) -> Tuple[int, ...]:
+            return tuple(keep.count(code) for code in range(NUM_CARD_TYPES))
+
+        keep = max(keeps, key=lambda keep: self._keep_probability(opponent, counts(keep), my_move=False))
+        for code in keep:
+            cards.remove(card_from_code(code))
+        self._cards = CardList.from_counts(counts(keep))
+        return cards
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    solve_parser = commands.add_parser("solve", help="solve the endgames and save the table")
+    solve_parser.add_argument("path")
+    play_parser = commands.add_parser("play", help="play an endgame player against random players")
+    play_parser.add_argument("path")
+    play_parser.add_argument("-n", "--num-games", type=int, default=1000)
+    play_parser.add_argument("-p", "--num-players", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.command == "solve":
+        start = time.perf_counter()
+        table = EndgameTable.solve()
+        table.save(args.path)
+        won = sum(score > 0 for score in table.scores)
+        lost = sum(score < 0 for score in table.scores)
+        print(f"Solved in {time.perf_counter() - start:.1f}s: {won} won, {lost} lost, "
+              f"{NUM_STATES - won - lost} drawn or infeasible states, {os.path.getsize(args.path)} bytes")
+        return
+
+    from game import Game
+
+    table = EndgameTable.load(args.path)
+    wins = 0
+    for seed in range(args.num_games):
+        players = [EndgamePlayer("Endgame", table)]
+        players += [RandomPlayer(f"Random{idx}") for idx in range(1, args.num_players)]
+        shift = seed % args.num_players
+        wins += Game(players[shift:] + players[:shift], rng=random.Random(seed))().name == "Endgame"
+    print(f"Endgame player won {wins}/{args.num_games} games against {args.num_players - 1} random players")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,465 @@
+"""Step-based environment exposing every decision point of a game, and its vectorized wrappers."""
+from __future__ import annotations
+
+import enum
+import random
+from array import array
+from typing import Callable, List, Sequence, Tuple
+
+import torch
+import torch.multiprocessing as mp
+
+from action import TARGETED_ACTIONS, Action, IllegalActionError, legal_action_mask
+from board import Board
+from card import CARD_NAMES, CARDS
+from cards import CardList
+from deck import Deck
+from player import Player
+from rules import (
+    BLOCK_CLAIMS, BLOCKERS, CLAIMS, COST, DRAWS, FIRST_STEP, GAIN, KILLS, STOLEN, TRANSITIONS, Blockers, Call, Step
+)
+from seats import SeatTable
+from snapshot import HEADER_SIZE, pack_header, table_size, unpack_header
+
+NUM_CARD_TYPES = len(CARDS)
+
+
+class Phase(enum.IntEnum):
+    ACTION = 0  # the actor picks an action and a target
+    CHALLENGE = 1  # an adversary decides whether to challenge the action
+    COUNTER_ACTION = 2  # an adversary decides whether to block the action
+    BLOCK_CHALLENGE = 3  # the actor decides whether to challenge the block
+    LOSE_INFLUENCE = 4  # a player picks the card to reveal
+    EXCHANGE = 5  # the actor picks a card to return to the deck
+
+
+class CoupEnv:
+    """
+    A game as a sequence of decisions, made one at a time by the player returned in `info["player"]`.
+
+    Discrete actions are laid out as:
+        [0, 7 * P): `Action` and target, as `action.value * P + target`, where target is relative to the actor
+            (0 for untargeted actions, 1 for the player to her left, ...).
+        7 * P + {0, 1}: pass / challenge or block, in the CHALLENGE, COUNTER_ACTION and BLOCK_CHALLENGE phases.
+        7 * P + 2 + card: card type (as indexed in `CARDS`) to reveal or to return, in the LOSE_INFLUENCE and
+            EXCHANGE phases.
+
+    Observations are float tensors of size `observation_size`, as seen by the deciding player.
+    """
+
+    def __init__(self, num_players: int = 4, seed: int = None):
+        self.num_players = num_players
+        self.num_actions = len(Action) * num_players + 2 + NUM_CARD_TYPES
+        self.observation_size = 5 * num_players + 2 * NUM_CARD_TYPES + len(Phase) + len(Action)
+        self._binary_offset = len(Action) * num_players
+        self._card_offset = self._binary_offset + 2
+        self.players: List[Player] = []
+        self.rng = random.Random(seed)
+        self.reset()
+
+    @property
+    def player(self) -> int:
+        """Index of the deciding player."""
+        return self._decider
+
+    @property
+    def done(self) -> bool:
+        return self.table.num_alive() <= 1
+
+    @property
+    def alive(self) -> List[bool]:
+        """Whether each seat is still in the game."""
+        return [self.table.alive(seat) for seat in range(self.num_players)]
+
+    def reset(self, seed: int = None) -> Tuple[torch.Tensor, dict]:
+        """Deal a new game. Without a seed, the game is drawn from the environment's random stream."""
+        if seed is not None:
+            self.rng = random.Random(seed)
+        self.deck = Deck(self.rng)
+        self.discard_pile = CardList()
+        self.board = Board(self.num_players)
+        self._board_stale = True
+        self.players = [Player(f"Player{idx}", self.rng) for idx in range(self.num_players)]
+        self.table = SeatTable(self.num_players)
+        self.table.bind(self.players)
+        for seat, player in enumerate(self.players):
+            player.coins = 2
+            player.cards = CardList([self.deck.draw_card(), self.deck.draw_card()])
+        self.table.dealt = True
+
+        self.n = 0
+        self.actor = 0
+        self._begin_turn()
+        return self.observation(), self.info()
+
+    def step(self, action: int) -> Tuple[torch.Tensor, torch.Tensor, bool, dict]:
+        """
+        Apply the deciding player's decision.
+
+        Returns:
+            observation of the next deciding player, rewards of all the players (+1 to the winner and -1 to the
+            others when the game ends), whether the game ended, and info.
+        """
+        if self.done:
+            raise RuntimeError("Game is over, call reset().")
+        if action not in self.legal_action_indices():
+            raise IllegalActionError(f"Action {action} is illegal in phase {self._phase.name}.")
+
+        self.apply(action)
+        rewards = torch.zeros(self.num_players)
+        if self.done:
+            rewards -= 1
+            rewards[self.table.alive_seats()[0]] = 1
+        return self.observation(), rewards, self.done, self.info()
+
+    def apply(self, action: int):
+        """Apply a legal decision, without validating it or building an observation. Used by search."""
+        if self._phase == Phase.ACTION:
+            self._on_action(Action(action // self.num_players), action % self.num_players)
+        elif self._phase in (Phase.CHALLENGE, Phase.COUNTER_ACTION, Phase.BLOCK_CHALLENGE):
+            self._on_binary(action == self._binary_offset + 1)
+        else:
+            self._on_card(CARD_NAMES[action - self._card_offset])
+
+    def info(self) -> dict:
+        return {"player": self._decider, "phase": self._phase, "mask": self.legal_actions()}
+
+    def observation(self) -> torch.Tensor:
+        """Observation of the deciding player."""
+        P, seat = self.num_players, self._decider
+        if self._board_stale:  # the board is only written when it is read
+            stats = [[len(player._cards), player._coins] for player in self.players]
+            stats[self.actor][0] -= self._to_return  # cards drawn for an exchange are not influence
+            self.board.set_players(stats)
+            self._board_stale = False
+        obs = torch.zeros(self.observation_size)
+        obs[:2 * P] = self.board.view(seat).flatten()
+        offset = 2 * P
+        obs[offset:offset + NUM_CARD_TYPES] = torch.tensor(self.players[seat]._cards.counts)
+        offset += NUM_CARD_TYPES
+        obs[offset:offset + NUM_CARD_TYPES] = torch.tensor(self.discard_pile.counts)
+        offset += NUM_CARD_TYPES
+        obs[offset + self._phase] = 1
+        offset += len(Phase)
+        if self._action is not None:
+            obs[offset + self._action.value] = 1
+        offset += len(Action)
+        for other in (self.actor, self._target, self._blocker):
+            if other is not None:
+                obs[offset + (other - seat) % P] = 1
+            offset += P
+        return obs
+
+    def legal_actions(self) -> torch.Tensor:
+        """Boolean mask over the discrete actions of the deciding player."""
+        mask = torch.zeros(self.num_actions, dtype=torch.bool)
+        mask[self.legal_action_indices()] = True
+        return mask
+
+    def legal_action_indices(self) -> List[int]:
+        """The legal discrete actions of the deciding player, in increasing order."""
+        P = self.num_players
+        if self._phase == Phase.ACTION:
+            legal = legal_action_mask(self.players[self.actor], self.players, self.deck)
+            targets = [(self.actor + rel) % P for rel in range(P)]
+            return [
+                action * P + rel
+                for action, row in enumerate(legal) for rel, target in enumerate(targets)
+                if row[target] and self.table.alive(target)
+            ]
+        if self._phase in (Phase.CHALLENGE, Phase.COUNTER_ACTION, Phase.BLOCK_CHALLENGE):
+            return [self._binary_offset, self._binary_offset + 1]
+        counts = self.players[self._decider]._cards.counts
+        return [self._card_offset + code for code, count in enumerate(counts) if count > 0]
+
+    def snapshot(self) -> array:
+        """Return the full state of the game, including the pending decision, as a flat buffer. See `Game.snapshot`."""
+        buffer = pack_header(self.n, self.deck, self.discard_pile) + self.table.data
+        none = -1
+        buffer.extend((
+            self.actor, self._phase, self._decider,
+            none if self._action is None else self._action.value,
+            none if self._target is None else self._target,
+            none if self._blocker is None else self._blocker,
+            self._next, self._to_return, len(self._queue),
+        ))
+        buffer.extend(self._queue + [none] * (self.num_players - len(self._queue)))
+        return buffer
+
+    def restore(self, snapshot: array):
+        """Restore a state returned by `snapshot`. The random generator is left as is."""
+        self.n = unpack_header(snapshot, self.deck, self.discard_pile)
+        offset = table_size(self.num_players)
+        self.table.load(snapshot[HEADER_SIZE:offset])
+        self.table.dealt = True
+        self._board_stale = True
+
+        actor, phase, decider, action, target, blocker, then, to_return, queue_size = snapshot[offset:offset + 9]
+        self.actor, self._phase, self._decider = actor, Phase(phase), decider
+        self._action = None if action < 0 else Action(action)
+        self._target = None if target < 0 else target
+        self._blocker = None if blocker < 0 else blocker
+        self._next, self._to_return = Step(then), to_return
+        self._queue = list(snapshot[offset + 9:offset + 9 + queue_size])
+
+    def clone(self, rng: random.Random = None) -> CoupEnv:
+        """
+        Return an independent copy of the environment.
+
+        Args:
+            rng: random generator of the copy. Defaults to a new generator seeded from this environment's.
+        """
+        env = CoupEnv.__new__(CoupEnv)
+        env.num_players, env.num_actions, env.observation_size = self.num_players, self.num_actions, self.observation_size
+        env._binary_offset, env._card_offset = self._binary_offset, self._card_offset
+        env.rng = random.Random(self.rng.getrandbits(64)) if rng is None else rng
+        env.deck = Deck(env.rng)
+        env.discard_pile = CardList()
+        env.board = Board(self.num_players)
+        env.players = [Player(player.name, env.rng) for player in self.players]
+        env.table = SeatTable(self.num_players)
+        env.table.bind(env.players)
+        env.restore(self.snapshot())
+        return env
+
+    def _begin_turn(self):
+        self._phase, self._decider = Phase.ACTION, self.actor
+        self._action, self._target, self._blocker = None, None, None
+        self._queue: List[int] = []
+        self._next = Step.END  # step to go on with once a pending influence loss is resolved
+        self._to_return = 0
+
+    def _adversaries(self) -> List[int]:
+        """Alive adversaries of the actor, in seating order after her."""
+        seats = [(self.actor + rel) % self.num_players for rel in range(1, self.num_players)]
+        return [seat for seat in seats if self.table.alive(seat)]
+
+    def _add_coins(self, seat: int, num_coins: int):
+        self.players[seat].coins += num_coins
+        self._board_stale = True
+
+    def _on_action(self, action: Action, rel: int):
+        self._action = action
+        self._target = (self.actor + rel) % self.num_players if action in TARGETED_ACTIONS else None
+        self._enter(FIRST_STEP[action.value])
+
+    def _enter(self, step: Step):
+        """Go through the steps of the action from `step` (see `rules`), until a decision is pending."""
+        while step != Step.END:
+            if step == Step.CHALLENGE:
+                return self._ask(Phase.CHALLENGE, self._adversaries())
+            if step == Step.BLOCK:
+                return self._ask(Phase.COUNTER_ACTION, self._blockers())
+            if step == Step.BLOCK_CHALLENGE:
+                self._phase, self._decider = Phase.BLOCK_CHALLENGE, self.actor
+                return
+            if step == Step.PAY:
+                self._add_coins(self.actor, -COST[self._action.value])
+            elif self._resolve():
+                return
+            step = self._after(step, Call.NONE)
+        self._end_turn()
+
+    def _after(self, step: Step, call: Call) -> Step:
+        return TRANSITIONS[self._action.value][step][call]
+
+    def _blockers(self) -> List[int]:
+        blockers = BLOCKERS[self._action.value]
+        if blockers == Blockers.ANYONE:
+            return self._adversaries()
+        return [self._target] if blockers == Blockers.TARGET and self.table.alive(self._target) else []
+
+    def _ask(self, phase: Phase, queue: List[int]):
+        """Ask the players in `queue` one by one, until one of them says yes."""
+        self._queue = queue
+        if not queue:
+            return self._enter(self._after(Step.CHALLENGE if phase == Phase.CHALLENGE else Step.BLOCK, Call.NONE))
+        self._phase, self._decider = phase, queue[0]
+
+    def _on_binary(self, yes: bool):
+        if self._phase == Phase.BLOCK_CHALLENGE:
+            if not yes:
+                return self._enter(self._after(Step.BLOCK_CHALLENGE, Call.NONE))
+            blocker = self.players[self._blocker]
+            held = [code for code in BLOCK_CLAIMS[self._action.value] if blocker._cards.counts[code]]
+            if held:
+                blocker.replace(CARD_NAMES[held[0]], self.deck)
+                return self._lose(self.actor, self._after(Step.BLOCK_CHALLENGE, Call.CHALLENGE_LOST))
+            return self._lose(self._blocker, self._after(Step.BLOCK_CHALLENGE, Call.CHALLENGE_WON))
+
+        seat = self._queue.pop(0)
+        if not yes:
+            return self._ask(self._phase, self._queue)
+
+        if self._phase == Phase.CHALLENGE:
+            actor = self.players[self.actor]
+            held = [code for code in CLAIMS[self._action.value] if actor._cards.counts[code]]
+            if held:
+                actor.replace(CARD_NAMES[held[0]], self.deck)
+                return self._lose(seat, self._after(Step.CHALLENGE, Call.CHALLENGE_LOST))
+            return self._lose(self.actor, self._after(Step.CHALLENGE, Call.CHALLENGE_WON))
+
+        self._blocker = seat
+        self._enter(self._after(Step.BLOCK, Call.BLOCK))
+
+    def _on_card(self, card_name: str):
+        player = self.players[self._decider]
+        card = player.get(card_name)
+        player._cards.remove(card)
+        if self._phase == Phase.EXCHANGE:
+            self.deck.return_cards(CardList([card]))
+            self._to_return -= 1
+            if self._to_return == 0:
+                self._end_turn()
+            return
+
+        self.discard_pile.append(card)
+        self._board_stale = True
+        if len(player._cards) == 0:
+            self.table.eliminate(self._decider)
+        if not self.done:
+            self._enter(self._next)
+
+    def _lose(self, seat: int, then: Step):
+        """
+        `seat` loses an influence, then the turn goes on with `then`. The choice is skipped when all her cards are
+        the same.
+        """
+        self._next = then
+        self._phase, self._decider = Phase.LOSE_INFLUENCE, seat
+        counts = self.players[seat]._cards.counts
+        if sum(count > 0 for count in counts) == 1:
+            self._on_card(CARD_NAMES[next(code for code, count in enumerate(counts) if count > 0)])
+
+    def _resolve(self) -> bool:
+        """Carry out the action. Returns whether a decision is pending: an influence loss or an exchange."""
+        value, actor = self._action.value, self.actor
+        if GAIN[value]:
+            self._add_coins(actor, GAIN[value])
+        if STOLEN[value]:
+            stolen = min(STOLEN[value], self.players[self._target].coins)
+            self._add_coins(self._target, -stolen)
+            self._add_coins(actor, stolen)
+        if KILLS[value] and self.table.alive(self._target):
+            self._lose(self._target, Step.END)
+            return True
+        if DRAWS[value]:
+            self.players[actor]._cards.extend([self.deck.draw_card() for _ in range(DRAWS[value])])
+            self._to_return = DRAWS[value]
+            self._phase, self._decider = Phase.EXCHANGE, actor
+            return True
+        return False
+
+    def _end_turn(self):
+        if self.done:
+            return
+        self.n += 1
+        self.actor = next(
+            seat for seat in ((self.actor + rel) % self.num_players for rel in range(1, self.num_players + 1))
+            if self.table.alive(seat)
+        )
+        self._begin_turn()
+
+
+class SyncVectorEnv:
+    """Steps several environments one after the other in the current process. Finished games are reset."""
+
+    def __init__(self, env_fns: Sequence[Callable[[], CoupEnv]]):
+        self.envs = [fn() for fn in env_fns]
+        self.num_envs = len(self.envs)
+
+    def reset(self) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Returns observations (N, D), legal action masks (N, A) and deciding players (N,)."""
+        for env in self.envs:
+            env.reset()
+        return self._collect()
+
+    def step(self, actions: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Returns observations, legal action masks, deciding players, rewards (N, P) and dones (N,)."""
+        rewards, dones = [], []
+        for env, action in zip(self.envs, actions.tolist()):
+            _, reward, done, _ = env.step(action)
+            if done:
+                env.reset()
+            rewards.append(reward)
+            dones.append(done)
+        return (*self._collect(), torch.stack(rewards), torch.tensor(dones))
+
+    def _collect(self):
+        observations = torch.stack([env.observation() for env in self.envs])
+        masks = torch.stack([env.legal_actions() for env in self.envs])
+        players = torch.tensor([env.player for env in self.envs])
+        return observations, masks, players
+
+    def close(self):
+        pass
+
+
+def _worker(env_fn, idx, pipe, observations, masks):
+    env = env_fn()
+    while True:
+        command, data = pipe.recv()
+        if command == "reset":
+            env.reset()
+            reward, done = torch.zeros(env.num_players), False
+        elif command == "step":
+            _, reward, done, _ = env.step(data)
+            if done:
+                env.reset()
+        else:
+            pipe.close()
+            return
+        observations[idx] = env.observation()
+        masks[idx] = env.legal_actions()
+        pipe.send((env.player, reward, done))
+
+
+class AsyncVectorEnv:
+    """
+    Steps each environment in its own worker process. Finished games are reset.
+
+    Observations and legal action masks are written by the workers into shared memory buffers, so only the
+    deciding players, rewards and dones go through the pipes.
+    """
+
+    def __init__(self, env_fns: Sequence[Callable[[], CoupEnv]]):
+        probe = env_fns[0]()
+        self.num_envs = len(env_fns)
+        self.observations = torch.zeros((self.num_envs, probe.observation_size)).share_memory_()
+        self.masks = torch.zeros((self.num_envs, probe.num_actions), dtype=torch.bool).share_memory_()
+
+        ctx = mp.get_context("fork")
+        self._pipes, self._processes = [], []
+        for idx, env_fn in enumerate(env_fns):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker, args=(env_fn, idx, child, self.observations, self.masks), daemon=True
+            )
+            process.start()
+            child.close()
+            self._pipes.append(parent)
+            self._processes.append(process)
+
+    def reset(self) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Returns observations (N, D), legal action masks (N, A) and deciding players (N,)."""
+        for pipe in self._pipes:
+            pipe.send(("reset", None))
+        players, _, _ = self._receive()
+        return self.observations.clone(), self.masks.clone(), players
+
+    def step(self, actions: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Returns observations, legal action masks, deciding players, rewards (N, P) and dones (N,)."""
+        for pipe, action in zip(self._pipes, actions.tolist()):
+            pipe.send(("step", action))
+        players, rewards, dones = self._receive()
+        return self.observations.clone(), self.masks.clone(), players, rewards, dones
+
+    def _receive(self):
+        players, rewards, dones = zip(*[pipe.recv() for pipe in self._pipes])
+        return torch.tensor(players), torch.stack(rewards), torch.tensor(dones)
+
+    def close(self):
+        for pipe in self._pipes:
+            pipe.send(("close", None))
+        for process in self._processes:
+            process.join()
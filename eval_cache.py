@@ -0,0 +1,202 @@
+"""Memoization of policy / value network evaluations, keyed by quantized observations."""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple, Union
+
+import torch
+import torch.multiprocessing as mp
+
+Output = Union[torch.Tensor, Tuple[torch.Tensor, ...]]
+KEY_SIZE = 16  # bytes of a digest
+
+
+def observation_key(inputs: Sequence[torch.Tensor], quantum: float = 1 / 256) -> bytes:
+    """
+    Digest of the inputs of an evaluation, rounded to multiples of `quantum`. Counts are kept exact, and beliefs
+    closer than `quantum` share a key.
+    """
+    digest = hashlib.blake2b(digest_size=KEY_SIZE)
+    for tensor in inputs:
+        digest.update(str(tuple(tensor.shape)).encode())
+        digest.update(torch.round(tensor.detach().float() / quantum).to(torch.int32).numpy().tobytes())
+    return digest.digest()
+
+
+def _nbytes(output: Output) -> int:
+    outputs = output if isinstance(output, tuple) else (output,)
+    return sum(tensor.element_size() * tensor.nelement() for tensor in outputs)
+
+
+class EvaluationCache:
+    """
+    Least recently used evaluations of a model, in the memory of the current process. Safe to use from many
+    threads.
+
+    Usage:
+        cache = EvaluationCache(max_bytes=64 << 20)
+        key = cache.key(observation)
+        output = cache.get(key)
+        if output is None:
+            output = model(observation)
+            cache.put(key, output)
+
+    Args:
+        max_bytes: bound of the size of the keys and outputs held. The least recently used ones are evicted beyond.
+        quantum: resolution of the inputs in the keys, see `observation_key`.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, quantum: float = 1 / 256):
+        self.max_bytes = max_bytes
+        self.quantum = quantum
+        self.nbytes = 0
+        self.counts = [0, 0, 0]  # hits, misses, evictions
+        self._entries: OrderedDict[bytes, Output] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        return int(self.counts[0])
+
+    @property
+    def misses(self) -> int:
+        return int(self.counts[1])
+
+    @property
+    def evictions(self) -> int:
+        return int(self.counts[2])
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, *inputs: torch.Tensor) -> bytes:
+        return observation_key(inputs, self.quantum)
+
+    def get(self, key: bytes) -> Optional[Output]:
+        """The cached output of `key`, or None. Counts a hit or a miss."""
+        with self._lock:
+            output = self._entries.get(key)
+            if output is None:
+                self.counts[1] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counts[0] += 1
+            return output
+
+    def put(self, key: bytes, output: Output):
+        """
+        Cache the output of `key`. The output must not be written to afterwards, and should not be a view of a
+        larger batch, which would be kept alive with it.
+        """
+        size = KEY_SIZE + _nbytes(output)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= KEY_SIZE + _nbytes(previous)
+            self._entries[key] = output
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= KEY_SIZE + _nbytes(evicted)
+                self.counts[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def summary(self) -> str:
+        return (
+            f"cache: {len(self)} entries, {self.nbytes / 2 ** 20:.1f}/{self.max_bytes / 2 ** 20:.1f} MiB, "
+            f"hit rate {self.hit_rate:.3f} ({self.hits} hits, {self.misses} misses), {self.evictions} evictions"
+        )
+
+
+class SharedEvaluationCache(EvaluationCache):
+    """
+    An `EvaluationCache` in shared memory, used by every process it is passed to (e.g. as an argument of a
+    `torch.multiprocessing` worker, as `AsyncVectorEnv` does with its buffers). Outputs must be single float tensors
+    of `output_size` values.
+
+    Entries are held in a table of `ways`-way buckets: a key may only be held by the slots of its bucket, and
+    replaces the least recently used one. Eviction is thus LRU per bucket, which approaches global LRU as buckets
+    grow. Counters are shared too.
+
+    Args:
+        output_size: number of values of an output.
+        max_bytes: size of the table. Its slots hold a key, a recency stamp and an output.
+        quantum: resolution of the inputs in the keys, see `observation_key`.
+        ways: number of slots per bucket.
+    """
+
+    def __init__(self, output_size: int, max_bytes: int = 64 << 20, quantum: float = 1 / 256, ways: int = 8):
+        self.max_bytes = max_bytes
+        self.quantum = quantum
+        self.slot_size = KEY_SIZE + 8 + 4 * output_size
+        self.num_buckets = max(max_bytes // (self.slot_size * ways), 1)
+        self.ways = ways
+        capacity = self.num_buckets * ways
+        self._keys = torch.zeros((capacity, 2), dtype=torch.int64).share_memory_()
+        self._stamps = torch.zeros(capacity, dtype=torch.int64).share_memory_()  # 0 for an empty slot
+        self._values = torch.zeros((capacity, output_size), dtype=torch.float32).share_memory_()
+        self._clock = torch.zeros(1, dtype=torch.int64).share_memory_()
+        self.counts = torch.zeros(3, dtype=torch.int64).share_memory_()
+        self._lock = mp.Lock()
+
+    def __len__(self):
+        return int((self._stamps > 0).sum())
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the occupied slots, as `EvaluationCache` counts the entries it holds."""
+        return len(self) * self.slot_size
+
+    def _locate(self, key: bytes) -> Tuple[int, Tuple[int, int], Optional[int]]:
+        """First slot of the bucket of `key`, `key` as two int64, and its slot if held."""
+        words = (int.from_bytes(key[:8], "little", signed=True), int.from_bytes(key[8:], "little", signed=True))
+        start = (words[0] % self.num_buckets) * self.ways
+        keys = self._keys[start:start + self.ways].tolist()
+        stamps = self._stamps[start:start + self.ways].tolist()
+        for way, (held, stamp) in enumerate(zip(keys, stamps)):
+            if stamp and tuple(held) == words:
+                return start, words, start + way
+        return start, words, None
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return int(self._clock)
+
+    def get(self, key: bytes) -> Optional[torch.Tensor]:
+        with self._lock:
+            _, _, slot = self._locate(key)
+            if slot is None:
+                self.counts[1] += 1
+                return None
+            self._stamps[slot] = self._tick()
+            self.counts[0] += 1
+            return self._values[slot].clone()
+
+    def put(self, key: bytes, output: torch.Tensor):
+        with self._lock:
+            start, words, slot = self._locate(key)
+            if slot is None:
+                stamps = self._stamps[start:start + self.ways]
+                slot = start + int(stamps.argmin())
+                if self._stamps[slot] > 0:
+                    self.counts[2] += 1
+                self._keys[slot] = torch.tensor(words)
+            self._values[slot] = output
+            self._stamps[slot] = self._tick()
+
+    def clear(self):
+        with self._lock:
+            self._stamps.zero_()
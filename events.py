@@ -0,0 +1,87 @@
+"""Observers of the events of a game."""
+from __future__ import annotations
+
+from typing import Callable, List
+
+from action import Action, CounterAction
+from card import Card
+
+
+class GameObserver:
+    """
+    Base class of objects notified of everything that happens in a `Game`. Subclasses override the events they
+    need; the others do nothing. Register observers by appending them to `Game.observers`.
+    """
+
+    def on_deal(self, game):
+        """The cards were dealt."""
+
+    def on_action(self, game, source, action: Action, target):
+        """`source` announced `action` on `target` (None for untargeted actions)."""
+
+    def on_counter_action(self, game, player, counter_action: CounterAction):
+        """`player` announced `counter_action` against the pending action."""
+
+    def on_challenge(self, game, challenger, challenged, action, card_name: str, success: bool):
+        """
+        `challenger` challenged the claim of `challenged` to hold `card_name`, made by announcing `action` (an
+        `Action` or a `CounterAction`). `success` is True if `challenged` did not hold the card. Otherwise she
+        revealed it and replaced it with a card from the deck.
+        """
+
+    def on_discard(self, game, player, card: Card):
+        """`player` lost an influence, revealing `card`."""
+
+    def on_exchange(self, game, player):
+        """`player` exchanged cards with the deck."""
+
+    def on_remove(self, game, player):
+        """`player` lost her last influence and left the game."""
+
+
+class EventSink(GameObserver):
+    """
+    Emits the events of games as dicts, a structured alternative to the free text log. Players are given by name,
+    actions and cards by name, and every event carries the turn number.
+
+    Usage:
+        with open("events.jsonl", "w") as file:
+            game.observers.append(EventSink(lambda event: file.write(json.dumps(event) + "\n")))
+            game()
+
+    Args:
+        emit: called with each event. Defaults to appending it to `self.events`.
+    """
+
+    def __init__(self, emit: Callable[[dict], object] = None):
+        self.events: List[dict] = []
+        self.emit = self.events.append if emit is None else emit
+
+    def on_deal(self, game):
+        self.emit({"event": "deal", "turn": game.n, "players": [player.name for player in game.seats]})
+
+    def on_action(self, game, source, action: Action, target):
+        self.emit({
+            "event": "action", "turn": game.n, "player": source.name, "action": action.name,
+            "target": None if target is None else target.name,
+        })
+
+    def on_counter_action(self, game, player, counter_action: CounterAction):
+        self.emit({
+            "event": "counter_action", "turn": game.n, "player": player.name, "counter_action": counter_action.name,
+        })
+
+    def on_challenge(self, game, challenger, challenged, action, card_name: str, success: bool):
+        self.emit({
+            "event": "challenge", "turn": game.n, "challenger": challenger.name, "challenged": challenged.name,
+            "action": action.name, "card": card_name, "success": success,
+        })
+
+    def on_discard(self, game, player, card: Card):
+        self.emit({"event": "discard", "turn": game.n, "player": player.name, "card": card.name})
+
+    def on_exchange(self, game, player):
+        self.emit({"event": "exchange", "turn": game.n, "player": player.name})
+
+    def on_remove(self, game, player):
+        self.emit({"event": "remove", "turn": game.n, "player": player.name})
@@ -0,0 +1,169 @@
+"""Multi-process self-play farm."""
+from __future__ import annotations
+
+import argparse
+import functools
+import multiprocessing
+import os
+import time
+from collections import Counter
+from typing import Callable, Iterator, List, Sequence, Tuple, TypeVar
+
+from action import Action
+from player import Player
+from simulate import GameResult, play, random_players
+
+T = TypeVar("T")
+
+# Players of the current worker process, created once by `_init_worker`.
+_players: Sequence[Player] = None
+
+
+class Stats:
+    """Aggregated statistics of many games. Merging is order independent."""
+
+    def __init__(self):
+        self.num_games = 0
+        self.wins = Counter()
+        self.turns = 0
+        self.turns_sq = 0
+        self.min_turns = None
+        self.max_turns = None
+        self.action_counts = [0] * len(Action)
+
+    def add(self, result: GameResult):
+        self.num_games += 1
+        self.wins[result.winner] += 1
+        self.turns += result.num_turns
+        self.turns_sq += result.num_turns ** 2
+        self.min_turns = result.num_turns if self.min_turns is None else min(self.min_turns, result.num_turns)
+        self.max_turns = result.num_turns if self.max_turns is None else max(self.max_turns, result.num_turns)
+        for idx, count in enumerate(result.action_counts):
+            self.action_counts[idx] += count
+
+    def merge(self, other: Stats) -> Stats:
+        self.num_games += other.num_games
+        self.wins.update(other.wins)
+        self.turns += other.turns
+        self.turns_sq += other.turns_sq
+        for attr, fn in (("min_turns", min), ("max_turns", max)):
+            values = [x for x in (getattr(self, attr), getattr(other, attr)) if x is not None]
+            setattr(self, attr, fn(values) if values else None)
+        self.action_counts = [x + y for x, y in zip(self.action_counts, other.action_counts)]
+        return self
+
+    @property
+    def win_rates(self) -> dict:
+        return {name: wins / self.num_games for name, wins in sorted(self.wins.items())}
+
+    @property
+    def mean_turns(self) -> float:
+        return self.turns / self.num_games
+
+    @property
+    def std_turns(self) -> float:
+        return max(self.turns_sq / self.num_games - self.mean_turns ** 2, 0.0) ** 0.5
+
+    def __str__(self):
+        out = f"{self.num_games} games | turns: mean {self.mean_turns:.2f}, std {self.std_turns:.2f}, "
+        out += f"min {self.min_turns}, max {self.max_turns}\n"
+        for name, rate in self.win_rates.items():
+            out += f"{name:10} | win rate {rate:.4f}\n"
+        return out
+
+
+def _init_worker(make_players: Callable[[], Sequence[Player]]):
+    global _players
+    _players = make_players()
+
+
+def _play_chunk(seeds: Tuple[int, int]) -> List[GameResult]:
+    start, stop = seeds
+    return [play(_players, seed) for seed in range(start, stop)]
+
+
+def _stats_chunk(seeds: Tuple[int, int]) -> Stats:
+    stats = Stats()
+    for result in _play_chunk(seeds):
+        stats.add(result)
+    return stats
+
+
+def _map_chunks(
+    fn: Callable[[Tuple[int, int]], T],
+    make_players: Callable[[], Sequence[Player]],
+    num_games: int,
+    seed: int,
+    num_workers: int,
+    chunk_size: int,
+) -> Iterator[T]:
+    """Apply `fn` to chunks of consecutive seeds across a process pool, in completion order."""
+    num_workers = num_workers or os.cpu_count()
+    chunks = [(start, min(start + chunk_size, seed + num_games)) for start in range(seed, seed + num_games, chunk_size)]
+    with multiprocessing.Pool(num_workers, initializer=_init_worker, initargs=(make_players,)) as pool:
+        yield from pool.imap_unordered(fn, chunks)
+
+
+def iter_games(
+    make_players: Callable[[], Sequence[Player]],
+    num_games: int,
+    seed: int = 0,
+    num_workers: int = None,
+    chunk_size: int = 256,
+) -> Iterator[GameResult]:
+    """
+    Play games across a process pool and yield their results as they finish.
+
+    Game `i` is seeded with `seed + i` no matter which worker plays it, so the set of results only depends on
+    `seed` and `num_games`. Results are yielded in completion order.
+
+    Args:
+        make_players: picklable callable creating the players. Called once per worker.
+        num_games: number of games to play.
+        seed: seed of the first game.
+        num_workers: number of worker processes. Defaults to the number of cores.
+        chunk_size: number of consecutive seeds sent to a worker at once.
+    """
+    for results in _map_chunks(_play_chunk, make_players, num_games, seed, num_workers, chunk_size):
+        yield from results
+
+
+def run(
+    make_players: Callable[[], Sequence[Player]],
+    num_games: int,
+    seed: int = 0,
+    num_workers: int = None,
+    chunk_size: int = 256,
+) -> Stats:
+    """
+    Play games across a process pool and return their aggregated statistics. See `iter_games`. Each worker
+    aggregates its chunks, and only their `Stats` are sent back and merged.
+    """
+    stats = Stats()
+    for chunk_stats in _map_chunks(_stats_chunk, make_players, num_games, seed, num_workers, chunk_size):
+        stats.merge(chunk_stats)
+    return stats
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--num-games", type=int, default=10000)
+    parser.add_argument("-p", "--num-players", type=int, default=4)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-w", "--num-workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = run(
+        functools.partial(random_players, args.num_players),
+        args.num_games, args.seed, args.num_workers, args.chunk_size,
+    )
+    elapsed = time.perf_counter() - start
+
+    print(stats)
+    print(f"{stats.num_games / elapsed:.1f} games/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,30 +4,54 @@ import io
 import logging
 import random
 import sys
-from typing import Sequence
+from array import array
+from typing import TYPE_CHECKING, List, Sequence, Tuple
 
-from action import Action, CounterAction, check_legal_action
-from cards import CardList
+from action import COUNTER_ACTIONS, Action, check_legal_action
+from card import CARD_NAMES
+from cards import CardList, ObservedCardList
 from deck import Deck
-from player import Player
-
-logger = logging.getLogger(__name__)
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.DEBUG,
-    format="%(asctime)s %(name)-12s %(levelname)-8s %(message)s",
+from events import GameObserver
+from player import Player, RandomPlayer
+from rules import (
+    BLOCKERS, CLAIMED_CARDS, COST, DRAWS, FIRST_STEP, GAIN, KILLS, STOLEN, TRANSITIONS, Blockers, Call, Step
 )
+from seats import Seat, SeatTable
+from snapshot import HEADER_SIZE, pack_header, unpack_header
+
+if TYPE_CHECKING:
+    from zobrist import ZobristHash
 
-random.seed(0)
+logger = logging.getLogger(__name__)
 
 
 class Game:
-    def __init__(self, players: Sequence[Player]):
-        logger.info(f"Game is set up with {players}")
-        self.players = players
-        self.deck = Deck()
-        self.discard_pile = CardList()
+    def __init__(self, players: Sequence[Player], rng: random.Random = None, render: bool = False):
+        """
+        Args:
+            players: the players, in seating order. Their coins and cards move to the game's `SeatTable`, and
+                `Game.players` only holds those still in the game.
+            rng: random generator of the game, handed to every player's policy. The deck and the referee draw from
+                their own generators, seeded from it, so they only depend on the seed and not on how much randomness
+                the policies consume. If None, a fresh unseeded generator is used.
+            render: print the table after every turn.
+        """
+        logger.info("Game is set up with %s", players)
+        self.players = list(players)
+        self.seats = list(players)
+        self.table = SeatTable(len(self.seats))
+        self.table.bind(self.seats)
+        self.rng = random.Random() if rng is None else rng
+        self.render = render
+        self.deck = Deck(random.Random(self.rng.getrandbits(64)))
+        self.referee_rng = random.Random(self.rng.getrandbits(64))  # breaks ties between simultaneous calls
+        self.discard_pile = ObservedCardList()
         self.n = 0
+        self.action_counts = [0] * len(Action)
+        # the action being resolved: source, action, target and the step it is at (see `rules`)
+        self.pending: Tuple[Player, Action, Player, Step] = None
+        self.observers: List[GameObserver] = []
+        self.zobrist: ZobristHash = None  # set by `ZobristHash.attach_game`
 
     @property
     def state(self):
@@ -40,21 +64,119 @@ class Game:
             "turn": self.n
         }
 
-    def __call__(self):
-        logger.info("Game starting.")
+    def deal(self):
+        """Give every player 2 coins and 2 cards."""
+        self._seat_players()
         for player in self.players:
             player.coins = 2
             player.cards = CardList([self.deck.draw_card(), self.deck.draw_card()])
-
-        while True:
-            self.n += 1
-            self.turn()
-            print(str(game))
-
-            # Finalize game
-            if len(self.players) == 1:
-                logger.info(f"Player {self.players[0]} has won the game!")
-                return
+        self.table.dealt = True
+        self.notify("on_deal")
+
+    def _seat_players(self):
+        """Hand the game and its random generator to the policy of every seat."""
+        for player in self.seats:
+            player.game = self
+            player.rng = self.rng
+
+    def notify(self, event: str, *args):
+        """Call `event` (a `GameObserver` method name) on every observer."""
+        for observer in self.observers:
+            getattr(observer, event)(self, *args)
+
+    def __call__(self) -> Player:
+        """Play the game to the end and return the winner."""
+        logger.info("Game starting.")
+        self.deal()
+        return self.play()
+
+    def play(self, num_turns: int = None) -> Player:
+        """
+        Play the dealt game to the end, or for at most `num_turns` turns. If a turn raises, the players are released
+        (see `release`), so they can be seated again.
+
+        Returns:
+            the winner, or None if the game is not over.
+        """
+        last_turn = None if num_turns is None else self.n + num_turns
+        try:
+            while len(self.players) > 1 and self.n != last_turn:
+                self.n += 1
+                self.turn()
+                if self.render:
+                    print(str(self))
+        except BaseException:
+            self.release()
+            raise
+
+        # Finalize game
+        if len(self.players) == 1:
+            logger.info("Player %s has won the game!", self.players[0])
+            return self.players[0]
+        return None
+
+    def snapshot(self) -> array:
+        """
+        Return the state of the table (coins, hands, deck, discard pile, eliminations and turn number) as a flat
+        buffer. The random generator and the position within the current turn are not part of it.
+        """
+        return pack_header(self.n, self.deck, self.discard_pile) + self.table.data
+
+    def restore(self, snapshot: array):
+        """Restore a state returned by `snapshot`, of this game or of a game with the same number of seats."""
+        self.n = unpack_header(snapshot, self.deck, self.discard_pile)
+        self.table.load(snapshot[HEADER_SIZE:])
+        self.table.dealt = True
+        self.players = [self.seats[seat] for seat in self.table.alive_seats()]
+        if self.zobrist is not None:
+            self.zobrist.attach_game(self)
+
+    def clone(self, players: Sequence[Player], rng: random.Random = None) -> Game:
+        """
+        Return a copy of the game, played by `players` instead of the original seats.
+
+        Args:
+            players: one player per seat, in seating order. They take over the coins and cards of the original seats.
+            rng: random generator of the copy, handed to its players. With a seeded generator, the rest of the copy
+                is reproducible.
+        """
+        return self.clone_into(Game(list(players), rng=rng))
+
+    def clone_into(self, game: Game, rng: random.Random = None) -> Game:
+        """
+        Copy the state of the game into `game`, a game with the same number of seats which is not needed anymore,
+        e.g. the previous clone of a search, played by its own seats. Nothing is allocated, so this is much cheaper
+        than `clone`.
+
+        Args:
+            game: the game to overwrite. Its seats are seated at its table again if they were released.
+            rng: new random generator of `game`, handed to its players, and reseeding its deck and referee. Defaults
+                to `game`'s current generators.
+
+        Returns:
+            `game`.
+        """
+        if rng is not None:
+            game.rng = rng
+            game.deck._rng.seed(rng.getrandbits(64))
+            game.referee_rng.seed(rng.getrandbits(64))
+        table = game.table
+        if any(player._seat.table is not table for player in game.seats):
+            table.bind(game.seats)
+        game._seat_players()
+        game.restore(self.snapshot())
+        game.action_counts[:] = self.action_counts
+        game.pending = None
+        return game
+
+    def release(self):
+        """
+        Stop playing the game: its players leave the table, with empty seats of their own, and may then be seated in
+        another game before this one is over (e.g. in the next clone of a search). The table keeps the game's state.
+        """
+        for player in self.seats:
+            if player._seat.data is self.table.data:
+                player._seat = Seat()
 
     def __str__(self):
         out = "\n" + "=" * 70 + "\n"
@@ -71,166 +193,159 @@ class Game:
         return str(self)
 
     def turn(self):
-        for player in self.players:
-            # TODO: must be a better way to exclude from a list
-            # adversaries = [p for p in self.players if p != player]
-            action, target = player.do_action(self.state)  # when a player performs an action, he should recieve the state
+        for player in self.players:  # eliminations replace `self.players`, so this is the list of the turn's start
+            if not player._seat.alive:  # eliminated earlier in this turn
+                continue
+
+            # TODO: when a player performs an action, he should recieve the state
+            action, target = player.do_action(self.players)
             check_legal_action(action, player, target, self.deck)  # TODO: legality of action should be asserted by the player?
             self.do_action(player, action, target)
-            # try:
-            # except StopIteration:
+            if len(self.players) == 1:
+                return
 
     def get_first_challenger(
         self, challenges: Sequence[bool], challengers: Sequence[Player]
     ) -> Player:
-        # TODO: now that there is no use of async wait,
-        # there is no randomness in finding the first challenger
-        for idx, call in enumerate(challenges):
-            if call:
-                return challengers[idx]
-
-    def solve_challenge(self, challenger: Player, challenged: Player, action: Action):
-        def solve(card_name: str):
-            if challenged.has(card_name):
-                logger.info(f"{challenged} has the card {card_name}!")
-                challenged.replace(card_name, self.deck)
-                challenger.lose_influence(self.discard_pile)
-                if (
-                    len(challenger._cards) == 0
-                ):  # TODO, don't use challenger._cards, find a better way
-                    self.remove_player(challenger)
-            else:
-                logger.info(f"{challenged} does not have the card {card_name}!")
-                challenged.lose_influence(self.discard_pile)
-                if (
-                    len(challenged._cards) == 0
-                ):  # TODO, don't use challenged._cards, find a better way
-                    self.remove_player(challenged)
-
-        if action == Action.INCOME:
-            raise RuntimeError("INCOME Action was challenged.")
-        elif action == Action.FOREIGNAID:
-            raise RuntimeError("FOREIGNAID Action was challenged.")
-        elif action == Action.COUP:
-            raise RuntimeError("COUP Action was challenged.")
-        elif action == Action.TAX:
-            solve("Duke")
-        elif action == Action.ASSASS:
-            solve("Assassin")
-        elif action == Action.EXCHANGE:
-            solve("Ambassador")
-        elif action == Action.STEAL:
-            solve("Captain")
-
-        # TODO: implement solving from counter actions
+        """
+        Pick who called first among the `challengers` who called (challenged or blocked). Calls are simultaneous, so
+        every caller is equally likely to be first, regardless of seating.
+        """
+        callers = [challenger for challenger, call in zip(challengers, challenges) if call]
+        return callers[self.referee_rng.randrange(len(callers))] if len(callers) > 1 else callers[0]
+
+    def solve_challenge(self, challenger: Player, challenged: Player, action) -> Call:
+        """
+        `challenger` challenges the card claimed by `challenged` by announcing `action` (an `Action` or a
+        `CounterAction`). A claimant holding the card reveals and replaces it, and the challenger loses an influence.
+        Otherwise the claimant loses one.
+
+        Returns:
+            `Call.CHALLENGE_LOST` or `Call.CHALLENGE_WON`, from the challenger's side.
+        """
+        claimed = CLAIMED_CARDS.get(action)
+        if claimed is None:
+            raise RuntimeError(f"{action} Action was challenged.")
+        held = [code for code in claimed if challenged._cards.counts[code]]
+        card_name = CARD_NAMES[held[0] if held else claimed[0]]
+        if held:
+            logger.info("%s has the card %s!", challenged, card_name)
+            challenged.replace(card_name, self.deck)
+            self.notify("on_challenge", challenger, challenged, action, card_name, False)
+            self._lose_influence(challenger)
+            return Call.CHALLENGE_LOST
+
+        logger.info("%s does not have the card %s!", challenged, card_name)
+        self.notify("on_challenge", challenger, challenged, action, card_name, True)
+        self._lose_influence(challenged)
+        return Call.CHALLENGE_WON
 
     def remove_player(self, removed: Player):
-        for idx, player in enumerate(self.players):
-            if player == removed:
-                self.players.pop(idx)
-                logger.info(f"Player {player} was removed from the game.")
-                logger.debug(f"List of players: {self.players}")
+        seat = removed._seat
+        if not seat.alive:
+            return
+        seat.alive = False
+        self.players = [player for player in self.players if player is not removed]
+        self.notify("on_remove", removed)
+        logger.info("Player %s was removed from the game.", removed)
+        logger.debug("List of players: %s", self.players)
 
     def do_action(self, source: Player, action: Action, target: Player):
-        adversaries = [player for player in self.players if player != source]  # TODO: must be a better way to exclude
-        challenges = [player.do_challenge(source, action) for player in adversaries]  # TODO: do_challange needs state as input
-        if any(challenges):
-            challenger = self.get_first_challenger(challenges, adversaries)  # TODO: change to: shuffle(adverseries) and take the first.
-            self.solve_challenge(
-                challenger=challenger, challenged=source, action=action
-            )
-
-        else:
-            if action == Action.INCOME:
-                source.income()  # TODO: return reward
-
-            elif action == Action.FOREIGNAID:
-                counter_actions = [
-                    player.do_counter_action(Action.FOREIGNAID, source)
-                    for player in adversaries
-                ]
-                if any(counter_actions):
-                    claimed_duke = self.get_first_challenger(
-                        counter_actions, adversaries
-                    )
-                    counter_challenge = source.do_challenge(
-                        claimed_duke, CounterAction.BLOCK_FOREIGNAID
-                    )
-                    if counter_challenge:
-                        self.solve_challenge(
-                            challenger=source,
-                            challenged=claimed_duke,
-                            action=CounterAction.BLOCK_FOREIGNAID,
-                        )
-
+        """Resolve the action of `source` on `target` step by step, as laid out in `rules`."""
+        self._announce(source, action, target)
+        transitions = TRANSITIONS[action.value]
+        step, blocker = FIRST_STEP[action.value], None
+        try:
+            while step != Step.END:
+                self.pending = (source, action, target, step)
+                if step == Step.CHALLENGE:
+                    adversaries = self._adversaries(source)
+                    calls = [player.do_challenge(source, action) for player in adversaries]
+                    call = self._challenge(calls, adversaries, source, action)
+                elif step == Step.BLOCK:
+                    blockers = self._blockers(source, action, target)
+                    calls = [player.do_counter_action(action, source) for player in blockers]
+                    blocker, call = self._block(calls, blockers)
+                elif step == Step.BLOCK_CHALLENGE:
+                    counter_action = COUNTER_ACTIONS[action]
+                    calls = [source.do_challenge(blocker, counter_action)]
+                    call = self._challenge(calls, [source], blocker, counter_action)
                 else:
-                    source.foreign_aid()
-
-            elif action == Action.COUP:
-                source.coup()
-                target.target_coup(self.discard_pile)
-
-                if len(target._cards) == 0:  # TODO implement without _cards
-                    self.remove_player(target)
-
-            elif action == Action.TAX:
-                source.tax()
-
-            elif action == Action.ASSASS:
-                ca = target.target_assassinate(source, self.discard_pile)
-                if ca:
-                    counter_challenge = source.do_challenge(
-                        target, CounterAction.BLOCK_ASSASS
-                    )
-                    if counter_challenge:
-                        self.solve_challenge(
-                            challenger=source,
-                            challenged=target,
-                            action=CounterAction.BLOCK_ASSASS,
-                        )
+                    call = self._apply(step, source, action, target)
+                step = transitions[step][call]
+        finally:
+            self.pending = None  # no action is being resolved between turns
+
+    def resolve_action(self, source: Player, action: Action, target: Player):
+        """Carry out an action that was neither stopped by a challenge nor blocked."""
+        value = action.value
+        if GAIN[value]:
+            source.coins += GAIN[value]
+        if STOLEN[value]:
+            stolen = min(STOLEN[value], target.coins)
+            target.coins -= stolen
+            source.coins += stolen
+        if KILLS[value] and target._seat.alive:
+            self._lose_influence(target)
+        if DRAWS[value]:
+            source.exchange(self.deck)
+
+    # Steps of `do_action`, shared with `AsyncGame`, which only differs in how the players' decisions are awaited.
+
+    def _announce(self, source: Player, action: Action, target: Player):
+        self.action_counts[action.value] += 1
+        self.pending = (source, action, target, FIRST_STEP[action.value])
+        self.notify("on_action", source, action, target)
+
+    def _adversaries(self, source: Player) -> List[Player]:
+        return [player for player in self.players if player is not source]
+
+    def _blockers(self, source: Player, action: Action, target: Player) -> List[Player]:
+        blockers = BLOCKERS[action.value]
+        if blockers == Blockers.ANYONE:
+            return self._adversaries(source)
+        return [target] if blockers == Blockers.TARGET and target._seat.alive else []
+
+    def _challenge(self, calls: Sequence[bool], callers: Sequence[Player], challenged: Player, action) -> Call:
+        if not any(calls):
+            return Call.NONE
+        return self.solve_challenge(self.get_first_challenger(calls, callers), challenged, action)
+
+    def _block(self, calls: Sequence[bool], callers: Sequence[Player]) -> Tuple[Player, Call]:
+        if not any(calls):
+            return None, Call.NONE
+        return self.get_first_challenger(calls, callers), Call.BLOCK
+
+    def _apply(self, step: Step, source: Player, action: Action, target: Player) -> Call:
+        """The steps without decisions: paying for the action, and its resolution."""
+        if step == Step.PAY:
+            source.coins -= COST[action.value]
+        else:
+            self.resolve_action(source, action, target)
+        return Call.NONE
 
-                else:
-                    source.assassinate()
-                    if (
-                        len(target._cards) == 0
-                    ):  # TODO, don't use target._cards, find a better way
-                        self.remove_player(target)
-
-            elif action == Action.EXCHANGE:
-                source.exchange(self.deck)
-
-            elif action == Action.STEAL:
-                ca = target.target_steal(source)
-                if ca:
-                    counter_challenge = source.do_challenge(
-                        target, CounterAction.BLOCK_STEAL
-                    )
-                    if counter_challenge:
-                        self.solve_challenge(
-                            challenger=source,
-                            challenged=target,
-                            action=CounterAction.BLOCK_STEAL,
-                        )
-
-                else:
-                    source.steal()
+    def _lose_influence(self, player: Player):
+        if player.lose_influence(self.discard_pile) == 0:
+            self.remove_player(player)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.DEBUG,
+        format="%(asctime)s %(name)-12s %(levelname)-8s %(message)s",
+    )
+
     players = [
         RandomPlayer("Acapella"),
         RandomPlayer("Boogy"),
         RandomPlayer("Classic"),
         RandomPlayer("Disco"),
     ]
-    game = Game(players)
+    game = Game(players, rng=random.Random(0), render=True)
     game()
 
 """TODO:
 - block stealing - must state using what card
-- implement solve_challenge() for counter-actions
-- make all counterable actions use the same method for solving challenges
 - break Player.counter_action() into the different actions.
-- unit-tests for every action / counter-action taken.
-    - break do_action() so unit-tests can run on it
 """
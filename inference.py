@@ -0,0 +1,284 @@
+"""Batched policy inference for neural players of many concurrent games."""
+from __future__ import annotations
+
+import argparse
+import bisect
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, NamedTuple, Sequence
+
+import torch
+
+from env import CoupEnv
+from eval_cache import EvaluationCache
+from game import Game
+from ismcts import DecisionPlayer, Root, determinize
+from player import Player, RandomPlayer
+
+
+class Histogram:
+    """
+    Counts of values between consecutive bounds: bucket i holds the values in (bounds[i - 1], bounds[i]], and the
+    last bucket the values above the last bound.
+    """
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile (inf for the last bucket)."""
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.bounds + [float("inf")], self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return float("inf")
+
+    def __str__(self):
+        rows = []
+        lower = None
+        for bound, count in zip(self.bounds + [None], self.counts):
+            label = f"> {lower:.3g}" if bound is None else f"<= {bound:.3g}"
+            rows.append(f"{label:>12} | {count:8d} | {'#' * round(50 * count / max(self.total, 1))}")
+            lower = bound
+        return "\n".join(rows)
+
+
+class _Request(NamedTuple):
+    inputs: Sequence[torch.Tensor]
+    future: Future
+    start: float
+    key: bytes  # key of the inputs in the broker's cache, if any
+
+
+class InferenceBroker:
+    """
+    Runs a model on batches of the requests of many threads. A server thread waits for a request, then gathers
+    more until `max_batch_size` requests are pending or `max_wait` seconds have passed, runs one forward pass and
+    hands every request its row of the output.
+
+    Usage:
+        broker = InferenceBroker(model)
+        output = broker(observation)  # from any thread
+        broker.close()
+
+    Args:
+        model: called with a batch of each input, stacked along a new first dimension, and returns a batched
+            tensor (or a tuple of them).
+        max_batch_size: maximal number of requests per forward pass.
+        max_wait: seconds to wait for more requests after the first one of a batch.
+        cache: if given, requests whose inputs were already evaluated are answered from it, without waiting for a
+            batch.
+    """
+
+    def __init__(self, model: Callable[..., torch.Tensor], max_batch_size: int = 64, max_wait: float = 1e-3,
+                 cache: EvaluationCache = None):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.cache = cache
+        self.batch_sizes = Histogram([2 ** i for i in range(max_batch_size.bit_length())])
+        self.latencies = Histogram([10 ** (exponent / 2) for exponent in range(-10, 1)])  # 10us to 1s
+        self._requests = queue.SimpleQueue()
+        self._server = threading.Thread(target=self._serve, name="InferenceBroker", daemon=True)
+        self._server.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, *inputs: torch.Tensor) -> Future:
+        """Queue one request, made of one unbatched tensor per model input."""
+        future = Future()
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(*inputs)
+            output = self.cache.get(key)
+            if output is not None:
+                future.set_result(output)
+                return future
+        self._requests.put(_Request(inputs, future, time.perf_counter(), key))
+        return future
+
+    def __call__(self, *inputs: torch.Tensor):
+        """Run the model on one request, and wait for its output."""
+        return self.submit(*inputs).result()
+
+    def close(self):
+        """Serve the pending requests, then stop the server thread."""
+        self._requests.put(None)
+        self._server.join()
+
+    def summary(self) -> str:
+        out = (
+            f"batch size: mean {self.batch_sizes.mean:.1f}, {self.batch_sizes.total} batches\n{self.batch_sizes}\n"
+            f"latency (s): mean {self.latencies.mean:.2e}, p50 <= {self.latencies.quantile(0.5):.3g}, "
+            f"p99 <= {self.latencies.quantile(0.99):.3g}\n{self.latencies}"
+        )
+        if self.cache is not None:
+            out += f"\n{self.cache.summary()}"
+        return out
+
+    def _serve(self):
+        closing = False
+        while not closing:
+            request = self._requests.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self._requests.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+            self._run(batch)
+
+    def _run(self, batch: List[_Request]):
+        try:
+            inputs = [torch.stack(column) for column in zip(*(request.inputs for request in batch))]
+            with torch.no_grad():
+                outputs = self.model(*inputs)
+        except Exception as error:
+            for request in batch:
+                request.future.set_exception(error)
+            return
+
+        self.batch_sizes.add(len(batch))
+        for idx, request in enumerate(batch):
+            if isinstance(outputs, tuple):
+                output = tuple(output[idx] for output in outputs)
+            else:
+                output = outputs[idx]
+            if self.cache is not None:  # rows are views of the whole batch, which the cache would keep alive
+                output = tuple(row.clone() for row in output) if isinstance(output, tuple) else output.clone()
+                self.cache.put(request.key, output)
+            request.future.set_result(output)
+            self.latencies.add(time.perf_counter() - request.start)
+
+
+class NeuralPlayer(DecisionPlayer):
+    """
+    Plays by a policy network served by an `InferenceBroker`. The network maps `CoupEnv` observations to logits
+    over the `CoupEnv` actions; illegal actions are masked out.
+
+    Args:
+        name: player's name.
+        broker: broker serving the policy network.
+        rng: random generator used to sample actions.
+        greedy: play the most likely legal action, instead of sampling.
+    """
+
+    def __init__(self, name: str, broker: InferenceBroker, rng: random.Random = None, greedy: bool = False):
+        super().__init__(name, rng)
+        self.broker = broker
+        self.greedy = greedy
+        self._env: CoupEnv = None
+
+    def _best(self, root: Root) -> int:
+        if self._env is None or self._env.num_players != root.num_players:
+            self._env = CoupEnv(root.num_players)
+        # The other players' cards are hidden from the observation, so any consistent deal gives the same one.
+        self._env.restore(determinize(root, self.rng))
+        logits = self.broker(self._env.observation())
+        logits = logits.masked_fill(~self._env.legal_actions(), float("-inf"))
+        if self.greedy:
+            return int(logits.argmax())
+        probs = torch.softmax(logits, dim=0).tolist()
+        return self.rng.choices(range(len(probs)), weights=probs)[0]
+
+
+def mlp_policy(num_players: int, hidden_size: int = 128) -> torch.nn.Module:
+    """An untrained policy network for `NeuralPlayer`."""
+    env = CoupEnv(num_players)
+    return torch.nn.Sequential(
+        torch.nn.Linear(env.observation_size, hidden_size),
+        torch.nn.ReLU(),
+        torch.nn.Linear(hidden_size, env.num_actions),
+    )
+
+
+def play_concurrently(make_players: Callable[[int], Sequence[Player]], num_games: int, num_threads: int,
+                      seed: int = 0) -> List[str]:
+    """
+    Play `num_games` games, `num_threads` at a time, each on its own thread. Game `i` is seeded with `seed + i`.
+
+    Args:
+        make_players: returns the players of game `i`.
+
+    Returns:
+        the name of the winner of each game.
+    """
+    winners = [None] * num_games
+    next_game = iter(range(num_games))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                idx = next(next_game, None)
+            if idx is None:
+                return
+            winners[idx] = Game(list(make_players(idx)), rng=random.Random(seed + idx))().name
+
+    threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return winners
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description="Play neural players against random ones, on many threads.")
+    parser.add_argument("-n", "--num-games", type=int, default=200)
+    parser.add_argument("-p", "--num-players", type=int, default=4)
+    parser.add_argument("-t", "--num-threads", type=int, default=32)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait", type=float, default=1e-3)
+    parser.add_argument("--cache-mib", type=float, default=0, help="cache evaluations in this many MiB")
+    args = parser.parse_args(argv)
+
+    torch.manual_seed(0)
+    model = mlp_policy(args.num_players)
+    cache = EvaluationCache(int(args.cache_mib * 2 ** 20)) if args.cache_mib else None
+    with InferenceBroker(model, args.max_batch_size, args.max_wait, cache) as broker:
+        def make_players(idx: int) -> List[Player]:
+            return [NeuralPlayer("Neural", broker)] + [
+                RandomPlayer(f"Random{seat}") for seat in range(1, args.num_players)
+            ]
+
+        start = time.perf_counter()
+        winners = play_concurrently(make_players, args.num_games, args.num_threads)
+        elapsed = time.perf_counter() - start
+
+    decisions = broker.batch_sizes.sum + (cache.hits if cache is not None else 0)
+    print(f"{args.num_games} games in {elapsed:.2f}s, {decisions / elapsed:.0f} decisions/sec, "
+          f"neural win rate {winners.count('Neural') / len(winners):.3f}")
+    print(broker.summary())
+
+
+if __name__ == "__main__":
+    main()
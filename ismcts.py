@@ -0,0 +1,359 @@
+"""Information-set Monte Carlo Tree Search player."""
+from __future__ import annotations
+
+import math
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from action import BLOCKED_ACTIONS, COUNTER_ACTIONS, TARGETED_ACTIONS, Action, CounterAction
+from card import CARD_TYPES, card_from_code
+from cards import NUM_CARDS_PER_TYPE, CardList
+from env import CoupEnv, Phase
+from rules import BLOCKERS, TRANSITIONS, Blockers, Call, Step
+from player import Player
+
+NUM_CARD_TYPES = len(CARD_TYPES)
+NONE = -1
+
+
+class Root(NamedTuple):
+    """Everything a player knows at a decision point: the public table, her own hand and the pending decision."""
+    num_players: int
+    me: int
+    n: int
+    discarded: Tuple[int, ...]
+    alive: Tuple[bool, ...]
+    coins: Tuple[int, ...]
+    num_cards: Tuple[int, ...]
+    hand: Tuple[int, ...]
+    decision: Tuple[int, ...]  # actor, phase, decider, action, target, blocker, next, to_return, queue...
+
+
+class _Node:
+    """Statistics of the actions taken from one information set of the searching player."""
+    __slots__ = ("visits", "available", "wins")
+
+    def __init__(self):
+        self.visits: Dict[int, int] = {}
+        self.available: Dict[int, int] = {}
+        self.wins: Dict[int, float] = {}
+
+
+def determinize(root: Root, rng: random.Random) -> array:
+    """
+    Sample a full state consistent with `root`: the cards of the other players are drawn uniformly from the cards
+    neither discarded nor held by the searching player, and the rest is left in the deck.
+
+    Returns:
+        a `CoupEnv` snapshot.
+    """
+    unseen = CardList.from_counts(
+        [NUM_CARDS_PER_TYPE - discarded - held for discarded, held in zip(root.discarded, root.hand)]
+    )
+    hands = []
+    for seat in range(root.num_players):
+        if seat == root.me:
+            hands.append(root.hand)
+            continue
+        hand = CardList()
+        for _ in range(root.num_cards[seat]):
+            card = unseen.sample(rng)
+            unseen.remove(card)
+            hand.append(card)
+        hands.append(hand.counts)
+
+    buffer = array("h", (root.n, *unseen.counts, *root.discarded))
+    for seat in range(root.num_players):
+        buffer.extend((root.alive[seat], root.coins[seat], *hands[seat]))
+    buffer.extend(root.decision)
+    return buffer
+
+
+def infoset_key(env: CoupEnv, me: int) -> tuple:
+    """What `me` can observe of the state of `env`: everything but the other players' cards and the deck."""
+    key = [env.n, *env.discard_pile.counts, *env.players[me]._cards.counts]
+    for seat, player in enumerate(env.players):
+        key.extend((env.table.alive(seat), player._coins, len(player._cards)))
+    key.extend((
+        env.actor, env._phase, env._decider,
+        NONE if env._action is None else env._action.value,
+        NONE if env._target is None else env._target,
+        NONE if env._blocker is None else env._blocker,
+        env._to_return, *env._queue,
+    ))
+    return tuple(key)
+
+
+class Search:
+    """
+    Single-observer ISMCTS over `CoupEnv` decisions, with random rollouts.
+
+    Nodes are information sets of the searching player, so the tree is kept between decisions: a later
+    decision that was already reached during an earlier search starts from its statistics.
+    """
+
+    def __init__(self, exploration: float = 0.7, max_nodes: int = 200_000, rng: random.Random = None):
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.rng = random.Random() if rng is None else rng
+        self.nodes: Dict[tuple, _Node] = {}
+        self._env: CoupEnv = None
+
+    def clear(self):
+        self.nodes.clear()
+
+    def run(self, root: Root, iterations: int = None, time_budget: float = None) -> Dict[int, int]:
+        """
+        Search from `root` until `iterations` iterations are done or `time_budget` seconds have passed, whichever
+        comes first. At least one of them must be given.
+
+        Returns:
+            number of visits of each legal action at the root.
+        """
+        assert iterations is not None or time_budget is not None
+        self._use_env(root.num_players)
+        if len(self.nodes) > self.max_nodes:
+            self.clear()
+
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        done = 0
+        root_key = None
+        while iterations is None or done < iterations:
+            if deadline is not None and done % 16 == 0 and time.perf_counter() > deadline:
+                break
+            self._env.restore(determinize(root, self.rng))
+            if root_key is None:
+                root_key = infoset_key(self._env, root.me)
+            self._iterate(root_key, root.me)
+            done += 1
+
+        root_node = self.nodes.get(root_key)
+        return {} if root_node is None else dict(root_node.visits)
+
+    def legal_actions(self, root: Root) -> List[int]:
+        """Legal actions at `root`, which only depend on what is public."""
+        self._use_env(root.num_players)
+        self._env.restore(determinize(root, self.rng))
+        return self._env.legal_actions().nonzero().flatten().tolist()
+
+    def _use_env(self, num_players: int):
+        if self._env is None or self._env.num_players != num_players:
+            self._env = CoupEnv(num_players)
+            self._env.rng = self._env.deck._rng = self.rng
+
+    def _iterate(self, key: tuple, me: int):
+        env, rng = self._env, self.rng
+        path: List[Tuple[_Node, int, int]] = []
+        while not env.done:
+            node = self.nodes.get(key)
+            expand = node is None
+            if expand:
+                node = self.nodes[key] = _Node()
+
+            legal = env.legal_action_indices()
+            for action in legal:
+                node.available[action] = node.available.get(action, 0) + 1
+            untried = [action for action in legal if action not in node.visits]
+            action = rng.choice(untried) if untried else self._select(node, legal)
+            path.append((node, action, env.player))
+            env.apply(action)
+            if expand or untried:
+                break
+            key = infoset_key(env, me)
+
+        while not env.done:
+            env.apply(rng.choice(env.legal_action_indices()))
+
+        winner = env.table.alive_seats()[0]
+        for node, action, player in path:
+            node.visits[action] = node.visits.get(action, 0) + 1
+            node.wins[action] = node.wins.get(action, 0.0) + (player == winner)
+
+    def _select(self, node: _Node, legal: Sequence[int]) -> int:
+        def ucb(action: int) -> float:
+            visits = node.visits[action]
+            return node.wins[action] / visits + self.exploration * math.sqrt(math.log(node.available[action]) / visits)
+
+        return max(legal, key=ucb)
+
+
+def _search_worker(root: Root, iterations: int, time_budget: float, exploration: float, seed: int) -> Dict[int, int]:
+    return Search(exploration, rng=random.Random(seed)).run(root, iterations, time_budget)
+
+
+class DecisionPlayer(Player):
+    """
+    Base class of players deciding in the action space of `CoupEnv`: every hook of the game is turned into a `Root`,
+    and subclasses pick the index of a legal `CoupEnv` action for it in `_best`.
+    """
+
+    def _root(self, phase: Phase, actor: Player = None, action: Action = None, target: Player = None,
+              blocker: Player = None, to_return: int = 0, then: Step = Step.END) -> Root:
+        game = self.game
+        seats = game.seats
+        seat_of = {id(player): seat for seat, player in enumerate(seats)}
+        me = seat_of[id(self)]
+        alive = {id(player) for player in game.players}
+        queue = []
+        if phase == Phase.COUNTER_ACTION and BLOCKERS[action.value] == Blockers.TARGET:
+            queue = [me]
+        elif phase in (Phase.CHALLENGE, Phase.COUNTER_ACTION):
+            # `CoupEnv` asks the adversaries in seating order after the actor: me, then those after me
+            num_players, actor_seat = len(seats), seat_of[id(actor)]
+            queue = [
+                (me + rel) % num_players for rel in range((actor_seat - me) % num_players)
+                if id(seats[(me + rel) % num_players]) in alive
+            ]
+        decision = (
+            me if actor is None else seat_of[id(actor)], phase, me,
+            NONE if action is None else action.value,
+            NONE if target is None else seat_of[id(target)],
+            NONE if blocker is None else seat_of[id(blocker)],
+            then, to_return, len(queue), *queue, *[NONE] * (len(seats) - len(queue)),
+        )
+        return Root(
+            num_players=len(seats),
+            me=me,
+            n=game.n,
+            discarded=tuple(game.discard_pile.counts),
+            alive=tuple(id(player) in alive for player in seats),
+            coins=tuple(player.coins for player in seats),
+            num_cards=tuple(len(player._cards) for player in seats),
+            hand=tuple(self._cards.counts),
+            decision=decision,
+        )
+
+    def _best(self, root: Root) -> int:
+        raise NotImplementedError
+
+    def _decide_binary(self, root: Root) -> bool:
+        return self._best(root) == len(Action) * root.num_players + 1
+
+    def _do_action(self, players: Sequence[Player]) -> Tuple[Action, Player]:
+        best = self._best(self._root(Phase.ACTION))
+        num_players = len(self.game.seats)
+        action = Action(best // num_players)
+        if action not in TARGETED_ACTIONS:
+            return action, None
+        me = self.game.seats.index(self)
+        return action, self.game.seats[(me + best % num_players) % num_players]
+
+    def _do_challenge(self, source: Player, action: Action) -> bool:
+        target = self.game.pending[2]
+        if isinstance(action, CounterAction):
+            root = self._root(Phase.BLOCK_CHALLENGE, self, BLOCKED_ACTIONS[action], target, blocker=source)
+        else:
+            root = self._root(Phase.CHALLENGE, source, action, target)
+        return self._decide_binary(root)
+
+    def _do_counter_action(self, action: Action, source: Player) -> CounterAction:
+        target = self if action in TARGETED_ACTIONS else None
+        if self._decide_binary(self._root(Phase.COUNTER_ACTION, source, action, target)):
+            return COUNTER_ACTIONS[action]
+        return None
+
+    def _choose_card(self, root: Root) -> int:
+        held = [code for code, count in enumerate(self._cards.counts) if count > 0]
+        if len(held) == 1:
+            return held[0]
+        return self._best(root) - len(Action) * root.num_players - 2
+
+    def _lose_influence(self):
+        if self.game.pending is None:
+            root = self._root(Phase.LOSE_INFLUENCE, self)
+        else:
+            source, action, target, step = self.game.pending
+            if step == Step.CHALLENGE:  # the challenger's side of the call
+                call = Call.CHALLENGE_WON if self is source else Call.CHALLENGE_LOST
+            elif step == Step.BLOCK_CHALLENGE:
+                call = Call.CHALLENGE_LOST if self is source else Call.CHALLENGE_WON
+            else:
+                call = Call.NONE
+            then = TRANSITIONS[action.value][step][call]
+            root = self._root(Phase.LOSE_INFLUENCE, source, action, target, then=then)
+        card = card_from_code(self._choose_card(root))
+        self._cards.remove(card)
+        return card
+
+    def _exchange(self, extra_cards: CardList) -> CardList:
+        self._cards.extend(extra_cards)
+        returned = CardList()
+        for to_return in range(len(extra_cards), 0, -1):
+            root = self._root(Phase.EXCHANGE, self, Action.EXCHANGE, to_return=to_return)
+            card = card_from_code(self._choose_card(root))
+            self._cards.remove(card)
+            returned.append(card)
+        return returned
+
+
+class ISMCTSPlayer(DecisionPlayer):
+    """
+    Plays every decision by ISMCTS within a fixed budget.
+
+    Args:
+        name: player's name.
+        iterations: number of search iterations per decision.
+        time_budget: seconds of search per decision. When both budgets are given, the first one reached stops the
+            search.
+        num_workers: number of processes searching the same decision independently (root parallelization). Their
+            root statistics are summed.
+        exploration: UCB exploration constant.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rng: random.Random = None,
+        iterations: int = 1000,
+        time_budget: float = None,
+        num_workers: int = 1,
+        exploration: float = 0.7,
+    ):
+        super().__init__(name, rng)
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.num_workers = num_workers
+        self.exploration = exploration
+        self._search = Search(exploration)
+        self._search_game = None
+        self._pool: ProcessPoolExecutor = None
+
+    def __getstate__(self):
+        # `Player` keeps its state in slots, which the default pickling of a class with a `__getstate__` skips.
+        slots = {
+            name: getattr(self, name)
+            for cls in type(self).__mro__ for name in getattr(cls, "__slots__", ()) if hasattr(self, name)
+        }
+        return dict(self.__dict__, _pool=None), slots
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _best(self, root: Root) -> int:
+        if self._search_game is not self.game:
+            self._search.clear()
+            self._search.rng.seed(self.rng.getrandbits(64))
+            self._search_game = self.game
+
+        visits = self._search.run(root, self.iterations, self.time_budget)
+        if self.num_workers > 1:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.num_workers - 1)
+            futures = [
+                self._pool.submit(
+                    _search_worker, root, self.iterations, self.time_budget, self.exploration, self.rng.getrandbits(64)
+                )
+                for _ in range(self.num_workers - 1)
+            ]
+            for future in futures:
+                for action, count in future.result().items():
+                    visits[action] = visits.get(action, 0) + count
+
+        if not visits:  # no iteration was done within the budget
+            return self.rng.choice(self._search.legal_actions(root))
+        return max(visits, key=visits.get)
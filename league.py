@@ -0,0 +1,237 @@
+"""League of player implementations: scheduled matchups across a process pool, with Elo ratings."""
+from __future__ import annotations
+
+import argparse
+import functools
+import itertools
+import math
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+from game import Game
+from player import Player, RandomPlayer
+
+# Creates a player from its name. Must be picklable, e.g. a `Player` subclass or a `functools.partial` of one.
+PlayerFactory = Callable[[str], Player]
+
+
+def wilson_interval(wins: int, games: int, z: float = 1.96) -> Tuple[float, float]:
+    """Confidence interval of a win rate (Wilson score interval)."""
+    if games == 0:
+        return 0.0, 1.0
+    rate = wins / games
+    center = (rate + z * z / (2 * games)) / (1 + z * z / games)
+    half_width = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / (1 + z * z / games)
+    return center - half_width, center + half_width
+
+
+class MatchupResult(NamedTuple):
+    entrants: Tuple[str, ...]
+    wins: Dict[str, int]
+    num_games: int
+    separated: bool  # stopped early: the leader's win rate interval is above every other one
+
+
+def _play_batch(factories: Sequence[PlayerFactory], names: Sequence[str], first_game: int, num_games: int,
+                seed: int) -> List[Tuple[Tuple[str, ...], str]]:
+    """
+    Play games `first_game` to `first_game + num_games` of a matchup. Game `i` is seeded with `seed + i`, and its
+    seating is rotated by `i`, so every entrant plays every seat equally often.
+
+    Returns:
+        the seating and the winner of each game.
+    """
+    players = [factory(name) for factory, name in zip(factories, names)]
+    results = []
+    for idx in range(first_game, first_game + num_games):
+        shift = idx % len(players)
+        seating = players[shift:] + players[:shift]
+        winner = Game(list(seating), rng=random.Random(seed + idx))()
+        results.append((tuple(player.name for player in seating), winner.name))
+    return results
+
+
+class League:
+    """
+    Rates a pool of player implementations by playing them against each other.
+
+    Ratings are Elo, updated after every game as it finishes: the winner of a game of P players won against each of
+    the other P - 1, with a K factor split between them.
+
+    Args:
+        entrants: factory of each entrant, by name.
+        num_players: number of players per game.
+        k_factor: Elo K factor.
+        initial_rating: rating of new entrants.
+    """
+
+    def __init__(self, entrants: Dict[str, PlayerFactory], num_players: int = 2, k_factor: float = 16.0,
+                 initial_rating: float = 1500.0):
+        if len(entrants) < num_players:
+            raise ValueError(f"A league of {num_players}-player games needs at least {num_players} entrants.")
+        self.entrants = dict(entrants)
+        self.num_players = num_players
+        self.k_factor = k_factor
+        self.ratings = {name: initial_rating for name in self.entrants}
+        self.games = Counter()
+        self.wins = Counter()
+
+    def add(self, name: str, factory: PlayerFactory, rating: float = None):
+        """Add an entrant, rated as the average entrant unless `rating` is given."""
+        self.entrants[name] = factory
+        self.ratings[name] = sum(self.ratings.values()) / len(self.ratings) if rating is None else rating
+
+    def record(self, seating: Sequence[str], winner: str):
+        """Update the ratings with the result of one game."""
+        k = self.k_factor / (len(seating) - 1)
+        winner_rating = self.ratings[winner]
+        for loser in seating:
+            if loser == winner:
+                continue
+            expected = 1 / (1 + 10 ** ((self.ratings[loser] - winner_rating) / 400))
+            self.ratings[winner] += k * (1 - expected)
+            self.ratings[loser] -= k * (1 - expected)
+        self.games.update(seating)
+        self.wins[winner] += 1
+
+    def round_robin(self, focus: str = None) -> List[Tuple[str, ...]]:
+        """Every table of `num_players` distinct entrants, or only those seating `focus`."""
+        if focus is None:
+            return list(itertools.combinations(sorted(self.entrants), self.num_players))
+        others = sorted(name for name in self.entrants if name != focus)
+        return [(focus, *table) for table in itertools.combinations(others, self.num_players - 1)]
+
+    def swiss_round(self) -> List[Tuple[str, ...]]:
+        """
+        Tables of entrants of similar ratings: entrants are sorted by rating and seated in consecutive groups. The
+        last group is completed with the entrants just above it.
+        """
+        ranked = sorted(self.entrants, key=lambda name: -self.ratings[name])
+        tables = [tuple(ranked[start:start + self.num_players]) for start in range(0, len(ranked), self.num_players)]
+        if len(tables[-1]) < self.num_players:
+            tables[-1] = tuple(ranked[-self.num_players:])
+        return tables
+
+    def run(
+        self,
+        matchups: Sequence[Tuple[str, ...]],
+        min_games: int = 20,
+        max_games: int = 200,
+        z: float = 2.576,
+        num_workers: int = None,
+        seed: int = 0,
+    ) -> List[MatchupResult]:
+        """
+        Play every matchup across a process pool, in batches of `num_players` games so seats rotate evenly. A
+        matchup stops after `max_games` games, or as soon as it was played at least `min_games` times and its
+        leader's win rate interval is separated from every other entrant's.
+
+        Args:
+            matchups: the entrants of each table.
+            min_games: games played by a matchup before it may stop early.
+            max_games: maximal number of games of a matchup.
+            z: standard score of the win rate intervals. The default (99%) leaves room for checking them after every
+                batch.
+            num_workers: number of worker processes. Defaults to the number of cores.
+            seed: game `i` of matchup `m` is seeded with `seed + m * max_games + i`.
+
+        Returns:
+            the result of each matchup.
+        """
+        batch_size = self.num_players
+        played = [0] * len(matchups)
+        wins = [Counter() for _ in matchups]
+        separated = [False] * len(matchups)
+
+        num_workers = num_workers or os.cpu_count()
+        with ProcessPoolExecutor(num_workers) as pool:
+            max_pending = 2 * num_workers
+            queue = list(range(len(matchups)))  # matchups waiting for a batch to be scheduled
+            pending: Dict[Future, int] = {}
+            scheduled = [0] * len(matchups)
+
+            while queue or pending:
+                while queue and len(pending) < max_pending:
+                    idx = queue.pop(0)
+                    num_games = min(batch_size, max_games - scheduled[idx])
+                    future = pool.submit(
+                        _play_batch, [self.entrants[name] for name in matchups[idx]], matchups[idx],
+                        scheduled[idx], num_games, seed + idx * max_games,
+                    )
+                    scheduled[idx] += num_games
+                    pending[future] = idx
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx = pending.pop(future)
+                    results = future.result()
+                    for seating, winner in results:
+                        self.record(seating, winner)
+                        wins[idx][winner] += 1
+                    played[idx] += len(results)
+                    separated[idx] = played[idx] >= min_games and self._separated(matchups[idx], wins[idx],
+                                                                                  played[idx], z)
+                    if not separated[idx] and scheduled[idx] < max_games:
+                        queue.append(idx)
+
+        return [
+            MatchupResult(matchup, dict(wins[idx]), sum(wins[idx].values()), separated[idx])
+            for idx, matchup in enumerate(matchups)
+        ]
+
+    @staticmethod
+    def _separated(entrants: Sequence[str], wins: Counter, num_games: int, z: float) -> bool:
+        intervals = sorted((wilson_interval(wins[name], num_games, z) for name in entrants), reverse=True)
+        leader_low = intervals[0][0]
+        return all(leader_low > high for _, high in intervals[1:])
+
+    def standings(self) -> str:
+        out = f"{'entrant':16} | {'rating':>7} | {'games':>6} | win rate\n"
+        for name in sorted(self.entrants, key=lambda name: -self.ratings[name]):
+            games = self.games[name]
+            rate = self.wins[name] / games if games else 0.0
+            out += f"{name:16} | {self.ratings[name]:7.1f} | {games:6d} | {rate:.3f}\n"
+        return out
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description="League of random players of varying aggressiveness.")
+    parser.add_argument("-e", "--num-entrants", type=int, default=6)
+    parser.add_argument("-p", "--num-players", type=int, default=2)
+    parser.add_argument("--swiss", type=int, default=0, help="play this many Swiss rounds instead of a round robin")
+    parser.add_argument("--focus", default=None, help="only play the round robin tables seating this entrant")
+    parser.add_argument("--min-games", type=int, default=20)
+    parser.add_argument("--max-games", type=int, default=200)
+    parser.add_argument("-w", "--num-workers", type=int, default=None)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    entrants = {}
+    for idx in range(args.num_entrants):
+        prob = idx / max(args.num_entrants - 1, 1)
+        entrants[f"challenge{prob:.2f}"] = functools.partial(RandomPlayer, challenge_prob=prob)
+    league = League(entrants, args.num_players)
+
+    start = time.perf_counter()
+    if args.swiss:
+        results = []
+        for round_idx in range(args.swiss):
+            results += league.run(league.swiss_round(), args.min_games, args.max_games, num_workers=args.num_workers,
+                                  seed=args.seed + round_idx * len(entrants) * args.max_games)
+    else:
+        results = league.run(league.round_robin(args.focus), args.min_games, args.max_games,
+                             num_workers=args.num_workers, seed=args.seed)
+    elapsed = time.perf_counter() - start
+
+    num_games = sum(result.num_games for result in results)
+    num_separated = sum(result.separated for result in results)
+    print(league.standings())
+    print(f"{num_games} games in {elapsed:.2f}s, {num_separated}/{len(results)} matchups stopped early")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import logging
+import random
 from typing import Sequence, Tuple
 
-import numpy as np
-
-from action import Action
+from action import COUNTER_ACTIONS, TARGETED_ACTIONS, Action, CounterAction, legal_action_mask
 from cards import Card, CardList
 from deck import Deck, CheatingError
+from seats import COINS, Seat
 
 
 class InsufficientFundsError(Exception):
@@ -18,10 +18,16 @@ class InsufficientFundsError(Exception):
 class Player:
     # methods beginning with target_ are called when you are the target of an action
     # Gaming logic should only be implemented in subclasses of Player
-    def __init__(self, name: str):
+    # The state is kept in `_seat`, a view of the game's `SeatTable`.
+    __slots__ = ("name", "_seat", "logger", "game", "rng")
+
+    def __init__(self, name: str, rng: random.Random = None):
         self.name = name
-        self.cards: CardList = None
+        self._seat = Seat()  # coins and cards, moved to the game's `SeatTable` when seated
         self.logger = logging.getLogger(name)
+        self.game = None  # set by the game when dealing
+        # Policies must draw their randomness from `self.rng`, so a game can be reproduced from its seed.
+        self.rng = random.Random() if rng is None else rng
 
     def __str__(self):
         return self.name
@@ -40,25 +46,47 @@ class Player:
     def cards(self, cards: CardList):
         self._cards = cards
 
+    @property
+    def _cards(self) -> CardList:
+        """The hand, a view of the player's seat. Assigning a `CardList` copies its counts into the seat."""
+        return self._seat.hand
+
+    @_cards.setter
+    def _cards(self, cards: CardList):
+        self._seat.hand.set_counts(cards.counts)
+
     @property
     def num_cards(self):
-        return len(self._cards)
+        return len(self._seat.hand)
 
     @property
     def coins(self) -> int:
-        return self._coins
+        seat = self._seat
+        return seat.data[seat.offset + COINS]
 
     @coins.setter
     def coins(self, value):
         if value < 0:
             raise InsufficientFundsError
-        self._coins = value
+        seat = self._seat
+        if seat.zobrist is not None:
+            seat.zobrist.set_board(seat.index, 1, seat.data[seat.offset + COINS], value)
+        seat.data[seat.offset + COINS] = value
+
+    @property
+    def _coins(self) -> int:
+        seat = self._seat
+        return seat.data[seat.offset + COINS]
+
+    @_coins.setter
+    def _coins(self, value: int):
+        self._seat.coins = value
 
     def has(self, card_name: str) -> bool:
-        return self._cards.has(card_name)
+        return self._seat.hand.has(card_name)
 
     def get(self, card_name: str) -> Card:
-        return self._cards.get(card_name)
+        return self._seat.hand.get(card_name)
 
     def income(self):
         self.coins += 1
@@ -79,8 +107,9 @@ class Player:
         self.coins += 2
 
     def replace(self, card_name: str, deck: Deck):
-        deck.return_cards(CardList([self.get(card_name)]))
-        deck._shuffle()
+        card = self.get(card_name)
+        self._cards.remove(card)
+        deck.return_cards(CardList([card]))
         self._cards.append(deck.draw_card())
 
     def exchange(self, deck: Deck):
@@ -90,7 +119,8 @@ class Player:
         return_cards = self._exchange(CardList([card_1, card_2]))
 
         deck.return_cards(return_cards)
-        deck._shuffle()
+        if self.game is not None:
+            self.game.notify("on_exchange", self)
 
         if current_num_cards != len(self._cards):
             raise RuntimeError(
@@ -102,51 +132,57 @@ class Player:
         if action in [Action.INCOME, Action.FOREIGNAID, Action.COUP]:
             return False
 
-        challange = self._do_challenge(source, action)
-        if challange:
-            self.logger.info(f"Challanged action {action} of player {source}")
+        return self._challenged(source, action, self._do_challenge(source, action))
+
+    async def do_challenge_async(self, source, action: Action) -> bool:
+        if action in [Action.INCOME, Action.FOREIGNAID, Action.COUP]:
+            return False
+
+        return self._challenged(source, action, await self._do_challenge_async(source, action))
+
+    def _challenged(self, source, action: Action, challange: bool) -> bool:
+        if challange and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Challanged action %s of player %s", action, source)
         return challange
 
     def do_action(self, players: Sequence[Player]) -> Tuple[Action, None]:  # TODO change to state. this is PI.
-        action, target = self._do_action(players)
-        if target is not None:
-            self.logger.info(f"Attempts action {action} on player {target}")
-        else:
-            self.logger.info(f"Attempts action {action}")
+        return self._acted(*self._do_action(players))
+
+    async def do_action_async(self, players: Sequence[Player]) -> Tuple[Action, None]:
+        return self._acted(*await self._do_action_async(players))
+
+    def _acted(self, action: Action, target: Player) -> Tuple[Action, Player]:
+        if self.logger.isEnabledFor(logging.INFO):
+            if target is not None:
+                self.logger.info("Attempts action %s on player %s", action, target)
+            else:
+                self.logger.info("Attempts action %s", action)
 
         return action, target
 
     def do_counter_action(self, action: Action, source: Player) -> bool:
-        counter_action = self._do_counter_action(action, source)
+        return self._countered(self._do_counter_action(action, source))
+
+    async def do_counter_action_async(self, action: Action, source: Player) -> bool:
+        return self._countered(await self._do_counter_action_async(action, source))
+
+    def _countered(self, counter_action: CounterAction) -> bool:
         if counter_action is not None:
-            self.logger.info(f"Performed counter-action {counter_action}")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Performed counter-action %s", counter_action)
+            if self.game is not None:
+                self.game.notify("on_counter_action", self, counter_action)
             return True
 
         return False
 
-    def target_assassinate(self, source: Player, discard_pile: CardList) -> bool:
-        """Called when you the player is the target of an assassination."""
-        counter_action = self.do_counter_action(Action.ASSASS, source)
-        if not counter_action:
-            self.lose_influence(discard_pile)
-
-        return counter_action
-
-    def target_steal(self, source: Player) -> bool:
-        """Called when you the player is the target of stealing."""
-        counter_action = self.do_counter_action(Action.STEAL, source)
-        if counter_action is False:
-            self.coins -= 2
-
-        return counter_action
-
-    def target_coup(self, discard_pile: CardList):
-        return self.lose_influence(discard_pile)
-
     def lose_influence(self, discard_pile: CardList) -> int:
         card = self._lose_influence()
-        self.logger.info(f"Lost a {card.name} influence")
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Lost a %s influence", card.name)
         discard_pile.append(card)
+        if self.game is not None:
+            self.game.notify("on_discard", self, card)
         return len(self._cards)
 
     def _lose_influence(self) -> Card:
@@ -166,94 +202,70 @@ class Player:
     def _do_challenge(self, source: Player, action: Action) -> bool:
         raise NotImplementedError
 
+    # Coroutine versions of the decision hooks, awaited by `AsyncGame`. Players waiting on something, such as a
+    # remote model, override them to let the other players and tables proceed meanwhile.
+    async def _do_action_async(self, players: Sequence[Player]) -> Tuple[Action, Player]:
+        return self._do_action(players)
+
+    async def _do_challenge_async(self, source: Player, action: Action) -> bool:
+        return self._do_challenge(source, action)
+
+    async def _do_counter_action_async(self, action: Action, source: Player) -> CounterAction:
+        return self._do_counter_action(action, source)
+
+
+class RandomPlayer(Player):
+    """Plays a uniformly random legal action, and challenges / counters with fixed probabilities."""
+    __slots__ = ("challenge_prob", "counter_action_prob")
+
+    def __init__(
+        self,
+        name: str,
+        rng: random.Random = None,
+        challenge_prob: float = 0.1,
+        counter_action_prob: float = 0.2,
+    ):
+        super().__init__(name, rng)
+        self.challenge_prob = challenge_prob
+        self.counter_action_prob = counter_action_prob
+
+    def _do_action(self, players: Sequence[Player]) -> Tuple[Action, Player]:
+        mask = legal_action_mask(self, players)
+        legal = [
+            (action, players[idx] if action in TARGETED_ACTIONS else None)
+            for action in Action for idx, is_legal in enumerate(mask[action.value]) if is_legal
+        ]
+        return self.rng.choice(legal)
 
-import torch
-import torch.nn.functional as F
-
-from board import Board
-from card import CARDS
-from cards import DiscardPile
-from typing import List
-
-
-class BasePlayer:
-
-    def __init__(self, indx: int, name: str, board: Board, discarded: DiscardPile):
-        self._indx = indx
-        self._name = name
-        self._board = board
-        self._discarded = discarded
-
-        self._cards: List[Card] = []
-        self._coins: int = 0
-        self._logger = logging.getLogger(name)
-
-        self._beliefs = torch.rand(board.num_players, len(CARDS.keys()), requires_grad=True)
-        self._beliefs = F.softmax(self._beliefs, dim=0)
-
-    def __str__(self):
-        return f"{self._name} (player #{self._indx})."
-
-    def __repr__(self):
-        return f"{str(self)} [cards={len(self._cards)} ; coins={self._coins}]"
-
-    @property
-    def board(self) -> torch.Tensor:
-        return self._board.view(self._indx)
-
-    @property
-    def state(self) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
-        return (self.board, self._discarded.cards, self._beliefs)
-
-    @property
-    def cards(self) -> List[Card]:
-        return self._cards
-
-    @cards.setter
-    def cards(self, x):
-        raise PermissionError
-
-    @property
-    def coins(self) -> int:
-        return self._coins
+    def _do_challenge(self, source: Player, action: Action) -> bool:
+        return self.rng.random() < self.challenge_prob
 
-    @coins.setter
-    def coins(self, x):
-        raise PermissionError
+    def _do_counter_action(self, action: Action, source: Player) -> CounterAction:
+        counter_action = COUNTER_ACTIONS.get(action)
+        if counter_action is not None and self.rng.random() < self.counter_action_prob:
+            return counter_action
 
-    def add_card(self, card: Card):
-        self._cards.append(card)
-        self._board.add_player_cards(self._indx, 1)
+        return None
 
-    def sub_card(self, card: Card):
+    def _lose_influence(self) -> Card:
+        card = self._cards.sample(self.rng)
         self._cards.remove(card)
-        self._board.sub_player_cards(self._indx, 1)
-
-    def add_coins(self, num_coins: int):
-        self._coins = self._coins + num_coins
-        self._board.add_player_coins(self._indx, num_coins)
-
-    def sub_coins(self, num_coins: int):
-        self._coins = self._coins - num_coins
-        self._board.sub_player_coins(self._indx, num_coins)
-
-    def has(self, card: Card) -> bool:
-        return type(card) in self._cards
-
-    def income(self):
-        self.add_coins(1)
-
-    def foreign_aid(self):
-        self.add_coins(2)
+        return card
 
-    def tax(self):
-        self.add_coins(3)
-
-    def coup(self):
-        self.sub_coins(7)
+    def _exchange(self, extra_cards: CardList) -> CardList:
+        cards = self._cards + extra_cards
+        returned = CardList()
+        for _ in range(len(extra_cards)):
+            card = cards.sample(self.rng)
+            cards.remove(card)
+            returned.append(card)
+        self._cards = cards
+        return returned
 
-    def assassinate(self):
-        self.sub_coins(3)
 
-    def steal(self):
-        self.add_coins(2)
\ No newline at end of file
+def __getattr__(name: str):
+    # The tensor-backed player lives in its own module, so that rule-based games never import torch.
+    if name == "BasePlayer":
+        from base_player import BasePlayer
+        return BasePlayer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,127 @@
+"""Opt-in timing of the phases of games, and profiler captures."""
+from __future__ import annotations
+
+import cProfile
+import contextlib
+import functools
+import io
+import pstats
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Sequence, Tuple
+
+from deck import Deck
+from game import Game
+from player import Player
+
+# Methods timed by `PhaseTimer.enabled`, by default.
+PHASES: Sequence[Tuple[type, str]] = (
+    (Game, "turn"),
+    (Game, "do_action"),
+    (Game, "solve_challenge"),
+    (Game, "notify"),
+    (Player, "do_action"),
+    (Player, "do_challenge"),
+    (Player, "do_counter_action"),
+    (Player, "lose_influence"),
+    (Player, "exchange"),
+    (Deck, "draw_card"),
+    (Deck, "return_cards"),
+)
+
+
+class PhaseTimer:
+    """
+    Wall time and call counts of methods of the engine.
+
+    The methods are only wrapped inside `enabled()`, and restored when it exits, so there is no cost at all when
+    timing is off. Total time includes the phases called from a phase; own time excludes them.
+
+    Usage:
+        timer = PhaseTimer()
+        with timer.enabled():
+            simulate(...)
+        print(timer.summary())
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self.total = defaultdict(float)
+        self.own = defaultdict(float)
+        self._children = []  # time spent in sub-phases of each running phase
+
+    def reset(self):
+        self.calls.clear()
+        self.total.clear()
+        self.own.clear()
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        calls, total, own, children = self.calls, self.total, self.own, self._children
+        clock = time.perf_counter
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            children.append(0.0)
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                calls[name] += 1
+                total[name] += elapsed
+                own[name] += elapsed - children.pop()
+                if children:
+                    children[-1] += elapsed
+
+        return timed
+
+    @contextlib.contextmanager
+    def enabled(self, phases: Sequence[Tuple[type, str]] = PHASES):
+        """Time the `phases` (class, method name) while in the context."""
+        originals = [(cls, name, cls.__dict__[name]) for cls, name in phases]
+        for cls, name, fn in originals:
+            setattr(cls, name, self.wrap(f"{cls.__name__}.{name}", fn))
+        try:
+            yield self
+        finally:
+            for cls, name, fn in originals:
+                setattr(cls, name, fn)
+
+    def summary(self) -> str:
+        """Table of the phases, by decreasing own time."""
+        own_time = sum(self.own.values()) or 1.0
+        out = f"{'phase':24} | {'calls':>9} | {'total s':>8} | {'own s':>8} | {'own %':>6} | {'us/call':>8}\n"
+        for name in sorted(self.own, key=self.own.get, reverse=True):
+            calls = self.calls[name]
+            out += (
+                f"{name:24} | {calls:9d} | {self.total[name]:8.3f} | {self.own[name]:8.3f} | "
+                f"{100 * self.own[name] / own_time:6.1f} | {1e6 * self.total[name] / calls:8.2f}\n"
+            )
+        return out
+
+
+def capture_profile(fn: Callable[[], object], sort: str = "cumulative", limit: int = 30,
+                    profiler: str = "cprofile") -> str:
+    """
+    Run `fn` under a profiler and return its report.
+
+    Args:
+        fn: the code to profile, e.g. a batch of games.
+        sort: `pstats` sort key of the cProfile report.
+        limit: number of functions in the cProfile report.
+        profiler: "cprofile", or "pyinstrument" if it is installed.
+    """
+    if profiler == "pyinstrument":
+        try:
+            import pyinstrument
+        except ImportError as error:
+            raise ImportError("pyinstrument is not installed, use the cprofile profiler instead.") from error
+        with pyinstrument.Profiler() as profile:
+            fn()
+        return profile.output_text()
+
+    profile = cProfile.Profile()
+    profile.runcall(fn)
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
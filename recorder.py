@@ -0,0 +1,207 @@
+"""Binary game records: an event recorder writing fixed-width records to shard files, and a memory-mapped reader."""
+from __future__ import annotations
+
+import enum
+import glob
+import os
+from typing import Dict, Iterator, List
+
+import numpy as np
+import torch
+
+from action import Action, CounterAction
+from card import CARD_CODES, CARD_TYPES, Card
+from events import GameObserver
+
+MAX_PLAYERS = 6
+NONE = -1
+
+
+class Event(enum.IntEnum):
+    DEAL = 0
+    ACTION = 1
+    COUNTER_ACTION = 2
+    CHALLENGE = 3
+    DISCARD = 4
+    EXCHANGE = 5
+    REMOVE = 6
+
+
+class Flag(enum.IntFlag):
+    COUNTER_ACTION = 1  # `action` is a `CounterAction` value
+    CHALLENGE_SUCCESS = 2  # the challenged player did not hold the claimed card
+
+
+# One record per event. Seats are indices in `Game.seats`. Per-seat arrays hold the table when the event is notified,
+# and `coin_delta` is the change of coins since the previous record of the game.
+RECORD_DTYPE = np.dtype([
+    ("game", "<u4"),
+    ("turn", "<u2"),
+    ("event", "u1"),
+    ("actor", "i1"),  # source of an action, blocker, challenged player, or player discarding / exchanging / leaving
+    ("action", "i1"),  # `Action` or `CounterAction` value
+    ("target", "i1"),  # target of an action, or challenger
+    ("flags", "u1"),
+    ("card", "i1"),  # claimed card of a challenge, or revealed card of a discard
+    ("coins", "i1", (MAX_PLAYERS,)),
+    ("coin_delta", "i1", (MAX_PLAYERS,)),
+    ("influence", "i1", (MAX_PLAYERS,)),
+    ("discarded", "i1", (len(CARD_TYPES),)),
+], align=True)
+
+SHARD_PATTERN = "shard-{:05d}.bin"
+
+
+class Recorder(GameObserver):
+    """
+    Records the events of games into append-only shard files of `RECORD_DTYPE` records.
+
+    Usage:
+        with Recorder(directory) as recorder:
+            game.observers.append(recorder)
+            game()
+
+    Args:
+        directory: directory of the shards. Recording resumes after the existing shards.
+        shard_size: maximum number of records per shard.
+        buffer_size: number of records kept in memory between writes.
+        first_game: id of the first recorded game. Give each writer to a directory a disjoint range of ids.
+        prefix: prefix of the shard file names, so that several writers may share a directory.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        shard_size: int = 1 << 20,
+        buffer_size: int = 4096,
+        first_game: int = 0,
+        prefix: str = "",
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self._buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self._num_buffered = 0
+        self._shard = len(glob.glob(os.path.join(directory, prefix + "shard-*.bin")))
+        self._shard_records = 0
+        self._game_id = first_game - 1
+        self._seats: Dict[int, int] = {}
+        self._coins: List[int] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.flush()
+
+    def flush(self):
+        records = self._buffer[:self._num_buffered]
+        while len(records):
+            if self._shard_records == self.shard_size:
+                self._shard += 1
+                self._shard_records = 0
+            chunk = records[:self.shard_size - self._shard_records]
+            path = os.path.join(self.directory, self.prefix + SHARD_PATTERN.format(self._shard))
+            with open(path, "ab") as shard:
+                chunk.tofile(shard)
+            self._shard_records += len(chunk)
+            records = records[len(chunk):]
+        self._num_buffered = 0
+
+    def _record(self, game, event: Event, actor=None, action: int = NONE, target=None, flags: int = 0,
+                card: int = NONE):
+        coins = [0] * MAX_PLAYERS
+        influence = [0] * MAX_PLAYERS
+        for seat, player in enumerate(game.seats):
+            coins[seat] = player._coins
+            influence[seat] = len(player._cards)
+        coin_delta = [now - before for now, before in zip(coins, self._coins)]
+        self._coins = coins
+
+        self._buffer[self._num_buffered] = (
+            self._game_id, game.n, event,
+            NONE if actor is None else self._seats[id(actor)],
+            action,
+            NONE if target is None else self._seats[id(target)],
+            flags, card, coins, coin_delta, influence, game.discard_pile.counts,
+        )
+        self._num_buffered += 1
+        if self._num_buffered == len(self._buffer):
+            self.flush()
+
+    def on_deal(self, game):
+        if len(game.seats) > MAX_PLAYERS:
+            raise ValueError(f"Can't record games of more than {MAX_PLAYERS} players.")
+        self._game_id += 1
+        self._seats = {id(player): seat for seat, player in enumerate(game.seats)}
+        self._coins = [0] * MAX_PLAYERS
+        self._record(game, Event.DEAL)
+
+    def on_action(self, game, source, action: Action, target):
+        self._record(game, Event.ACTION, source, action.value, target)
+
+    def on_counter_action(self, game, player, counter_action: CounterAction):
+        self._record(game, Event.COUNTER_ACTION, player, counter_action.value, flags=Flag.COUNTER_ACTION)
+
+    def on_challenge(self, game, challenger, challenged, action, card_name: str, success: bool):
+        flags = Flag.COUNTER_ACTION if isinstance(action, CounterAction) else 0
+        flags |= Flag.CHALLENGE_SUCCESS if success else 0
+        self._record(game, Event.CHALLENGE, challenged, action.value, challenger, flags, CARD_CODES[card_name])
+
+    def on_discard(self, game, player, card: Card):
+        self._record(game, Event.DISCARD, player, card=card.code)
+
+    def on_exchange(self, game, player):
+        self._record(game, Event.EXCHANGE, player)
+
+    def on_remove(self, game, player):
+        self._record(game, Event.REMOVE, player)
+
+
+class ReplayDataset:
+    """
+    Memory-mapped view of the records of a directory of shards. Nothing is read until it is accessed, and batches
+    are views of the mapped files.
+
+    Args:
+        directory: directory of the shards.
+        pattern: glob pattern of the shard files in the directory.
+    """
+
+    def __init__(self, directory: str, pattern: str = "*shard-*.bin"):
+        paths = sorted(glob.glob(os.path.join(directory, pattern)))
+        # Copy-on-write mappings: the files are never modified, but the arrays are writable, as torch expects.
+        self.shards = [np.memmap(path, dtype=RECORD_DTYPE, mode="c") for path in paths if os.path.getsize(path)]
+        self._offsets = np.cumsum([0] + [len(shard) for shard in self.shards])
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def __getitem__(self, idx: int) -> np.void:
+        shard = int(np.searchsorted(self._offsets, idx, side="right")) - 1
+        return self.shards[shard][idx - self._offsets[shard]]
+
+    def batches(self, batch_size: int, events: List[Event] = None) -> Iterator[Dict[str, torch.Tensor]]:
+        """
+        Yield consecutive batches of records, as a dict of tensors per field, sharing memory with the mapped files.
+        Batches do not cross shard boundaries, so the last batch of each shard may be smaller.
+
+        Args:
+            batch_size: maximal number of records per batch.
+            events: if given, only records of these events are yielded. Filtering copies the selected records.
+        """
+        for shard in self.shards:
+            for start in range(0, len(shard), batch_size):
+                records = shard[start:start + batch_size]
+                if events is not None:
+                    records = records[np.isin(records["event"], [int(event) for event in events])]
+                yield {name: torch.from_numpy(records[name]) for name in RECORD_DTYPE.names}
+
+    @staticmethod
+    def observations(batch: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """(N, 2 * MAX_PLAYERS + C) float observations of a batch: coins, influence and discarded cards."""
+        return torch.cat((batch["coins"], batch["influence"], batch["discarded"]), dim=1).float()
@@ -0,0 +1,268 @@
+"""
+Record the decisions of games, and replay them exactly, without the policies that made them.
+
+A game is fully determined by its seed and the decisions of its players: the deck draws from a generator seeded
+by the game, independently of the policies. A `Trace` holds both, plus the outcome of the game, so replaying it
+reproduces the game and checks that the engine still plays it out the same way.
+
+Usage:
+    python replay.py record traces.jsonl -n 1000
+    python replay.py check traces.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from array import array
+from typing import Iterable, Iterator, List, NamedTuple, Sequence, Tuple
+
+from action import TARGETED_ACTIONS, Action, CounterAction
+from card import card_from_code
+from cards import Card, CardList
+from game import Game
+from player import Player
+from simulate import random_players
+
+NONE = -1
+
+# Hooks of a decision, and the layout of a decision: seat, hook, then 2 values.
+ACTION, CHALLENGE, COUNTER_ACTION, LOSE_INFLUENCE, EXCHANGE = range(5)
+DECISION_SIZE = 4
+
+
+class ReplayError(Exception):
+    pass
+
+
+class Trace(NamedTuple):
+    seed: int
+    names: Tuple[str, ...]
+    decisions: array  # flat, `DECISION_SIZE` values per decision
+    winner: int  # seat
+    num_turns: int
+    final: array  # `Game.snapshot` at the end of the game
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "seed": self.seed,
+            "names": self.names,
+            "decisions": self.decisions.tolist(),
+            "winner": self.winner,
+            "num_turns": self.num_turns,
+            "final": self.final.tolist(),
+        })
+
+    @classmethod
+    def from_json(cls, line: str) -> Trace:
+        trace = json.loads(line)
+        return cls(
+            trace["seed"], tuple(trace["names"]), array("b", trace["decisions"]), trace["winner"],
+            trace["num_turns"], array("h", trace["final"]),
+        )
+
+
+def save_traces(path: str, traces: Iterable[Trace]):
+    with open(path, "w") as file:
+        for trace in traces:
+            file.write(trace.to_json() + "\n")
+
+
+def load_traces(path: str) -> Iterator[Trace]:
+    with open(path) as file:
+        for line in file:
+            yield Trace.from_json(line)
+
+
+def record(players: Sequence[Player], seed: int) -> Trace:
+    """
+    Play a game, recording the decisions of `players`.
+
+    Args:
+        players: the players, in seating order. Their hooks are wrapped for the duration of the game, by a subclass
+            of their class.
+        seed: seed of the game's random generator.
+    """
+    seats = list(players)
+    seat_of = {id(player): seat for seat, player in enumerate(seats)}
+    decisions = array("b")
+
+    def wrap(seat: int, player: Player):
+        do_action, do_challenge = player._do_action, player._do_challenge
+        do_counter_action, lose_influence, exchange = player._do_counter_action, player._lose_influence, player._exchange
+
+        def _do_action(self, players):
+            action, target = do_action(players)
+            decisions.extend((seat, ACTION, action.value, NONE if target is None else seat_of[id(target)]))
+            return action, target
+
+        def _do_challenge(self, source, action):
+            challenge = do_challenge(source, action)
+            decisions.extend((seat, CHALLENGE, bool(challenge), NONE))
+            return challenge
+
+        def _do_counter_action(self, action, source):
+            counter_action = do_counter_action(action, source)
+            decisions.extend((seat, COUNTER_ACTION, NONE if counter_action is None else counter_action.value, NONE))
+            return counter_action
+
+        def _lose_influence(self):
+            card = lose_influence()
+            decisions.extend((seat, LOSE_INFLUENCE, card.code, NONE))
+            return card
+
+        def _exchange(self, extra_cards):
+            returned = exchange(extra_cards)
+            codes = [card.code for card in returned]
+            decisions.extend((seat, EXCHANGE, *codes, *[NONE] * (2 - len(codes))))
+            return returned
+
+        # Players may have no instance dict (see `Player.__slots__`), so the hooks are methods of a subclass, which
+        # adds no state and can therefore be swapped in and out.
+        cls = type(player)
+        player.__class__ = type(cls.__name__, (cls,), {
+            "__slots__": (), "_do_action": _do_action, "_do_challenge": _do_challenge,
+            "_do_counter_action": _do_counter_action, "_lose_influence": _lose_influence, "_exchange": _exchange,
+        })
+        return cls
+
+    classes = [wrap(seat, player) for seat, player in enumerate(seats)]
+    try:
+        game = Game(list(seats), rng=random.Random(seed))
+        winner = game()
+    finally:
+        for player, cls in zip(seats, classes):
+            player.__class__ = cls
+
+    return Trace(
+        seed, tuple(player.name for player in seats), decisions, seat_of[id(winner)], game.n, game.snapshot()
+    )
+
+
+class _Cursor:
+    """Position in the decisions of a trace, shared by the players replaying it."""
+
+    def __init__(self, decisions: array):
+        self.decisions = decisions
+        self.pos = 0
+
+    def next(self, seat: int, hook: int) -> Tuple[int, int]:
+        pos = self.pos
+        if pos == len(self.decisions):
+            raise ReplayError(f"Seat {seat} made decision {pos // DECISION_SIZE}, past the end of the trace.")
+        recorded_seat, recorded_hook, first, second = self.decisions[pos:pos + DECISION_SIZE]
+        if (recorded_seat, recorded_hook) != (seat, hook):
+            raise ReplayError(
+                f"Decision {pos // DECISION_SIZE} diverged: seat {seat} made decision {hook}, "
+                f"the trace has seat {recorded_seat} making decision {recorded_hook}."
+            )
+        self.pos = pos + DECISION_SIZE
+        return first, second
+
+
+class ReplayPlayer(Player):
+    """Makes the decisions of one seat of a trace."""
+
+    def __init__(self, name: str, seat: int, cursor: _Cursor):
+        super().__init__(name)
+        self.seat = seat
+        self._cursor = cursor
+
+    def _take(self, code: int, cards: CardList) -> Card:
+        card = card_from_code(code)
+        if not cards.has(card):
+            raise ReplayError(f"Seat {self.seat} does not hold the recorded {card.name}.")
+        cards.remove(card)
+        return card
+
+    def _do_action(self, players: Sequence[Player]) -> Tuple[Action, Player]:
+        action, target = self._cursor.next(self.seat, ACTION)
+        action = Action(action)
+        return action, self.game.seats[target] if action in TARGETED_ACTIONS else None
+
+    def _do_challenge(self, source: Player, action: Action) -> bool:
+        return bool(self._cursor.next(self.seat, CHALLENGE)[0])
+
+    def _do_counter_action(self, action: Action, source: Player) -> CounterAction:
+        counter_action = self._cursor.next(self.seat, COUNTER_ACTION)[0]
+        return None if counter_action == NONE else CounterAction(counter_action)
+
+    def _lose_influence(self) -> Card:
+        return self._take(self._cursor.next(self.seat, LOSE_INFLUENCE)[0], self._cards)
+
+    def _exchange(self, extra_cards: CardList) -> CardList:
+        cards = self._cards + extra_cards
+        returned = CardList()
+        for code in self._cursor.next(self.seat, EXCHANGE)[:len(extra_cards)]:
+            returned.append(self._take(code, cards))
+        self._cards = cards
+        return returned
+
+
+def replay(trace: Trace, num_turns: int = None) -> Game:
+    """
+    Replay a recorded game, to its end or for its first `num_turns` turns.
+
+    Returns:
+        the replayed game, played by `ReplayPlayer`s. `Game.clone` continues it with other players.
+    """
+    cursor = _Cursor(trace.decisions)
+    players = [ReplayPlayer(name, seat, cursor) for seat, name in enumerate(trace.names)]
+    game = Game(players, rng=random.Random(trace.seed))
+    game.deal()
+    game.play(num_turns)
+    return game
+
+
+def check(trace: Trace):
+    """Replay a whole trace, and raise a `ReplayError` unless it ends exactly as recorded."""
+    game = replay(trace)
+    if len(game.players) != 1:
+        raise ReplayError(f"Game {trace.seed} is not over after the recorded decisions.")
+    winner = game.seats.index(game.players[0])
+    if (winner, game.n) != (trace.winner, trace.num_turns):
+        raise ReplayError(
+            f"Game {trace.seed} was won by seat {winner} on turn {game.n}, "
+            f"instead of seat {trace.winner} on turn {trace.num_turns}."
+        )
+    if game.snapshot() != trace.final:
+        raise ReplayError(f"Game {trace.seed} ended on a different table.")
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="record games of random players")
+    record_parser.add_argument("path")
+    record_parser.add_argument("-n", "--num-games", type=int, default=1000)
+    record_parser.add_argument("-p", "--num-players", type=int, default=4)
+    record_parser.add_argument("-s", "--seed", type=int, default=0)
+    check_parser = commands.add_parser("check", help="replay recorded games and check their outcomes")
+    check_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "record":
+        players = random_players(args.num_players)
+        save_traces(args.path, (record(players, args.seed + idx) for idx in range(args.num_games)))
+        print(f"Recorded {args.num_games} games in {time.perf_counter() - start:.2f}s")
+        return
+
+    traces: List[Trace] = list(load_traces(args.path))
+    start = time.perf_counter()
+    failures = 0
+    for trace in traces:
+        try:
+            check(trace)
+        except ReplayError as error:
+            failures += 1
+            print(error)
+    elapsed = time.perf_counter() - start
+    print(f"{len(traces) - failures}/{len(traces)} games replayed identically, {len(traces) / elapsed:.1f} games/sec")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Resolution of a turn as a state machine, driven by tables shared by `Game`, `CoupEnv` and `BatchGame`.
+
+A turn goes through the steps of its action, in order:
+    CHALLENGE: the adversaries may challenge the card claimed by the action.
+    PAY: the actor pays for the action. A blocked action is paid for too.
+    BLOCK: the adversaries (or only the target) may block the action, claiming a blocking card.
+    BLOCK_CHALLENGE: the actor may challenge the block.
+    RESOLVE: the action takes effect.
+Steps which don't apply to an action are skipped. Each step ends with a `Call`, and the next step is looked up in
+`TRANSITIONS[action.value][step][call]`.
+"""
+from __future__ import annotations
+
+import enum
+from typing import Dict, Optional, Tuple, Union
+
+from action import BLOCKING_CARDS, COUNTER_ACTIONS, REQUIRED_CARD, Action, CounterAction
+from card import CARD_CODES
+
+
+class Step(enum.IntEnum):
+    CHALLENGE = 0
+    PAY = 1
+    BLOCK = 2
+    BLOCK_CHALLENGE = 3
+    RESOLVE = 4
+    END = 5
+
+
+class Call(enum.IntEnum):
+    """How a step ended."""
+    NONE = 0  # nobody called, or the step involves no decision
+    BLOCK = 1  # the action was blocked
+    CHALLENGE_LOST = 2  # the challenged claim was true: the challenger loses an influence
+    CHALLENGE_WON = 3  # the challenged claim was false: the claimant loses an influence
+
+
+class Blockers(enum.IntEnum):
+    NOBODY = 0
+    TARGET = 1
+    ANYONE = 2
+
+
+# Rules of each action, indexed by `Action.value`.
+CLAIMS: Tuple[Tuple[int, ...], ...] = tuple(
+    (int(CARD_CODES[REQUIRED_CARD[action]]),) if action in REQUIRED_CARD else () for action in Action
+)  # card codes claimed by the action
+BLOCK_CLAIMS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(int(CARD_CODES[name]) for name in BLOCKING_CARDS.get(action, ())) for action in Action
+)  # card codes any of which a block claims
+BLOCKERS: Tuple[Blockers, ...] = tuple(
+    Blockers.ANYONE if action == Action.FOREIGNAID else Blockers.TARGET if action in COUNTER_ACTIONS
+    else Blockers.NOBODY for action in Action
+)
+COST = tuple({Action.COUP: 7, Action.ASSASS: 3}.get(action, 0) for action in Action)
+GAIN = tuple({Action.INCOME: 1, Action.FOREIGNAID: 2, Action.TAX: 3}.get(action, 0) for action in Action)
+STOLEN = tuple(2 if action == Action.STEAL else 0 for action in Action)  # at most, from the target
+KILLS = tuple(action in (Action.COUP, Action.ASSASS) for action in Action)  # the target loses an influence
+DRAWS = tuple(2 if action == Action.EXCHANGE else 0 for action in Action)  # cards drawn, then as many returned
+
+# Card codes claimed by announcing each action or counter-action.
+CLAIMED_CARDS: Dict[Union[Action, CounterAction], Tuple[int, ...]] = {
+    **{action: CLAIMS[action.value] for action in Action if CLAIMS[action.value]},
+    **{counter_action: BLOCK_CLAIMS[action.value] for action, counter_action in COUNTER_ACTIONS.items()},
+}
+
+
+def _path(action: Action) -> Tuple[Step, ...]:
+    """Steps of the action when nobody calls, except the final END."""
+    steps = []
+    if CLAIMS[action.value]:
+        steps.append(Step.CHALLENGE)
+    if COST[action.value]:
+        steps.append(Step.PAY)
+    if BLOCKERS[action.value] != Blockers.NOBODY:
+        steps.append(Step.BLOCK)
+    steps.append(Step.RESOLVE)
+    return tuple(steps)
+
+
+def _transitions(action: Action) -> Tuple[Tuple[Optional[Step], ...], ...]:
+    path = _path(action) + (Step.END,)
+    table = []
+    for step in Step:
+        following = path[path.index(step) + 1] if step in path[:-1] else None
+        row = [None] * len(Call)
+        if step == Step.CHALLENGE and following is not None:
+            row[Call.NONE] = row[Call.CHALLENGE_LOST] = following
+            row[Call.CHALLENGE_WON] = Step.END
+        elif step == Step.BLOCK and following is not None:
+            row[Call.NONE] = following
+            row[Call.BLOCK] = Step.BLOCK_CHALLENGE
+        elif step == Step.BLOCK_CHALLENGE and Step.BLOCK in path:
+            row[Call.NONE] = row[Call.CHALLENGE_LOST] = Step.END  # the block stands
+            row[Call.CHALLENGE_WON] = Step.RESOLVE
+        elif following is not None:
+            row[Call.NONE] = following
+        table.append(tuple(row))
+    return tuple(table)
+
+
+FIRST_STEP: Tuple[Step, ...] = tuple(_path(action)[0] for action in Action)
+# Next step, by `Action.value`, `Step` and `Call`. None for a call which can't end the step.
+TRANSITIONS: Tuple[Tuple[Tuple[Optional[Step], ...], ...], ...] = tuple(_transitions(action) for action in Action)
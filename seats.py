@@ -0,0 +1,140 @@
+"""State of the seats of a game, held in one flat array that players read and write through views."""
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, List, Sequence
+
+from card import CARD_TYPES
+from cards import ObservedCardList
+
+if TYPE_CHECKING:
+    from zobrist import ZobristHash
+
+NUM_CARD_TYPES = len(CARD_TYPES)
+
+# Layout of a seat: alive flag, coins, then the count of each card type in the hand.
+ALIVE, COINS, HAND = 0, 1, 2
+SEAT_SIZE = HAND + NUM_CARD_TYPES
+
+
+class SeatTakenError(Exception):
+    pass
+
+
+def _in_play(table: SeatTable) -> bool:
+    """Whether `table` is the table of a game in progress: dealt, with more than one of its seats alive."""
+    return table is not None and table.dealt and table.num_alive() > 1
+
+
+class Seat:
+    """
+    View of one seat of a table: its alive flag, coins and hand, at `offset` of `data`. The hand is a `CardList`
+    whose counts are a slice of `data`, so changes to it are written through. Coin writes are hashed by `zobrist`,
+    and hand changes reported to the hand's listener, when set by `ZobristHash.attach_game`.
+
+    Args:
+        data: the buffer of the table. Defaults to a buffer of its own, for a player outside of any game.
+        offset: start of the seat in `data`.
+        table: the table owning `data`, if any.
+    """
+    __slots__ = ("data", "offset", "table", "hand", "zobrist")
+
+    def __init__(self, data: array = None, offset: int = 0, table: SeatTable = None):
+        if data is None:
+            data = array("h", [1] + [0] * (SEAT_SIZE - 1))
+        self.data = data
+        self.offset = offset
+        self.table = table
+        self.hand = ObservedCardList.view(memoryview(data)[offset + HAND:offset + SEAT_SIZE])
+        self.zobrist: ZobristHash = None
+
+    def __reduce__(self):
+        # A view can't be pickled: the buffer is, and copies of seats of one table share the copy of its buffer.
+        return Seat, (self.data, self.offset, self.table)
+
+    @property
+    def index(self) -> int:
+        return self.offset // SEAT_SIZE
+
+    @property
+    def alive(self) -> bool:
+        return bool(self.data[self.offset + ALIVE])
+
+    @alive.setter
+    def alive(self, value: bool):
+        self.data[self.offset + ALIVE] = value
+
+    @property
+    def coins(self) -> int:
+        return self.data[self.offset + COINS]
+
+    @coins.setter
+    def coins(self, value: int):
+        if self.zobrist is not None:
+            self.zobrist.set_board(self.index, 1, self.data[self.offset + COINS], value)
+        self.data[self.offset + COINS] = value
+
+
+class SeatTable:
+    """
+    Alive flags, coins and hands of all the seats of a game, in one `array("h")` of `num_players` rows of
+    `SEAT_SIZE` values. The rows are laid out as the seats of a table snapshot (see `snapshot.table_size`), so
+    snapshots are a copy of the buffer.
+
+    Players bound to a table read and write their state in it, so it is never duplicated, and eliminating a player
+    only flips its flag. The table is in play from the deal (`dealt`) until a single seat is left alive. The buffer can be wrapped without copying, e.g. by
+    `numpy.frombuffer(table.data, numpy.int16).reshape(num_players, SEAT_SIZE)`, to update all the seats at once.
+
+    Args:
+        num_players: number of seats.
+    """
+    __slots__ = ("num_players", "data", "seats", "dealt")
+
+    def __init__(self, num_players: int):
+        self.num_players = num_players
+        self.data = array("h", ([1] + [0] * (SEAT_SIZE - 1)) * num_players)
+        self.seats = [Seat(self.data, idx * SEAT_SIZE, self) for idx in range(num_players)]
+        self.dealt = False  # set by the game once the cards are dealt
+
+    def bind(self, players: Sequence):
+        """
+        Move the state of each of the `players` (`Player`s, in seating order) to its seat, alive. Players may come
+        from a finished or an undealt game, but not from one in progress, whose state they would stop writing to,
+        unless they were released from it (see `Game.release`).
+
+        Raises:
+            SeatTakenError: if a player is seated at another table of a game in progress.
+        """
+        data = self.data
+        for player in players:
+            old = player._seat
+            if old.table is not self and _in_play(old.table):
+                raise SeatTakenError(f"{player} is seated at a table of a game in progress, which must be released first.")
+        for player, seat in zip(players, self.seats):
+            old = player._seat
+            data[seat.offset:seat.offset + SEAT_SIZE] = old.data[old.offset:old.offset + SEAT_SIZE]
+            data[seat.offset + ALIVE] = 1
+            seat.hand.recount()
+            player._seat = seat
+
+    def load(self, values: Sequence[int]):
+        """Overwrite every seat with `values`, laid out as `data`."""
+        self.data[:] = array("h", values)
+        for seat in self.seats:
+            seat.hand.recount()
+
+    def alive(self, seat: int) -> bool:
+        return bool(self.data[seat * SEAT_SIZE + ALIVE])
+
+    def eliminate(self, seat: int):
+        self.data[seat * SEAT_SIZE + ALIVE] = 0
+
+    def num_alive(self) -> int:
+        return sum(self.data[ALIVE::SEAT_SIZE])
+
+    def alive_seats(self) -> List[int]:
+        return [seat for seat in range(self.num_players) if self.data[seat * SEAT_SIZE + ALIVE]]
+
+    def coins(self) -> List[int]:
+        """Coins of every seat."""
+        return self.data[COINS::SEAT_SIZE].tolist()
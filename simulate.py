@@ -0,0 +1,115 @@
+"""Headless batch simulation of self-play games."""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import logging
+import random
+import sys
+import time
+from typing import Callable, List, NamedTuple, Sequence, Tuple
+
+from action import Action
+from events import EventSink, GameObserver
+from game import Game
+from player import Player, RandomPlayer
+from profiling import PhaseTimer, capture_profile
+
+
+class GameResult(NamedTuple):
+    seed: int
+    winner: str
+    num_turns: int
+    action_counts: Tuple[int, ...]  # indexed by `Action.value`
+
+    @property
+    def action_histogram(self) -> dict:
+        return {action: self.action_counts[action.value] for action in Action}
+
+
+def random_players(num_players: int) -> List[Player]:
+    return [RandomPlayer(f"Player{idx}") for idx in range(num_players)]
+
+
+def play(
+    players: Sequence[Player], seed: int, render: bool = False, observers: Sequence[GameObserver] = ()
+) -> GameResult:
+    """
+    Play a single game.
+
+    Args:
+        players: the players, in seating order. They are reset at the start of the game, so they may be reused.
+        seed: seed of the game's random generator. Two games with the same players and seed are identical.
+        render: print the table after every turn.
+        observers: observers of the game's events.
+    """
+    game = Game(list(players), rng=random.Random(seed), render=render)
+    game.observers.extend(observers)
+    winner = game()
+    return GameResult(seed, winner.name, game.n, tuple(game.action_counts))
+
+
+def simulate(
+    make_players: Callable[[], Sequence[Player]],
+    num_games: int,
+    seed: int = 0,
+    render: bool = False,
+    observers: Sequence[GameObserver] = (),
+) -> List[GameResult]:
+    """
+    Play `num_games` games back-to-back. Game `i` is seeded with `seed + i`.
+
+    Args:
+        make_players: called once to create the players, which are reused across games.
+        num_games: number of games to play.
+        seed: seed of the first game.
+        render: print the table after every turn.
+        observers: observers of the events of every game.
+    """
+    players = make_players()
+    return [play(players, seed + idx, render, observers) for idx in range(num_games)]
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--num-games", type=int, default=1000)
+    parser.add_argument("-p", "--num-players", type=int, default=4)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--render", action="store_true", help="print the table after every turn")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--events", help="write the events of the games to this file, as JSON lines")
+    parser.add_argument("--phases", action="store_true", help="time the phases of the games and print a summary")
+    parser.add_argument("--profile", choices=("cprofile", "pyinstrument"), help="print a profile of the games")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(stream=sys.stdout, level=args.log_level)
+
+    results: List[GameResult] = []
+    events = open(args.events, "w") if args.events else None
+    observers = [EventSink(lambda event: events.write(json.dumps(event) + "\n"))] if events else []
+
+    def run():
+        results.extend(
+            simulate(lambda: random_players(args.num_players), args.num_games, args.seed, args.render, observers)
+        )
+
+    timer = PhaseTimer()
+    start = time.perf_counter()
+    with timer.enabled() if args.phases else contextlib.nullcontext():
+        if args.profile:
+            print(capture_profile(run, profiler=args.profile))
+        else:
+            run()
+    elapsed = time.perf_counter() - start
+    if events:
+        events.close()
+
+    turns = sum(result.num_turns for result in results)
+    print(f"{len(results)} games, {turns / len(results):.2f} turns/game, {len(results) / elapsed:.1f} games/sec")
+    if args.phases:
+        print(timer.summary())
+
+
+if __name__ == "__main__":
+    main()
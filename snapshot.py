@@ -0,0 +1,33 @@
+"""Flat buffers holding the full state of a table, for cheap snapshots and clones."""
+from __future__ import annotations
+
+from array import array
+from typing import Sequence
+
+from card import CARD_TYPES
+from cards import CardList
+from deck import Deck
+from seats import SEAT_SIZE
+
+NUM_CARD_TYPES = len(CARD_TYPES)
+
+# Layout of a table buffer: turn, deck counts, discard pile counts, then the seats as laid out in a `SeatTable`:
+# alive, coins, hand counts.
+HEADER_SIZE = 1 + 2 * NUM_CARD_TYPES
+
+
+def table_size(num_players: int) -> int:
+    return HEADER_SIZE + num_players * SEAT_SIZE
+
+
+def pack_header(n: int, deck: Deck, discard_pile: CardList) -> array:
+    """The part of a table buffer before the seats."""
+    return array("h", (n, *deck._cards._cards, *discard_pile._counts))
+
+
+def unpack_header(buffer: Sequence[int], deck: Deck, discard_pile: CardList) -> int:
+    """Write the part of a table buffer before the seats back into the objects. Returns the turn number."""
+    deck._cards.set_counts(buffer[1:1 + NUM_CARD_TYPES])
+    discard_pile._counts = list(buffer[1 + NUM_CARD_TYPES:HEADER_SIZE])
+    discard_pile._size = sum(discard_pile._counts)
+    return buffer[0]
@@ -0,0 +1,57 @@
+"""`marginals` are the exact expected counts of the weighted deals, as enumerated by brute force."""
+import itertools
+import math
+import random
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from beliefs import NUM_CARD_TYPES, marginals  # noqa: E402
+
+
+def _enumerate(weights, sizes, unseen):
+    """Expected counts over every deal of the (distinguishable) unseen cards."""
+    cards = [code for code, count in enumerate(unseen) for _ in range(count)]
+    num_rows = len(sizes)
+    expected = [[0.0] * NUM_CARD_TYPES for _ in range(num_rows + 1)]
+    total = 0.0
+
+    def deal(row, left, counts, weight):
+        nonlocal total
+        if row == num_rows:
+            deck = [0] * NUM_CARD_TYPES
+            for code in left:
+                deck[code] += 1
+            weight *= math.prod(weights[num_rows][code] ** count for code, count in enumerate(deck))
+            total += weight
+            for counts_row, row_counts in enumerate(counts + [deck]):
+                for code, count in enumerate(row_counts):
+                    expected[counts_row][code] += weight * count
+            return
+        for picked in itertools.combinations(range(len(left)), sizes[row]):
+            hand = [0] * NUM_CARD_TYPES
+            for idx in picked:
+                hand[left[idx]] += 1
+            hand_weight = math.prod(weights[row][code] ** count for code, count in enumerate(hand))
+            rest = [code for idx, code in enumerate(left) if idx not in picked]
+            deal(row + 1, rest, counts + [hand], weight * hand_weight)
+
+    deal(0, cards, [], 1.0)
+    return torch.tensor(expected) / total
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_marginals(seed):
+    rng = random.Random(seed)
+    num_rows = rng.randint(1, 3)
+    unseen = [rng.randint(0, 3) for _ in range(NUM_CARD_TYPES)]
+    sizes = [rng.randint(0, 2) for _ in range(num_rows)]
+    if sum(sizes) > sum(unseen):
+        pytest.skip("more cards in the hands than unseen")
+    weights = [[rng.choice([0.5, 1.0, 3.0]) for _ in range(NUM_CARD_TYPES)] for _ in range(num_rows + 1)]
+    weights[0][rng.randrange(NUM_CARD_TYPES)] = 0.0  # a card ruled out by a challenge
+
+    expected = marginals(torch.tensor([weights]), torch.tensor([sizes]), torch.tensor([unseen]))[0]
+    assert torch.allclose(expected, _enumerate(weights, sizes, unseen), atol=1e-5)
+    assert torch.allclose(expected.sum(dim=-1)[:-1], torch.tensor(sizes, dtype=torch.float), atol=1e-5)
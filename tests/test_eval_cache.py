@@ -0,0 +1,23 @@
+"""Both caches count the bytes of the entries they hold, not the bytes they may hold."""
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from eval_cache import KEY_SIZE, EvaluationCache, SharedEvaluationCache  # noqa: E402
+
+OUTPUT_SIZE = 6
+
+
+@pytest.mark.parametrize("cache_type", [EvaluationCache, SharedEvaluationCache])
+def test_nbytes_counts_held_entries(cache_type):
+    cache = EvaluationCache() if cache_type is EvaluationCache else SharedEvaluationCache(OUTPUT_SIZE)
+    entry_size = KEY_SIZE + 4 * OUTPUT_SIZE + (8 if cache_type is SharedEvaluationCache else 0)
+    assert cache.nbytes == 0
+    keys = [cache.key(torch.tensor([float(idx)])) for idx in range(3)]
+    for key in keys:
+        cache.put(key, torch.zeros(OUTPUT_SIZE))
+    cache.put(keys[0], torch.ones(OUTPUT_SIZE))
+    assert len(cache) == 3
+    assert cache.nbytes == 3 * entry_size
+    cache.clear()
+    assert cache.nbytes == 0
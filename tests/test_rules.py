@@ -0,0 +1,172 @@
+"""`Game.do_action` goes through the steps of `rules.TRANSITIONS`, for every action and every call."""
+import itertools
+import random
+
+import pytest
+
+from action import COUNTER_ACTIONS, TARGETED_ACTIONS, Action
+from card import CARD_TYPES, card_from_code
+from cards import CardList
+from game import Game
+from player import Player
+from rules import (
+    BLOCK_CLAIMS, BLOCKERS, CLAIMS, COST, DRAWS, FIRST_STEP, GAIN, KILLS, STOLEN, TRANSITIONS, Blockers, Call, Step,
+)
+
+START_COINS = 7
+
+
+class ScriptedPlayer(Player):
+    """Challenges and blocks as told, discards its first card and keeps its hand on exchange."""
+    __slots__ = ("challenges", "blocks")
+
+    def __init__(self, name: str, challenges: bool = False, blocks: bool = False):
+        super().__init__(name, random.Random(0))
+        self.challenges = challenges
+        self.blocks = blocks
+
+    def _do_challenge(self, source, action) -> bool:
+        return self.challenges
+
+    def _do_counter_action(self, action, source):
+        return COUNTER_ACTIONS[action] if self.blocks else None
+
+    def _lose_influence(self):
+        card = self._cards[0]
+        self._cards.remove(card)
+        return card
+
+    def _exchange(self, extra_cards: CardList) -> CardList:
+        return extra_cards
+
+
+class RecordingGame(Game):
+    """Records the (step, call) of every step it goes through."""
+
+    def __init__(self, players):
+        super().__init__(players, rng=random.Random(0))
+        self.steps = []
+
+    def _challenge(self, calls, callers, challenged, action) -> Call:
+        call = super()._challenge(calls, callers, challenged, action)
+        self.steps.append((self.pending[3], call))
+        return call
+
+    def _block(self, calls, callers):
+        blocker, call = super()._block(calls, callers)
+        self.steps.append((self.pending[3], call))
+        return blocker, call
+
+    def _apply(self, step, source, action, target) -> Call:
+        call = super()._apply(step, source, action, target)
+        self.steps.append((step, call))
+        return call
+
+
+def _hand(*codes: int) -> CardList:
+    return CardList([card_from_code(code) for code in codes])
+
+
+def _scenarios():
+    """Every combination of calls which can happen in the steps of each action."""
+    for action in Action:
+        challengeable = bool(CLAIMS[action.value])
+        blockable = BLOCKERS[action.value] != Blockers.NOBODY
+        for challenged, honest, blocked, block_challenged, blocker_honest in itertools.product([False, True], repeat=5):
+            if not challengeable and (challenged or honest):
+                continue
+            if challengeable and not challenged and honest:  # the actor's honesty only matters when challenged
+                continue
+            if not blockable and (blocked or block_challenged or blocker_honest):
+                continue
+            if not blocked and (block_challenged or blocker_honest):
+                continue
+            if blocked and not block_challenged and blocker_honest:
+                continue
+            if challenged and not honest and blocked:  # a caught bluff ends the turn
+                continue
+            yield action, challenged, honest, blocked, block_challenged, blocker_honest
+
+
+def _expected_steps(action: Action, challenged, honest, blocked, block_challenged, blocker_honest):
+    """The (step, call) pairs of the action, following `TRANSITIONS` with the calls of the scenario."""
+    calls = {
+        Step.CHALLENGE: Call.NONE if not challenged else Call.CHALLENGE_LOST if honest else Call.CHALLENGE_WON,
+        Step.BLOCK: Call.BLOCK if blocked else Call.NONE,
+        Step.BLOCK_CHALLENGE: (
+            Call.NONE if not block_challenged else Call.CHALLENGE_LOST if blocker_honest else Call.CHALLENGE_WON
+        ),
+    }
+    steps, step = [], FIRST_STEP[action.value]
+    while step != Step.END:
+        call = calls.get(step, Call.NONE)
+        steps.append((step, call))
+        step = TRANSITIONS[action.value][step][call]
+    return steps
+
+
+@pytest.mark.parametrize(
+    "action, challenged, honest, blocked, block_challenged, blocker_honest", list(_scenarios()),
+    ids=lambda value: value.name if isinstance(value, Action) else str(int(value)),
+)
+def test_do_action(action, challenged, honest, blocked, block_challenged, blocker_honest):
+    claims, block_claims = CLAIMS[action.value], BLOCK_CLAIMS[action.value]
+    filler = next(code for code in range(len(CARD_TYPES)) if code not in claims and code not in block_claims)
+    actor = ScriptedPlayer("actor", challenges=block_challenged)
+    target = ScriptedPlayer("target", blocks=blocked)
+    challenger = ScriptedPlayer("challenger", challenges=challenged)
+    game = RecordingGame([actor, target, challenger])
+    game.deal()
+    for player in game.players:
+        player.coins = START_COINS
+        player.cards = _hand(filler, filler)
+    if honest:
+        actor.cards = _hand(claims[0], filler)
+    if blocker_honest:
+        target.cards = _hand(block_claims[0], filler)
+
+    game.do_action(actor, action, target if action in TARGETED_ACTIONS else None)
+
+    assert game.steps == _expected_steps(action, challenged, honest, blocked, block_challenged, blocker_honest)
+    assert game.pending is None
+
+    # The effects, as given by the rules of the game rather than by the tables.
+    caught = challenged and not honest
+    resolved = not caught and (not blocked or (block_challenged and not blocker_honest))
+    value = action.value
+    stolen = STOLEN[value] if resolved else 0
+    assert actor.coins == START_COINS - (0 if caught else COST[value]) + (GAIN[value] if resolved else 0) + stolen
+    assert target.coins == START_COINS - stolen
+    assert challenger.coins == START_COINS
+    losses = {
+        actor: caught + (block_challenged and blocker_honest),
+        target: (block_challenged and not blocker_honest) + (resolved and KILLS[value]),
+        challenger: challenged and honest,
+    }
+    for player, lost in losses.items():
+        assert player.num_cards == 2 - lost
+        assert player._seat.alive == (lost < 2)
+    assert len(game.discard_pile) == sum(losses.values())
+    if resolved and DRAWS[value]:
+        assert actor.num_cards == 2
+
+
+def test_every_call_is_covered():
+    covered = {
+        (action, step, call)
+        for action, *calls in _scenarios()
+        for step, call in _expected_steps(action, *calls)
+    }
+    for action in Action:
+        for step in Step:
+            for call in Call:
+                if step != Step.END and TRANSITIONS[action.value][step][call] is not None:
+                    assert (action, step, call) in covered
+
+
+def test_steps_only_lead_forward():
+    # `BatchGame.step` goes through the steps in a single pass in `Step` order.
+    for rows in TRANSITIONS:
+        for step, row in zip(Step, rows):
+            for following in row:
+                assert following is None or following > step
@@ -0,0 +1,52 @@
+"""Players can only be seated at one table of a game in progress at a time."""
+import random
+
+import pytest
+
+from game import Game
+from player import RandomPlayer
+from seats import SeatTakenError
+
+
+class FailingPlayer(RandomPlayer):
+    __slots__ = ()
+
+    def _do_action(self, players):
+        raise RuntimeError("no action")
+
+
+def _players():
+    return [RandomPlayer(f"p{idx}", random.Random(idx)) for idx in range(3)]
+
+
+def test_undealt_games_can_be_left():
+    players = _players()
+    Game(players)
+    Game(players)
+
+
+def test_games_in_progress_keep_their_players():
+    players = _players()
+    game = Game(players, rng=random.Random(0))
+    game.deal()
+    game.play(num_turns=1)
+    with pytest.raises(SeatTakenError):
+        Game(players)
+    game.release()
+    Game(players)
+
+
+def test_finished_games_can_be_left():
+    players = _players()
+    game = Game(players, rng=random.Random(0))
+    game()
+    Game(players)
+
+
+def test_failed_games_release_their_players():
+    players = [FailingPlayer("failing")] + _players()[1:]
+    game = Game(players, rng=random.Random(0))
+    game.deal()
+    with pytest.raises(RuntimeError):
+        game.play()
+    Game(players)
@@ -0,0 +1,97 @@
+"""Incremental Zobrist keys equal keys hashed from scratch, and don't depend on how the seats are rotated."""
+import random
+
+import pytest
+
+from game import Game
+from player import RandomPlayer
+from zobrist import ZobristHash
+
+
+def _state(game: Game):
+    """(board, discarded, hands) of `game`, as taken by `ZobristHash.rehash`."""
+    seats = game.table.seats
+    board = [(len(seat.hand), seat.coins) for seat in seats]
+    return board, list(game.discard_pile.counts), [list(seat.hand.counts) for seat in seats]
+
+
+def _rehash(num_players: int, board, discarded, hands) -> ZobristHash:
+    return ZobristHash(num_players).rehash(board, discarded, hands)
+
+
+def _games(num_games: int, num_players: int):
+    """Seeded random games, with their hashes attached, yielded after the deal and after every turn."""
+    for seed in range(num_games):
+        players = [RandomPlayer(f"p{idx}", random.Random(seed * num_players + idx)) for idx in range(num_players)]
+        game = Game(players, rng=random.Random(seed))
+        zobrist = ZobristHash(num_players)
+        zobrist.attach_game(game)
+        game.deal()
+        yield game, zobrist
+        while game.play(num_turns=1) is None:
+            yield game, zobrist
+
+
+@pytest.mark.parametrize("num_players", [2, 4, 6])
+def test_incremental_keys_equal_rehash(num_players):
+    snapshots = []
+    for game, zobrist in _games(20, num_players):
+        fresh = _rehash(num_players, *_state(game))
+        for viewer in range(num_players):
+            assert zobrist.full_key(viewer) == fresh.full_key(viewer)
+            assert zobrist.infoset_key(viewer, game.n % num_players) == fresh.infoset_key(viewer, game.n % num_players)
+        if game.n == 3:
+            snapshots.append((game.snapshot(), fresh.full_key()))
+
+    # `Game.restore` hashes the restored state again.
+    game, zobrist = next(_games(1, num_players))
+    for snapshot, key in snapshots:
+        game.restore(snapshot)
+        assert zobrist.full_key() == key
+
+
+@pytest.mark.parametrize("num_players", [3, 5])
+def test_keys_are_rotation_invariant(num_players):
+    for game, zobrist in _games(10, num_players):
+        board, discarded, hands = _state(game)
+        actor = game.n % num_players
+        for shift in range(num_players):
+            rotated = _rehash(num_players, board[shift:] + board[:shift], discarded, hands[shift:] + hands[:shift])
+            assert rotated.canonical_key((actor - shift) % num_players) == zobrist.canonical_key(actor)
+            assert rotated.full_key(0) == zobrist.full_key(shift)
+            for seat in range(num_players):
+                assert rotated.infoset_key((seat - shift) % num_players, (actor - shift) % num_players) == (
+                    zobrist.infoset_key(seat, actor)
+                )
+
+
+def test_tensor_engine_keys_equal_rehash():
+    pytest.importorskip("torch")
+    from base_player import BasePlayer
+    from board import Board
+    from card import card_from_code
+    from cards import DiscardPile
+
+    rng = random.Random(0)
+    board, discarded = Board(4), DiscardPile()
+    zobrist = ZobristHash(4)
+    zobrist.attach(board, discarded)
+    players = [BasePlayer(idx, f"b{idx}", board, discarded) for idx in range(4)]
+    for _ in range(2000):
+        player = rng.choice(players)
+        draw = rng.random()
+        if draw < 0.3 and len(player.cards) < 4:
+            player.add_card(card_from_code(rng.randrange(5)))
+        elif draw < 0.5 and len(player.cards) > 0:
+            card = player.cards[0]
+            player.sub_card(card)
+            if discarded.cards[card.code] < 3:
+                discarded.discard(card)
+        elif draw < 0.8:
+            player.add_coins(rng.randint(1, 3))
+        elif player.coins > 0:
+            player.sub_coins(1)
+        fresh = _rehash(4, board.view(0).tolist(), discarded.cards.tolist(), [p.cards.counts for p in players])
+        for viewer in range(4):
+            assert zobrist.full_key(viewer) == fresh.full_key(viewer)
+            assert zobrist.infoset_key(viewer) == fresh.infoset_key(viewer)
@@ -0,0 +1,196 @@
+"""
+Zobrist keys of game states, updated incrementally as the `Board`, the `DiscardPile` and the hands change, or as the
+seats and the discard pile of a `Game` do.
+
+A state's key is built from one random 64-bit word per (feature, value): each seat's card count and coins, each
+seat's count of every card type, and the discarded count of every card type. Changing a value XORs out the word of
+the old value and XORs in the new one, into an accumulator of the seat it belongs to (or of the discard pile), so
+every change costs O(1). Words are drawn from a fixed seed, so keys are the same across games and processes, and can
+be used to share caches.
+
+Seats are keyed relative to a viewer, as in `Board.view`: the key of a state viewed by seat i equals the key of the
+same state rotated so that seat i is seat 0. The rotation is applied when a key is queried, by mixing each seat's
+accumulator with its seat relative to the viewer, which costs O(num_players) per query.
+"""
+from __future__ import annotations
+
+import functools
+import random
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+
+from card import CARD_TYPES
+
+if TYPE_CHECKING:
+    from board import Board
+    from cards import DiscardPile
+    from game import Game
+
+NUM_CARD_TYPES = len(CARD_TYPES)
+NUM_VALUES = 256  # counts are stored as uint8
+SEED = 0x436F7570
+MASK = (1 << 64) - 1
+
+
+@functools.lru_cache(maxsize=None)
+def zobrist_words(num_players: int) -> Tuple[list, list, list, list, list, list]:
+    """
+    Random words of the features of a game of `num_players` players.
+
+    Returns:
+        board[column][value], hands[card][count], discarded[card][count], and per relative seat: the salts of the
+        public and of the hand accumulators of a seat, and turn[seat]. The word of a zero value is 0.
+    """
+    rng = random.Random(SEED + num_players)
+
+    def words(count: int) -> List[int]:
+        return [0] + [rng.getrandbits(64) for _ in range(count - 1)]
+
+    board = [words(NUM_VALUES) for _ in range(2)]
+    hands = [words(NUM_VALUES) for _ in range(NUM_CARD_TYPES)]
+    discarded = [words(NUM_VALUES) for _ in range(NUM_CARD_TYPES)]
+    public_salts = [rng.getrandbits(64) for _ in range(num_players)]
+    hand_salts = [rng.getrandbits(64) for _ in range(num_players)]
+    turn = [rng.getrandbits(64) for _ in range(num_players)]
+    return board, hands, discarded, public_salts, hand_salts, turn
+
+
+def _mix(value: int, salt: int) -> int:
+    """Hash of a seat accumulator at a relative seat (the finalizer of splitmix64)."""
+    value = (value ^ salt) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+class ZobristHash:
+    """
+    Keys of a game state, as viewed by every seat.
+
+    The public part covers the board and the discard pile, known to all the players. The full-information key adds
+    every hand, and the information-set key of a seat adds only its own hand, so two states a player can't tell
+    apart share her information-set key.
+
+    Usage:
+        zobrist = ZobristHash(num_players)
+        zobrist.attach(board, discard_pile)  # then hand changes of `BasePlayer`s on `board` are hashed too
+        # or, for the object engine:
+        zobrist.attach_game(game)  # coins and hands written by the `Player`s are hashed
+        cache[zobrist.infoset_key(seat)] = ...
+
+    Args:
+        num_players: number of seats.
+    """
+
+    def __init__(self, num_players: int):
+        self.num_players = num_players
+        (self._board, self._hands, self._discarded, self._public_salts, self._hand_salts,
+         self._turn) = zobrist_words(num_players)
+        self.reset()
+
+    def reset(self):
+        """Key of the empty state: an empty board, no discarded cards and no hands."""
+        self._public = [0] * self.num_players  # board words of each seat
+        self._all_hands = [0] * self.num_players  # hand words of each seat
+        self._discard = 0  # words of the discard pile
+        self._sizes = [0] * self.num_players  # hand sizes, kept by `attach_game`
+
+    def attach(self, board: Board, discard_pile: DiscardPile = None):
+        """
+        Hash the current contents of `board` and `discard_pile`, and keep the keys up to date as they change.
+        Hands are hashed as they change, so they must be dealt after attaching.
+        """
+        self.reset()
+        board.zobrist = self
+        for seat, (num_cards, coins) in enumerate(board.view(0).tolist()):
+            self.set_board(seat, 0, 0, num_cards)
+            self.set_board(seat, 1, 0, coins)
+        if discard_pile is not None:
+            discard_pile.zobrist = self
+            for code, count in enumerate(discard_pile.cards.tolist()):
+                self.set_discarded(code, 0, count)
+
+    def attach_game(self, game: Game):
+        """
+        Hash the current state of the seats and the discard pile of `game`, and keep the keys up to date as its
+        players' coins and hands, and the discard pile, change. The card count of a seat on the board is the size
+        of its hand. `Game.restore` hashes the restored state again.
+        """
+        self.reset()
+        game.zobrist = self
+        for seat in game.table.seats:
+            seat.zobrist = self
+            seat.hand.listener = functools.partial(self._on_hand, seat.index)
+            self.set_board(seat.index, 1, 0, seat.coins)
+            for code, count in enumerate(seat.hand.counts):
+                self._on_hand(seat.index, code, 0, count)
+        game.discard_pile.listener = self.set_discarded
+        for code, count in enumerate(game.discard_pile.counts):
+            self.set_discarded(code, 0, count)
+
+    def _on_hand(self, seat: int, code: int, old: int, new: int):
+        size = self._sizes[seat]
+        self._sizes[seat] = size + new - old
+        self.set_board(seat, 0, size, size + new - old)
+        self.set_hand(seat, code, old, new)
+
+    def set_board(self, seat: int, column: int, old: int, new: int):
+        """Column 0 (cards count) or 1 (coins) of `seat` on the board changed from `old` to `new`."""
+        row = self._board[column]
+        self._public[seat] ^= row[old] ^ row[new]
+
+    def set_discarded(self, code: int, old: int, new: int):
+        """The discarded count of card `code` changed from `old` to `new`."""
+        row = self._discarded[code]
+        self._discard ^= row[old] ^ row[new]
+
+    def set_hand(self, seat: int, code: int, old: int, new: int):
+        """The count of card `code` in the hand of `seat` changed from `old` to `new`."""
+        row = self._hands[code]
+        self._all_hands[seat] ^= row[old] ^ row[new]
+
+    def public_key(self, viewer: int = 0, actor: int = None) -> int:
+        """Key of the board and the discard pile, as viewed by `viewer`, with `actor` to play if given."""
+        num_players, salts = self.num_players, self._public_salts
+        key = self._discard
+        for seat, value in enumerate(self._public):
+            key ^= _mix(value, salts[(seat - viewer) % num_players])
+        if actor is not None:
+            key ^= self._turn[(actor - viewer) % num_players]
+        return key
+
+    def full_key(self, viewer: int = 0, actor: int = None) -> int:
+        """Key of the full state, hands included, as viewed by `viewer`. The default is the unrotated key."""
+        num_players, salts = self.num_players, self._hand_salts
+        key = self.public_key(viewer, actor)
+        for seat, value in enumerate(self._all_hands):
+            key ^= _mix(value, salts[(seat - viewer) % num_players])
+        return key
+
+    def infoset_key(self, seat: int, actor: int = None) -> int:
+        """Key of what `seat` knows of the state: the public part and her own hand, viewed by her."""
+        return self.public_key(seat, actor) ^ _mix(self._all_hands[seat], self._hand_salts[0])
+
+    def canonical_key(self, actor: int) -> int:
+        """Full key viewed by the player to move, equal for all the seat rotations of a state."""
+        return self.full_key(actor, actor)
+
+    def rehash(self, board: Sequence[Sequence[int]], discarded: Sequence[int],
+               hands: Sequence[Sequence[int]]) -> ZobristHash:
+        """
+        Hash a state from scratch, e.g. to check the incremental keys.
+
+        Args:
+            board: (cards count, coins) of each seat.
+            discarded: discarded count of each card type.
+            hands: card counts of each seat's hand.
+        """
+        self.reset()
+        for seat, row in enumerate(board):
+            for column, value in enumerate(row):
+                self.set_board(seat, column, 0, value)
+        for code, count in enumerate(discarded):
+            self.set_discarded(code, 0, count)
+        for seat, hand in enumerate(hands):
+            for code, count in enumerate(hand):
+                self.set_hand(seat, code, 0, count)
+        return self